@@ -0,0 +1,313 @@
+# batch_machine.py
+'''
+Ejecución vectorizada sobre muchas entradas (NumPy)
+===================================================
+
+Cuando la misma función GoxLang (por ejemplo powmod o is_prime) se
+ejecuta sobre millones de entradas independientes, el costo de
+interpretar cada instrucción se paga una vez por entrada. Este modo
+interpreta la función una sola vez para N entradas: cada valor de la
+máquina es un arreglo de NumPy con un carril (lane) por entrada.
+
+  * Las operaciones aritméticas y las comparaciones son operaciones
+    vectorizadas sobre arreglos.
+  * Los saltos se reemplazan por ejecución enmascarada: `active` indica
+    qué carriles están ejecutando. IF restringe la máscara a los carriles
+    cuya prueba es verdadera y ELSE a los demás; CBREAK y CONTINUE
+    retiran carriles del ciclo hasta su ENDLOOP; RET guarda el resultado
+    de los carriles activos y los retira de la función.
+  * Las escrituras a variables solo modifican los carriles activos.
+  * Si ningún carril queda activo, se salta directamente al ELSE, ENDIF
+    o ENDLOOP que puede reactivarlos.
+
+El ciclo termina cuando ningún carril sigue iterando, de modo que el
+costo de interpretación es proporcional al carril más lento.
+
+    results = run_batch(module, 'is_prime', np.arange(2, 1_000_000))
+
+Las entradas son un arreglo de forma (N,) para funciones de un parámetro
+o (N, nparams). No se soportan impresión ni acceso a memoria.
+
+Los enteros de GoxLang no tienen límite en la StackMachine, pero aquí
+cada carril es un np.int64. Las entradas deben estar en el rango de
+int64 y ADDI, SUBI, MULI y FTOI verifican el resultado en los carriles
+activos: si se sale del rango se lanza OverflowError en lugar de dar un
+valor truncado (powmod con un módulo mayor que ~3e9 ya lo excede). En
+ese caso hay que usar una de las máquinas escalares.
+'''
+from optimizer.fusion import expand_code
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Rango de los carriles enteros (np.int64)
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+def _as_int(value):
+    return value.astype(np.int64) if isinstance(value, np.ndarray) else int(value)
+
+def _overflows(opname, a, b, result):
+    # Carriles en los que result (aritmética int64 con desborde) no es
+    # el resultado exacto de a op b
+    if opname == 'ADDI':
+        return ((a ^ result) & (b ^ result)) < 0
+    if opname == 'SUBI':
+        return ((a ^ b) & (a ^ result)) < 0
+    # MULI: el producto en punto flotante señala los carriles dudosos y
+    # en esos se compara con el producto exacto
+    overflow = np.zeros(np.shape(result), dtype=bool)
+    doubtful = np.abs(a.astype(np.float64) * b) >= 2.0 ** 62
+    if doubtful.any():
+        a, b = np.broadcast_to(a, overflow.shape), np.broadcast_to(b, overflow.shape)
+        exact = a[doubtful].astype(object) * b[doubtful].astype(object)
+        overflow[doubtful] = [not INT64_MIN <= v <= INT64_MAX for v in exact]
+    return overflow
+
+def _checked_binop(opname, a, b, active):
+    # ADDI, SUBI y MULI sobre int64; OverflowError si un carril activo desborda
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    with np.errstate(over='ignore'):
+        result = _CHECKED_BINOPS[opname](a, b)
+    if np.any(active & _overflows(opname, a, b, result)):
+        raise OverflowError(f"{opname}: el resultado no cabe en int64 (modo batch)")
+    return result
+
+def _checked_ftoi(value, active):
+    value = np.asarray(value, dtype=np.float64)
+    if np.any(active & np.isnan(value)):
+        raise ValueError("FTOI: no se puede convertir NaN a entero")
+    # 2**63 es el primer float fuera de rango
+    if np.any(active & ~((value >= INT64_MIN) & (value < 2.0 ** 63))):
+        raise OverflowError("FTOI: el resultado no cabe en int64 (modo batch)")
+    return np.where(active, value, 0).astype(np.int64)
+
+_CHECKED_BINOPS = {
+    'ADDI': lambda a, b: a + b,
+    'SUBI': lambda a, b: a - b,
+    'MULI': lambda a, b: a * b,
+}
+
+_BINOPS = {
+    'ADDF': lambda a, b: a + b,
+    'SUBF': lambda a, b: a - b,
+    'MULF': lambda a, b: a * b,
+    'DIVF': lambda a, b: a / b,
+    'LTI': lambda a, b: _as_int(a < b),
+    'LEI': lambda a, b: _as_int(a <= b),
+    'GTI': lambda a, b: _as_int(a > b),
+    'GEI': lambda a, b: _as_int(a >= b),
+    'EQI': lambda a, b: _as_int(a == b),
+    'NEI': lambda a, b: _as_int(a != b),
+    'LTF': lambda a, b: _as_int(a < b),
+    'LEF': lambda a, b: _as_int(a <= b),
+    'GTF': lambda a, b: _as_int(a > b),
+    'GEF': lambda a, b: _as_int(a >= b),
+    'EQF': lambda a, b: _as_int(a == b),
+    'NEF': lambda a, b: _as_int(a != b),
+}
+
+def _match_blocks(code):
+    '''
+    Para cada IF retorna la posición de su ELSE (o ENDIF), para cada ELSE
+    la de su ENDIF y para cada LOOP la de su ENDLOOP.
+    '''
+    match = {}
+    pending = []
+    for pc, instr in enumerate(code):
+        opname = instr[0]
+        if opname in ('IF', 'LOOP'):
+            pending.append(pc)
+        elif opname == 'ELSE':
+            match[pending.pop()] = pc
+            pending.append(pc)
+        elif opname in ('ENDIF', 'ENDLOOP'):
+            match[pending.pop()] = pc
+    if pending:
+        raise RuntimeError("Bloque sin cerrar en el código IR")
+    return match
+
+class _Frame:
+    '''
+    Bloque de control abierto. kind es 'if', 'else' o 'loop'; `saved` es
+    la máscara activa al entrar y `depth` la altura de la pila.
+    '''
+    __slots__ = ('kind', 'pc', 'saved', 'depth', 'other', 'broken', 'continued')
+
+    def __init__(self, kind, pc, saved, depth, other=None):
+        self.kind = kind
+        self.pc = pc
+        self.saved = saved
+        self.depth = depth
+        self.other = other                    # IF: máscara del ELSE
+        self.broken = None                    # LOOP: carriles que salieron
+        self.continued = None                 # LOOP: carriles en CONTINUE
+
+class BatchMachine:
+    '''
+    Intérprete del IR en el que cada valor es un arreglo con un carril
+    por entrada.
+    '''
+    def __init__(self, module):
+        if np is None:
+            raise RuntimeError("El modo batch requiere numpy")
+        self.module = module
+        self.globals = {}
+        self.programs = {}
+        for name, func in module.functions.items():
+            code = expand_code(func.code)
+            self.programs[name] = (code, _match_blocks(code))
+
+    def call(self, name, args, mask):
+        if name not in self.programs:
+            raise RuntimeError(f"Función '{name}' no definida")
+        func = self.module.functions[name]
+        code, match = self.programs[name]
+        lanes = len(mask)
+        local_vars = dict(zip(func.parmnames, args))
+        stack = []
+        frames = []
+        loops = []
+        active = mask.copy()
+        returned = np.zeros(lanes, dtype=bool)
+        result = None
+
+        def store(old, value):
+            if old is None:
+                return np.where(active, value, 0)
+            return np.where(active, value, old)
+
+        pc = 0
+        while pc < len(code):
+            instr = code[pc]
+            opname = instr[0]
+
+            if opname in ('CONSTI', 'CONSTF'):
+                stack.append(instr[1])
+            elif opname in _CHECKED_BINOPS:
+                b = stack.pop()
+                a = stack.pop()
+                stack.append(_checked_binop(opname, a, b, active))
+            elif opname in _BINOPS:
+                b = stack.pop()
+                a = stack.pop()
+                stack.append(_BINOPS[opname](a, b))
+            elif opname == 'DIVI':
+                b = stack.pop()
+                a = stack.pop()
+                if np.any(active & (np.asarray(b) == 0)):
+                    raise ZeroDivisionError("División por cero")
+                stack.append(np.floor_divide(a, np.where(b == 0, 1, b)))
+            elif opname == 'ITOF':
+                stack.append(np.asarray(stack.pop(), dtype=np.float64))
+            elif opname == 'FTOI':
+                stack.append(_checked_ftoi(stack.pop(), active))
+            elif opname == 'LOCAL_GET':
+                if instr[1] not in local_vars:
+                    raise RuntimeError(f"Variable local '{instr[1]}' no definida")
+                stack.append(local_vars[instr[1]])
+            elif opname == 'LOCAL_SET':
+                local_vars[instr[1]] = store(local_vars.get(instr[1]), stack.pop())
+            elif opname == 'GLOBAL_GET':
+                if instr[1] not in self.globals:
+                    raise RuntimeError(f"Variable global '{instr[1]}' no definida")
+                stack.append(self.globals[instr[1]])
+            elif opname == 'GLOBAL_SET':
+                self.globals[instr[1]] = store(self.globals.get(instr[1]), stack.pop())
+            elif opname == 'CALL':
+                callee = self.module.functions[instr[1]]
+                nargs = len(callee.parmnames)
+                args = stack[len(stack) - nargs:]
+                del stack[len(stack) - nargs:]
+                value = self.call(instr[1], args, active) if active.any() else 0
+                if callee.return_type:
+                    stack.append(value)
+            elif opname == 'RET':
+                if stack:
+                    value = stack.pop()
+                    result = np.where(active, value, 0 if result is None else result)
+                returned |= active
+                active = np.zeros(lanes, dtype=bool)
+
+            elif opname == 'IF':
+                test = np.asarray(stack.pop()) != 0
+                frames.append(_Frame('if', pc, active, len(stack), active & ~test))
+                active = active & test
+            elif opname == 'ELSE':
+                frame = frames[-1]
+                frame.kind = 'else'
+                frame.pc = pc
+                active = frame.other
+            elif opname == 'ENDIF':
+                frame = frames.pop()
+                active = frame.saved & ~returned
+                if loops:
+                    active &= ~(loops[-1].broken | loops[-1].continued)
+            elif opname == 'LOOP':
+                frame = _Frame('loop', pc, active, len(stack))
+                frame.broken = np.zeros(lanes, dtype=bool)
+                frame.continued = np.zeros(lanes, dtype=bool)
+                frames.append(frame)
+                loops.append(frame)
+            elif opname == 'CBREAK':
+                test = np.asarray(stack.pop()) != 0
+                leaving = active & test
+                loops[-1].broken |= leaving
+                active = active & ~leaving
+            elif opname == 'CONTINUE':
+                loops[-1].continued |= active
+                active = np.zeros(lanes, dtype=bool)
+            elif opname == 'ENDLOOP':
+                loop = loops[-1]
+                loop.continued[:] = False
+                active = loop.saved & ~loop.broken & ~returned
+                if active.any():
+                    pc = loop.pc + 1
+                    continue
+                frames.pop()
+                loops.pop()
+                active = loop.saved & ~returned
+            else:
+                raise RuntimeError(f"Instrucción no soportada en modo batch: {opname}")
+            pc += 1
+
+            # Sin carriles activos: saltar al punto que puede reactivarlos
+            if not active.any():
+                if not frames:
+                    break
+                frame = frames[-1]
+                del stack[frame.depth:]
+                pc = match[frame.pc]
+
+        if result is None:
+            return np.zeros(lanes, dtype=np.int64)
+        return result
+
+def run_batch(module, name, inputs):
+    '''
+    Ejecuta la función `name` del módulo una vez por fila de `inputs` y
+    retorna un arreglo con los resultados. Las entradas enteras deben
+    estar en el rango de int64 (OverflowError si no).
+    '''
+    if np is None:
+        raise RuntimeError("run_batch requiere numpy")
+    func = module.functions.get(name)
+    if func is None:
+        raise RuntimeError(f"Función '{name}' no definida")
+    inputs = np.asarray(inputs)
+    if inputs.dtype == object or inputs.dtype.kind == 'u':
+        # Enteros de Python que no caben en int64 (o uint64 grandes)
+        try:
+            inputs = np.array(inputs.tolist(), dtype=np.int64)
+        except (OverflowError, TypeError):
+            raise OverflowError("run_batch: las entradas deben estar en el rango de int64") from None
+    if inputs.ndim == 1:
+        inputs = inputs.reshape(-1, 1)
+    if inputs.shape[1] != len(func.parmnames):
+        raise ValueError(f"'{name}' espera {len(func.parmnames)} argumentos por entrada")
+    args = [inputs[:, i] for i in range(inputs.shape[1])]
+    mask = np.ones(len(inputs), dtype=bool)
+    return BatchMachine(module).call(name, args, mask)
@@ -0,0 +1,103 @@
+# batch_runner.py
+'''
+Ejecución por lotes en varios procesos
+======================================
+
+BatchRunner ejecuta muchas llamadas `(función, args)` sobre un mismo
+IRModule repartiéndolas entre procesos de un ProcessPoolExecutor:
+
+  * el módulo se envía a cada proceso una sola vez, en el initializer
+    del pool, que deja cargada una StackMachine por proceso,
+  * los trabajos se envían en bloques de `chunksize` (un solo mensaje
+    por bloque en lugar de uno por llamada),
+  * cada llamada se ejecuta con la pila, las variables, la memoria y la
+    salida limpias; la salida impresa se captura con un CaptureSink,
+  * los resultados vuelven en el mismo orden que los trabajos.
+
+    with BatchRunner(module, workers=4) as runner:
+        results = runner.map([('gcd', (48, 18)), ('powmod', (2, 10, 1000))])
+    results[0].value          # 6
+    results[0].output         # lo que imprimió la llamada
+
+Las variables globales no se inicializan: solo main ejecuta el código
+del nivel superior del programa.
+'''
+import collections
+import concurrent.futures
+import os
+
+from memory import Memory
+from output import CaptureSink
+from stack_machine import StackMachine
+
+# Resultado de un trabajo: valor retornado (None si no retorna nada) y
+# salida impresa
+JobResult = collections.namedtuple('JobResult', ['value', 'output'])
+
+# Bloques por proceso cuando no se indica chunksize
+CHUNKS_PER_WORKER = 4
+
+# StackMachine del proceso (la crea _init_worker)
+_worker_vm = None
+
+def _init_worker(module):
+    global _worker_vm
+    _worker_vm = StackMachine(CaptureSink())
+    _worker_vm.load_functions({name: func.code for name, func in module.functions.items()},
+                              {name: func.parmnames for name, func in module.functions.items()})
+
+def _run_job(job):
+    return call_function(_worker_vm, *job)
+
+def call_function(vm, name, args):
+    '''
+    Ejecuta la función `name` con los argumentos `args` en una
+    StackMachine ya cargada, partiendo de un estado limpio. Retorna un
+    JobResult.
+    '''
+    if name not in vm.functions:
+        raise RuntimeError(f"Función '{name}' no definida")
+    vm.stack = [('float' if isinstance(arg, float) else 'int', arg) for arg in args]
+    vm.globals = {}
+    vm.locals_stack = []
+    vm.call_stack = []
+    vm.memory = Memory()
+    vm.output = CaptureSink()
+    vm.load_program([('CALL', name), ('RET',)])
+    vm.run()
+    return JobResult(vm.stack[-1][1] if vm.stack else None, vm.output.getvalue())
+
+class BatchRunner:
+    def __init__(self, module, workers=None, chunksize=None):
+        self.module = module
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(module,))
+
+    def map(self, jobs):
+        '''
+        Ejecuta los trabajos `(función, args)` y retorna la lista de
+        JobResult en el mismo orden.
+        '''
+        jobs = [(name, tuple(args)) for name, args in jobs]
+        chunksize = self.chunksize
+        if chunksize is None:
+            chunksize = max(1, -(-len(jobs) // (self.workers * CHUNKS_PER_WORKER)))
+        return list(self.executor.map(_run_job, jobs, chunksize=chunksize))
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def run_jobs(module, jobs, workers=None, chunksize=None):
+    '''
+    Atajo: crea un BatchRunner, ejecuta los trabajos y cierra el pool.
+    '''
+    with BatchRunner(module, workers, chunksize) as runner:
+        return runner.map(jobs)
@@ -0,0 +1,62 @@
+# bench_async.py
+'''
+Muchas máquinas en un mismo event loop: ejecuta VMS copias de sho.gox
+(con N pequeño) concurrentemente con run_async y distintos tamaños de
+tajada. Reporta el tiempo total frente a ejecutarlas una tras otra con
+run(), y cuándo termina la primera y la última máquina (con un reparto
+justo todas terminan cerca del final).
+
+    python -m benchmarks.bench_async
+'''
+import asyncio
+import time
+
+from benchmarks.common import best_time, compile_source, load_vm, read_sample, run_module
+from output import AsyncSink, CaptureSink
+from stack_machine import StackMachine
+
+VMS = 100
+SHOR_N = 221
+SLICES = [100, 1_000, 10_000]
+
+async def run_one(module, slice_size, start):
+    vm = load_vm(module, StackMachine(AsyncSink()))
+
+    async def execute():
+        await vm.run_async(slice_size)
+        return time.perf_counter() - start
+
+    task = asyncio.create_task(execute())
+    output = ''.join([chunk async for chunk in vm.output])
+    return output, await task
+
+async def run_all(module, slice_size):
+    start = time.perf_counter()
+    return await asyncio.gather(*(run_one(module, slice_size, start) for _ in range(VMS)))
+
+def main():
+    module = compile_source(read_sample('samples/sho.gox', SHOR_N))
+    _, expected = run_module(module)
+
+    def run_sync():
+        for _ in range(VMS):
+            load_vm(module, StackMachine(CaptureSink())).run()
+
+    t_sync = best_time(run_sync)
+    print(f"{VMS} x shor({SHOR_N}) con run(): {t_sync:.3f} s\n")
+
+    print(f"{'tajada':>8}{'total':>9}{'vs run':>8}{'primera':>9}{'última':>9}")
+    for slice_size in SLICES:
+        total = None
+        for _ in range(3):
+            start = time.perf_counter()
+            results = asyncio.run(run_all(module, slice_size))
+            elapsed = time.perf_counter() - start
+            if total is None or elapsed < total:
+                total, best_results = elapsed, results
+        assert all(output == expected for output, _ in best_results)
+        finished = sorted(t for _, t in best_results)
+        print(f"{slice_size:>8}{total:>9.3f}{total / t_sync:>7.2f}x{finished[0]:>9.3f}{finished[-1]:>9.3f}")
+
+if __name__ == '__main__':
+    main()
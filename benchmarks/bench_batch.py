@@ -0,0 +1,48 @@
+# bench_batch.py
+'''
+Compara la ejecución por lotes (batch_machine) contra llamar la función
+una vez por entrada en la ClosureMachine y en el backend Python. Usa las
+funciones de samples/sho.gox sobre N entradas aleatorias y verifica que
+los resultados coincidan.
+
+    python -m benchmarks.bench_batch
+'''
+import numpy as np
+
+from batch_machine import run_batch
+from benchmarks.common import SHOR_N, best_time, compile_file
+from closure_machine import ClosureMachine
+from python_backend import PythonProgram
+
+SIZES = [1_000, 10_000, 100_000]
+
+def make_inputs(name, size, rng):
+    bases = rng.integers(2, SHOR_N, size=size)
+    if name == 'powmod':
+        exps = rng.integers(0, 10**6, size=size)
+        return np.column_stack([bases, exps, np.full(size, SHOR_N)])
+    return np.column_stack([bases, np.full(size, SHOR_N)])
+
+def main():
+    module = compile_file('samples/sho.gox')
+    machine = ClosureMachine()
+    machine.load_module(module)
+    program = PythonProgram(module)
+    rng = np.random.default_rng(0)
+
+    print(f"{'función':<14}{'N':>9}{'closures':>10}{'python':>10}{'batch':>10}{'vs py':>8}")
+    for name in ('gcd', 'powmod'):
+        for size in SIZES:
+            inputs = make_inputs(name, size, rng)
+            rows = inputs.tolist()
+            expected = [program.call(name, *row) for row in rows]
+            assert run_batch(module, name, inputs).tolist() == expected, f"{name}: resultados distintos"
+
+            t_closure = best_time(lambda: [machine.call(name, *row) for row in rows], repeat=1)
+            t_python = best_time(lambda: [program.call(name, *row) for row in rows], repeat=1)
+            t_batch = best_time(lambda: run_batch(module, name, inputs))
+            print(f"{name:<14}{size:>9}{t_closure:>10.3f}{t_python:>10.3f}{t_batch:>10.3f}"
+                  f"{t_python / t_batch:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# bench_batch_runner.py
+'''
+Rendimiento de batch_runner: llamadas a powmod de samples/sho.gox en la
+StackMachine, repartidas entre 1, 2, 4 y 8 procesos, comparado con
+ejecutarlas en serie en el proceso actual. El tiempo incluye crear el
+pool y enviarle el módulo.
+
+    python -m benchmarks.bench_batch_runner
+'''
+import os
+import random
+import time
+
+from batch_runner import BatchRunner, call_function
+from benchmarks.common import SHOR_N, compile_file, load_vm
+
+JOBS = 4_000
+WORKERS = [1, 2, 4, 8]
+
+def make_jobs(count, seed=0):
+    rng = random.Random(seed)
+    return [('powmod', (rng.randrange(2, SHOR_N), rng.randrange(10**5), SHOR_N))
+            for _ in range(count)]
+
+def main():
+    module = compile_file('samples/sho.gox')
+    jobs = make_jobs(JOBS)
+
+    vm = load_vm(module)
+    start = time.perf_counter()
+    expected = [call_function(vm, name, args) for name, args in jobs]
+    serial = time.perf_counter() - start
+
+    print(f"{JOBS} x powmod, {os.cpu_count()} CPU")
+    print(f"{'procesos':>9}{'tiempo':>9}{'llamadas/s':>12}{'vs serie':>10}")
+    print(f"{'serie':>9}{serial:>9.3f}{JOBS / serial:>12.0f}{1:>9.2f}x")
+    for workers in WORKERS:
+        start = time.perf_counter()
+        with BatchRunner(module, workers) as runner:
+            results = runner.map(jobs)
+        elapsed = time.perf_counter() - start
+        assert results == expected, "resultados distintos"
+        print(f"{workers:>9}{elapsed:>9.3f}{JOBS / elapsed:>12.0f}{serial / elapsed:>9.2f}x")
+
+if __name__ == '__main__':
+    main()
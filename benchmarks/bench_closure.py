@@ -0,0 +1,41 @@
+# bench_closure.py
+'''
+Compara la StackMachine con la ClosureMachine en los samples. Verifica
+que ambas produzcan la misma salida y reporta el tiempo de ejecución
+(la compilación a closures se mide aparte).
+
+    python -m benchmarks.bench_closure
+'''
+import contextlib
+import io
+import time
+
+from benchmarks.common import SAMPLES, best_time, compile_file, run_module
+from closure_machine import ClosureMachine
+
+def run_closures(module):
+    machine = ClosureMachine()
+    machine.load_module(module)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        machine.run()
+    return out.getvalue()
+
+def main():
+    print(f"{'sample':<22}{'carga':>10}{'stack':>10}{'closures':>10}{'speedup':>9}")
+    for path in SAMPLES:
+        module = compile_file(path)
+        _, expected = run_module(module)
+        assert run_closures(module) == expected, f"{path}: la salida difiere"
+
+        start = time.perf_counter()
+        ClosureMachine().load_module(module)
+        t_load = time.perf_counter() - start
+
+        t_stack = best_time(lambda: run_module(module))
+        t_closure = best_time(lambda: run_closures(module))
+        print(f"{path:<22}{t_load:>10.4f}{t_stack:>10.3f}{t_closure:>10.3f}"
+              f"{t_stack / t_closure:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# bench_cse.py
+'''
+Subexpresiones comunes: instrucciones ejecutadas en la StackMachine con
+-O1 y -O2, sin y con la pasada cse, para los ejemplos de samples/ y para
+un ciclo que repite mod(x, 2) y x / y en la misma expresión.
+
+En los ejemplos no hay expresiones repetidas dentro de un bloque (en
+a - b * (a / b) se repiten las lecturas de a y b, no una operación). Con
+-O1 mod no se expande y lo que se reutiliza es la llamada, porque mod es
+pura; con -O2 se reutiliza el cuerpo expandido.
+
+    python -m benchmarks.bench_cse
+'''
+from benchmarks.common import SAMPLES, compile_file, compile_source, run_module
+from optimizer.passes import PassManager
+from output import CaptureSink
+from profiler import ProfilingMachine
+
+REPEATED = """
+func mod(a int, b int) int {
+    return a - b * (a / b);
+}
+
+func work(n int, y int) int {
+    var total int = 0;
+    var x int = 0;
+    while x < n {
+        total = total + mod(x, 2) * (x / y) + mod(x, 2) + x / y;
+        x = x + 1;
+    }
+    return total;
+}
+
+print work(5000, 7);
+"""
+
+def programs():
+    for path in SAMPLES:
+        yield path, lambda path=path: compile_file(path)
+    yield 'repetidas', lambda: compile_source(REPEATED)
+
+def executed(module):
+    vm, _ = run_module(module, ProfilingMachine(CaptureSink()))
+    return sum(n for n, _ in vm.opcodes.values())
+
+def main():
+    print(f"{'programa':<20}{'-O1':>20}{'-O2':>22}")
+    for name, compile in programs():
+        row = []
+        for level in (1, 2):
+            base = PassManager(level, disable=['cse']).run(compile())
+            module = PassManager(level, enable=['cse']).run(compile())
+            assert run_module(module)[1] == run_module(base)[1], f"{name}: salida distinta"
+            row.append(f"{executed(base)} -> {executed(module)}")
+        print(f"{name:<20}{row[0]:>20}{row[1]:>22}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+# bench_dce.py
+'''
+Código muerto: funciones e instrucciones del módulo con -O1 y con
+-O1 más las pasadas dce y dead-functions, y el tiempo de cargar el
+módulo en la StackMachine (load_functions + load_program).
+
+factorize.gox solo se compila: su ciclo interno no termina.
+
+    python -m benchmarks.bench_dce
+'''
+from benchmarks.common import SAMPLES, best_time, compile_file, load_vm, run_module
+from optimizer.passes import PassManager, instruction_count
+
+def main():
+    print(f"{'programa':<22}{'funciones':>10}{'instr':>14}{'carga us':>16}")
+    for path in SAMPLES + ['samples/factorize.gox']:
+        base = PassManager(1).run(compile_file(path))
+        module = PassManager(1, enable=['dce', 'dead-functions']).run(compile_file(path))
+        if path in SAMPLES:
+            assert run_module(module)[1] == run_module(base)[1], f"{path}: salida distinta"
+        t_base = best_time(lambda: load_vm(base), repeat=200)
+        t_dce = best_time(lambda: load_vm(module), repeat=200)
+        functions = f"{len(base.functions)} -> {len(module.functions)}"
+        instructions = f"{instruction_count(base)} -> {instruction_count(module)}"
+        load = f"{1e6 * t_base:.1f} -> {1e6 * t_dce:.1f}"
+        print(f"{path:<22}{functions:>10}{instructions:>14}{load:>16}")
+
+if __name__ == '__main__':
+    main()
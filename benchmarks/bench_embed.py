@@ -0,0 +1,46 @@
+# bench_embed.py
+'''
+Llamadas a funciones GoxLang desde Python: CompiledProgram.call (una
+StackMachine cargada que se reutiliza) contra armar a mano una
+StackMachine nueva por llamada, como había que hacerlo antes.
+
+    python -m benchmarks.bench_embed
+'''
+import time
+
+from benchmarks.common import read_sample
+from program import CompiledProgram
+from stack_machine import StackMachine
+
+CALLS = 20_000
+CASES = [('mod', (48, 18)), ('gcd', (48, 18)), ('powmod', (3, 13, 1000))]
+
+def call_by_hand(module, name, args):
+    functions = {n: f.code for n, f in module.functions.items()}
+    params = {n: f.parmnames for n, f in module.functions.items()}
+    vm = StackMachine()
+    vm.load_functions(functions, params)
+    vm.stack.extend(('int', arg) for arg in args)
+    vm.load_program([('CALL', name), ('RET',)])
+    vm.run()
+    return vm.stack[-1][1]
+
+def calls_per_second(fn):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        fn()
+    return CALLS / (time.perf_counter() - start)
+
+def main():
+    program = CompiledProgram.from_source(read_sample('samples/sho.gox'))
+    module = program.module
+    print(f"{'llamada':<24}{'a mano/s':>12}{'call/s':>12}{'speedup':>9}")
+    for name, args in CASES:
+        assert program.call(name, *args) == call_by_hand(module, name, args)
+        by_hand = calls_per_second(lambda: call_by_hand(module, name, args))
+        embedded = calls_per_second(lambda: program.call(name, *args))
+        label = f"{name}{args}"
+        print(f"{label:<24}{by_hand:>12.0f}{embedded:>12.0f}{embedded / by_hand:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
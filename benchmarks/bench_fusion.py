@@ -0,0 +1,42 @@
+# bench_fusion.py
+'''
+Compara la StackMachine con y sin superinstrucciones en los samples:
+instrucciones despachadas, tiempo y salida (debe ser idéntica).
+
+    python -m benchmarks.bench_fusion
+'''
+from benchmarks.common import SAMPLES, best_time, compile_file, run_module
+from optimizer.fusion import fuse_module
+from stack_machine import StackMachine
+
+class CountingMachine(StackMachine):
+    def __init__(self):
+        super().__init__()
+        self.dispatches = 0
+
+    def run(self):
+        self.pc = 0
+        self.running = True
+        while self.running and self.pc < len(self.program):
+            instr = self.program[self.pc]
+            self.dispatches += 1
+            getattr(self, f"op_{instr[0]}")(*instr[1:])
+            self.pc += 1
+
+def main():
+    print(f"{'sample':<22}{'despachos':>12}{'fusionado':>12}{'tiempo':>10}{'fusionado':>11}{'speedup':>9}")
+    for path in SAMPLES:
+        plain = compile_file(path)
+        fused = fuse_module(compile_file(path))
+
+        vm_plain, out_plain = run_module(plain, CountingMachine())
+        vm_fused, out_fused = run_module(fused, CountingMachine())
+        assert out_plain == out_fused, f"{path}: la salida difiere"
+
+        t_plain = best_time(lambda: run_module(plain))
+        t_fused = best_time(lambda: run_module(fused))
+        print(f"{path:<22}{vm_plain.dispatches:>12}{vm_fused.dispatches:>12}"
+              f"{t_plain:>10.3f}{t_fused:>11.3f}{t_plain / t_fused:>8.2f}x")
+
+if __name__ == '__main__':
+    main()
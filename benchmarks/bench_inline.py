@@ -0,0 +1,76 @@
+# bench_inline.py
+'''
+Inlining: shor de samples/sho.gox y find_period(2, N) llamada desde
+Python, con -O1 (sin inlining), -O1 + inline con el presupuesto por
+omisión y -O1 + inline guiado por un perfil (ProfilingMachine) de la
+misma ejecución. Se muestran el tiempo en la StackMachine, el JIT de
+trazas y la RegisterMachine, las instrucciones ejecutadas y las
+llamadas (CALL) ejecutadas en la StackMachine.
+
+En la StackMachine la ganancia es pequeña (~5 %): CALL y RET son dos
+de las ~18 instrucciones de cada llamada a mod y el costo por
+instrucción domina. Los motores que compilan el código (JIT, registros)
+ganan más, porque el cuerpo expandido queda dentro de la traza o del
+código lineal sin la llamada.
+
+    python -m benchmarks.bench_inline
+'''
+from benchmarks.common import SHOR_N, best_time, compile_file, run_module
+from optimizer.inline import inline_module, profile_from
+from optimizer.passes import PassManager
+from output import CaptureSink
+from profiler import ProfilingMachine
+from program import CompiledProgram
+from register_machine import RegisterMachine, lower_module
+from tracing_jit import TracingJITMachine
+
+def variants():
+    yield '-O1', PassManager(1).run(compile_file('samples/sho.gox'))
+
+    module = compile_file('samples/sho.gox')
+    inline_module(module)
+    yield '-O1 + inline', PassManager(1).run(module)
+
+    vm, _ = run_module(compile_file('samples/sho.gox'), ProfilingMachine(CaptureSink()))
+    module = compile_file('samples/sho.gox')
+    inline_module(module, profile=profile_from(vm))
+    yield '-O1 + inline (perfil)', PassManager(1).run(module)
+
+def counts(module):
+    # (instrucciones ejecutadas, CALL ejecutados)
+    vm, _ = run_module(module, ProfilingMachine(CaptureSink()))
+    return sum(n for n, _ in vm.opcodes.values()), vm.opcodes['CALL'][0]
+
+def engines(module):
+    functions = lower_module(module)
+
+    def registers():
+        machine = RegisterMachine(CaptureSink())
+        machine.functions.update(functions)
+        machine.run()
+    yield 'stack', lambda: run_module(module)
+    yield 'jit', lambda: run_module(module, TracingJITMachine())
+    yield 'registros', registers
+
+def main():
+    print(f"shor({SHOR_N}), ms por motor")
+    print(f"{'variante':<24}{'stack':>9}{'jit':>9}{'registros':>11}{'instr':>10}{'CALL':>8}")
+    expected = None
+    for name, module in variants():
+        output = run_module(module)[1]
+        expected = expected or output
+        assert output == expected, f"{name}: salida distinta"
+        times = [best_time(run) for _, run in engines(module)]
+        executed, calls = counts(module)
+        print(f"{name:<24}{1000 * times[0]:>9.1f}{1000 * times[1]:>9.1f}{1000 * times[2]:>11.1f}"
+              f"{executed:>10}{calls:>8}")
+
+    print(f"\nfind_period(2, {SHOR_N}) desde CompiledProgram (StackMachine)")
+    for name, module in variants():
+        program = CompiledProgram(module)
+        result = program.call('find_period', 2, SHOR_N)
+        elapsed = best_time(lambda: program.call('find_period', 2, SHOR_N))
+        print(f"{name:<24}{1000 * elapsed:>9.1f} ms   r = {result}")
+
+if __name__ == '__main__':
+    main()
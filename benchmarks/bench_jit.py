@@ -0,0 +1,55 @@
+# bench_jit.py
+'''
+JIT de trazas: StackMachine contra TracingJITMachine en programas cuyo
+tiempo se va en ciclos (shor de samples/sho.gox, la criba de
+bench_memory y una suma sin llamadas), con el reporte de aciertos por
+ciclo.
+
+    python -m benchmarks.bench_jit
+'''
+from benchmarks.bench_memory import SIEVE_SOURCE
+from benchmarks.common import best_time, compile_file, compile_source, run_module
+from tracing_jit import TracingJITMachine
+
+SUM_SOURCE = """
+func sum(n int) int {
+    var i int = 0;
+    var total int = 0;
+    while i < n {
+        if i - 7 * (i / 7) == 3 {
+            total = total - i;
+        } else {
+            total = total + i * i;
+        }
+        i = i + 1;
+    }
+    return total;
+}
+print sum(%d);
+"""
+
+def programs():
+    yield 'shor', compile_file('samples/sho.gox')
+    yield 'sieve 100k', compile_source(SIEVE_SOURCE % 100_000)
+    yield 'suma 200k', compile_source(SUM_SOURCE % 200_000)
+
+def main():
+    print(f"{'programa':<14}{'stack':>9}{'jit':>9}{'speedup':>9}")
+    reports = []
+    for name, module in programs():
+        _, expected = run_module(module)
+        base = best_time(lambda: run_module(module), repeat=1)
+
+        def run():
+            vm, out = run_module(module, TracingJITMachine())
+            assert out == expected, f"{name}: salida distinta"
+            return vm
+        jit = best_time(run)
+        print(f"{name:<14}{base:>9.3f}{jit:>9.3f}{base / jit:>8.2f}x")
+        reports.append((name, run().report()))
+
+    for name, report in reports:
+        print(f"\n{name}\n{report}")
+
+if __name__ == '__main__':
+    main()
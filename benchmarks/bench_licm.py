@@ -0,0 +1,75 @@
+# bench_licm.py
+'''
+Código invariante y reducción de fuerza: instrucciones ejecutadas (y
+MULI ejecutadas) en la StackMachine con -O2 sin y con la pasada licm,
+para los ejemplos de samples/ y para un recorrido de una matriz en
+memoria con direcciones base + (y * cols + x) * 8 (fill) y con tres
+productos i * 8 por iteración (trace, donde se reducen).
+
+En los ejemplos no hay nada que mover ni reducir: en criba.gox base + i
+e i * i dependen de i (i * i no es un producto por un invariante) y en
+sho.gox todas las variables de los ciclos cambian en cada iteración. La matriz
+muestra el caso que la pasada está pensada para mejorar.
+
+    python -m benchmarks.bench_licm
+'''
+from benchmarks.common import SAMPLES, best_time, compile_file, compile_source, run_module
+from optimizer.passes import PassManager
+from output import CaptureSink
+from profiler import ProfilingMachine
+
+MATRIX = """
+const w = 60;
+const h = 40;
+const base = ^(w * h * 8);
+
+func fill(m int, cols int, rows int) {
+    var y int = 0;
+    while y < rows {
+        var x int = 0;
+        while x < cols {
+            `(m + (y * cols + x) * 8) = y * cols + x;
+            x = x + 1;
+        }
+        y = y + 1;
+    }
+}
+
+func trace(m int, cols int, rows int) int {
+    var total int = 0;
+    var i int = 0;
+    while i < rows {
+        total = total + `(m + i * (cols + 1) * 8) + `(m + i * 8) + `(m + i * 8 + 8) + `(m + i * 8 + 16);
+        i = i + 1;
+    }
+    return total;
+}
+
+fill(base, w, h);
+print trace(base, w, h);
+"""
+
+def programs():
+    for path in SAMPLES:
+        yield path, lambda path=path: compile_file(path)
+    yield 'matriz', lambda: compile_source(MATRIX)
+
+def counts(module):
+    # (instrucciones ejecutadas, MULI ejecutadas)
+    vm, _ = run_module(module, ProfilingMachine(CaptureSink()))
+    return sum(n for n, _ in vm.opcodes.values()), vm.opcodes.get('MULI', (0, 0))[0]
+
+def main():
+    print(f"{'programa':<20}{'instr':>22}{'MULI':>18}{'ms':>18}")
+    for name, compile in programs():
+        base = PassManager(2, disable=['licm']).run(compile())
+        module = PassManager(2).run(compile())
+        assert run_module(module)[1] == run_module(base)[1], f"{name}: salida distinta"
+        (i_base, m_base), (i_licm, m_licm) = counts(base), counts(module)
+        t_base = best_time(lambda: run_module(base))
+        t_licm = best_time(lambda: run_module(module))
+        print(f"{name:<20}{f'{i_base} -> {i_licm}':>22}{f'{m_base} -> {m_licm}':>18}"
+              f"{f'{1000 * t_base:.1f} -> {1000 * t_licm:.1f}':>18}")
+
+if __name__ == '__main__':
+    main()
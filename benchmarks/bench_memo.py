@@ -0,0 +1,42 @@
+# bench_memo.py
+'''
+Memoización de funciones puras en shor (samples/sho.gox): StackMachine
+normal contra MemoizingMachine con las funciones que el análisis de
+pureza marca como memoizables, para varios tamaños del caché LRU.
+
+    python -m benchmarks.bench_memo
+'''
+from benchmarks.common import SHOR_N, best_time, compile_file, run_module
+from memo import MemoizingMachine
+from optimizer.purity import impure_reasons, memoizable_functions
+
+SHOR_VALUES = [SHOR_N, 15247]
+MAXSIZES = [256, 4096, 65536]
+
+def main():
+    module = compile_file('samples/sho.gox')
+    for name, reason in sorted(impure_reasons(module).items()):
+        print(f"impura: {name} ({reason})")
+    functions = memoizable_functions(module)
+    print(f"memoizables: {', '.join(sorted(functions))}\n")
+
+    print(f"{'N':>7}{'caché':>8}{'tiempo':>9}{'speedup':>9}{'aciertos':>10}")
+    for n in SHOR_VALUES:
+        module = compile_file('samples/sho.gox', n)
+        _, expected = run_module(module)
+        base = best_time(lambda: run_module(module))
+        print(f"{n:>7}{'-':>8}{base:>9.3f}{1:>8.2f}x{'-':>10}")
+        for maxsize in MAXSIZES:
+            def run():
+                vm = MemoizingMachine(functions, maxsize)
+                _, out = run_module(module, vm)
+                assert out == expected, "salida distinta"
+                return vm
+            elapsed = best_time(run)
+            cache = run().cache
+            rate = 100 * cache.hits / (cache.hits + cache.misses)
+            print(f"{n:>7}{maxsize:>8}{elapsed:>9.3f}{base / elapsed:>8.2f}x{rate:>9.1f}%")
+        print(cache.report() + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# bench_memory.py
+'''
+Criba de Eratóstenes sobre la memoria lineal (PEEKI/POKEI/GROW) con n
+grande en los tres motores de ejecución, y costo de muchos GROW pequeños
+(la capacidad crece al doble, así que el buffer se copia pocas veces).
+
+    python -m benchmarks.bench_memory
+'''
+import contextlib
+import io
+import time
+
+from benchmarks.common import best_time, compile_source, load_vm
+from closure_machine import ClosureMachine
+from memory import Memory
+from python_backend import PythonProgram
+
+SIEVE_SOURCE = """
+func sieve(n int) int {
+    var base int = ^(n + 1);
+    var i int = 2;
+    while i <= n {
+        `(base + i) = 1;
+        i = i + 1;
+    }
+    i = 2;
+    while i * i <= n {
+        if `(base + i) == 1 {
+            var j int = i * i;
+            while j <= n {
+                `(base + j) = 0;
+                j = j + i;
+            }
+        }
+        i = i + 1;
+    }
+    var count int = 0;
+    i = 2;
+    while i <= n {
+        count = count + `(base + i);
+        i = i + 1;
+    }
+    return count;
+}
+print sieve(%d);
+"""
+
+# Cantidad de primos <= n, para verificar
+EXPECTED = {10_000: 1229, 100_000: 9592, 1_000_000: 78498}
+
+# La StackMachine solo se mide hasta este n
+STACK_LIMIT = 100_000
+
+def run_stack(module):
+    vm = load_vm(module)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        vm.run()
+    return out.getvalue()
+
+def run_closures(module):
+    machine = ClosureMachine()
+    machine.load_module(module)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        machine.run()
+    return out.getvalue()
+
+def run_python(module):
+    program = PythonProgram(module)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        program.run()
+    return out.getvalue()
+
+def bench_sieve():
+    print(f"{'n':>10}{'stack':>10}{'closures':>10}{'python':>10}")
+    for n, primes in EXPECTED.items():
+        module = compile_source(SIEVE_SOURCE % n)
+        times = []
+        for engine in (run_stack, run_closures, run_python):
+            if engine is run_stack and n > STACK_LIMIT:
+                times.append(None)
+                continue
+            assert engine(module) == str(primes), f"{engine.__name__}: resultado incorrecto"
+            times.append(best_time(lambda: engine(module), repeat=1))
+        print(f"{n:>10}" + ''.join(f"{t:>10.3f}" if t is not None else f"{'-':>10}" for t in times))
+
+def bench_grow(requests=1_000_000):
+    memory = Memory(capacity=1)
+    copies = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        capacity = memory.capacity
+        memory.grow(1)
+        copies += memory.capacity != capacity
+    elapsed = time.perf_counter() - start
+    print(f"\n{requests} x GROW 1: {elapsed:.3f} s, {copies} redimensionamientos, "
+          f"capacidad final {memory.capacity} celdas")
+
+def main():
+    bench_sieve()
+    bench_grow()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# bench_metering.py
+'''
+Sobrecarga del control de combustible y tiempo (MeteredMachine) frente
+a la StackMachine en samples/sho.gox, y tiempo que tarda en detenerse un
+ciclo infinito.
+
+    python -m benchmarks.bench_metering
+'''
+import time
+
+from benchmarks.common import compile_file, compile_source, run_module
+from metering import MeteredMachine, OutOfFuel
+
+INFINITE_SOURCE = """
+var i int = 0;
+while true {
+    i = i + 1;
+}
+"""
+
+def interleaved_times(runs, repeat=5):
+    # Alterna las variantes en cada repetición para repartir el ruido
+    best = {name: None for name in runs}
+    for _ in range(repeat):
+        for name, fn in runs.items():
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best[name] = elapsed if best[name] is None else min(best[name], elapsed)
+    return best
+
+def main():
+    module = compile_file('samples/sho.gox')
+    _, expected = run_module(module)
+    vm, output = run_module(module, MeteredMachine(fuel=10**9, time_limit=60))
+    assert output == expected
+
+    times = interleaved_times({
+        'stack': lambda: run_module(module),
+        'metered': lambda: run_module(module, MeteredMachine(fuel=10**9, time_limit=60)),
+    })
+    overhead = 100 * (times['metered'] / times['stack'] - 1)
+    print(f"sho.gox: stack {times['stack']:.3f} s, con combustible {times['metered']:.3f} s "
+          f"({overhead:+.1f} %), combustible usado {vm.used}")
+
+    infinite = compile_source(INFINITE_SOURCE)
+    for kwargs in ({'fuel': 1_000_000}, {'time_limit': 0.5}):
+        start = time.perf_counter()
+        try:
+            run_module(infinite, MeteredMachine(**kwargs))
+        except OutOfFuel as e:
+            print(f"while true con {kwargs}: {e} ({time.perf_counter() - start:.3f} s)")
+
+if __name__ == '__main__':
+    main()
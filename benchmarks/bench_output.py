@@ -0,0 +1,61 @@
+# bench_output.py
+'''
+Rendimiento de la salida: un programa que imprime N números escribiendo
+en un archivo real, con DirectSink (un write + flush por valor impreso,
+como el print(..., flush=True) anterior) y con BufferedSink.
+
+    python -m benchmarks.bench_output
+'''
+import os
+import tempfile
+
+from benchmarks.common import best_time, compile_source, load_vm
+from output import BufferedSink, DirectSink
+from python_backend import PythonProgram
+from stack_machine import StackMachine
+
+COUNT_SOURCE = """
+func count(n int) int {
+    var i int = 0;
+    while i < n {
+        print i;
+        print ' ';
+        i = i + 1;
+    }
+    return n;
+}
+print count(%d);
+"""
+
+def make_sink(kind, stream):
+    return DirectSink(stream) if kind == 'direct' else BufferedSink(stream)
+
+def run_stack(module, sink):
+    load_vm(module, StackMachine(sink)).run()
+
+def run_python(module, sink):
+    PythonProgram(module, output=sink).run()
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'out.txt')
+        print(f"{'motor':<10}{'N':>9}{'direct':>10}{'buffered':>10}{'speedup':>9}{'writes':>9}")
+        for engine, n in ((run_stack, 20_000), (run_python, 100_000)):
+            module = compile_source(COUNT_SOURCE % n)
+            times = {}
+            for kind in ('direct', 'buffered'):
+                def run():
+                    with open(path, 'w') as stream:
+                        sink = make_sink(kind, stream)
+                        engine(module, sink)
+                    return sink
+                times[kind] = best_time(run)
+                sink = run()
+                with open(path) as f:
+                    assert f.read().split() == [str(i) for i in range(n)] + [str(n)]
+            name = engine.__name__[len('run_'):]
+            print(f"{name:<10}{n:>9}{times['direct']:>10.3f}{times['buffered']:>10.3f}"
+                  f"{times['direct'] / times['buffered']:>8.1f}x{sink.writes:>9}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# bench_peephole.py
+'''
+Peephole sobre todos los programas de samples/: instrucciones del
+módulo antes y después, instrucciones ejecutadas por la StackMachine
+y cuántas veces se aplicó cada regla.
+
+    python -m benchmarks.bench_peephole
+'''
+from collections import Counter
+
+from benchmarks.common import SAMPLES, best_time, compile_file, load_vm, run_module
+from optimizer.constfold import fold_module
+from optimizer.passes import instruction_count
+from optimizer.peephole import peephole_module
+
+def executed(module):
+    vm = load_vm(module)
+    trace = vm.enable_trace(size=1)
+    run_module(module, vm)
+    return trace.count
+
+def main():
+    print(f"{'programa':<20}{'antes':>7}{'después':>9}{'quitadas':>10}"
+          f"{'ejec antes':>12}{'ejec después':>14}{'ms antes':>10}{'ms después':>12}")
+    rules = {}
+    for path in SAMPLES:
+        base = fold_module(compile_file(path))
+        module = fold_module(compile_file(path))
+        stats = Counter()
+        peephole_module(module, stats)
+        rules[path] = stats
+        assert run_module(module)[1] == run_module(base)[1], f"{path}: salida distinta"
+
+        before, after = instruction_count(base), instruction_count(module)
+        t_base = best_time(lambda: run_module(base))
+        t_peephole = best_time(lambda: run_module(module))
+        print(f"{path:<20}{before:>7}{after:>9}{before - after:>10}"
+              f"{executed(base):>12}{executed(module):>14}"
+              f"{1000 * t_base:>10.2f}{1000 * t_peephole:>12.2f}")
+
+    print()
+    for path, stats in rules.items():
+        applied = ', '.join(f"{name} {count}" for name, count in sorted(stats.items()))
+        print(f"{path:<20}{applied or '-'}")
+
+if __name__ == '__main__':
+    main()
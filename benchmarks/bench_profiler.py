@@ -0,0 +1,38 @@
+# bench_profiler.py
+'''
+Costo del perfilador: ejecuta samples/sho.gox en la StackMachine y en la
+ProfilingMachine, reporta la sobrecarga y el perfil obtenido. Con
+--folded/--pstats guarda los datos para flamegraph.pl o pstats.
+
+    python -m benchmarks.bench_profiler [N] [--folded sho.folded] [--pstats sho.prof]
+'''
+import argparse
+
+from benchmarks.common import SHOR_N, best_time, compile_file, run_module
+from profiler import ProfilingMachine
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('n', nargs='?', type=int, default=SHOR_N)
+    parser.add_argument('--folded')
+    parser.add_argument('--pstats')
+    args = parser.parse_args()
+
+    module = compile_file('samples/sho.gox', args.n)
+    _, expected = run_module(module)
+    t_plain = best_time(lambda: run_module(module), repeat=1)
+
+    vm, output = run_module(module, ProfilingMachine())
+    assert output == expected
+    t_profiled = best_time(lambda: run_module(module, ProfilingMachine()), repeat=1)
+
+    print(f"shor({args.n}): normal {t_plain:.3f} s, perfilado {t_profiled:.3f} s "
+          f"(sobrecarga {t_profiled / t_plain:.2f}x)\n")
+    print(vm.report())
+    if args.folded:
+        vm.dump_folded(args.folded)
+    if args.pstats:
+        vm.dump_stats(args.pstats)
+
+if __name__ == '__main__':
+    main()
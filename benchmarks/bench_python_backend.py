@@ -0,0 +1,51 @@
+# bench_python_backend.py
+'''
+Compara la StackMachine, la ClosureMachine y el backend de Python en los
+samples. Verifica que las salidas sean idénticas y mide por separado la
+carga del backend sin caché (genera y escribe el código) y con caché.
+
+    python -m benchmarks.bench_python_backend
+'''
+import contextlib
+import io
+import os
+import shutil
+import time
+
+from benchmarks.bench_closure import run_closures
+from benchmarks.common import SAMPLES, best_time, compile_file, run_module
+from python_backend import CACHE_DIR, PythonProgram
+
+def run_python(program):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        program.run()
+    return out.getvalue()
+
+def load_time(module, path):
+    start = time.perf_counter()
+    PythonProgram(module, path)
+    return time.perf_counter() - start
+
+def main():
+    print(f"{'sample':<20}{'sin caché':>10}{'con caché':>10}{'stack':>9}"
+          f"{'closures':>10}{'python':>9}{'vs stack':>10}")
+    for path in SAMPLES:
+        module = compile_file(path)
+        _, expected = run_module(module)
+        shutil.rmtree(os.path.join(os.path.dirname(path), CACHE_DIR), ignore_errors=True)
+
+        t_cold = load_time(module, path)
+        t_warm = load_time(module, path)
+        program = PythonProgram(module, path)
+        assert not program.fallback, program.reason
+        assert run_python(program) == expected, f"{path}: la salida difiere"
+
+        t_stack = best_time(lambda: run_module(module))
+        t_closure = best_time(lambda: run_closures(module))
+        t_python = best_time(lambda: run_python(program))
+        print(f"{path:<20}{t_cold:>10.4f}{t_warm:>10.4f}{t_stack:>9.3f}"
+              f"{t_closure:>10.3f}{t_python:>9.4f}{t_stack / t_python:>9.0f}x")
+
+if __name__ == '__main__':
+    main()
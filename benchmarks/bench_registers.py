@@ -0,0 +1,41 @@
+# bench_registers.py
+'''
+StackMachine contra RegisterMachine en todos los programas de samples/:
+tiempo e instrucciones despachadas por cada máquina. Las instrucciones
+de la StackMachine se cuentan en una corrida aparte con la traza
+activada (ExecutionTrace.count).
+
+    python -m benchmarks.bench_registers
+'''
+from benchmarks.common import SAMPLES, best_time, compile_file, load_vm, run_module
+from output import CaptureSink
+from register_machine import RegisterMachine, lower_module
+
+def run_registers(functions):
+    machine = RegisterMachine(CaptureSink())
+    machine.functions.update(functions)
+    machine.run()
+    return machine
+
+def main():
+    print(f"{'programa':<20}{'stack ms':>10}{'reg ms':>10}{'speedup':>9}"
+          f"{'instr stack':>13}{'instr reg':>11}{'razón':>8}")
+    for path in SAMPLES:
+        module = compile_file(path)
+        functions = lower_module(module)
+        _, expected = run_module(module)
+        assert run_registers(functions).output.getvalue() == expected, f"{path}: salida distinta"
+
+        vm = load_vm(module)
+        trace = vm.enable_trace(size=1)
+        run_module(module, vm)
+        stack_steps = trace.count
+        register_steps = run_registers(functions).steps
+
+        t_stack = best_time(lambda: run_module(module))
+        t_registers = best_time(lambda: run_registers(functions))
+        print(f"{path:<20}{1000 * t_stack:>10.2f}{1000 * t_registers:>10.2f}{t_stack / t_registers:>8.1f}x"
+              f"{stack_steps:>13}{register_steps:>11}{stack_steps / register_steps:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
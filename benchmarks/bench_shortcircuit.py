@@ -0,0 +1,88 @@
+# bench_shortcircuit.py
+'''
+Cortocircuito de && y ||: instrucciones ejecutadas y tiempo en la
+StackMachine, con -O0 y -O2, para un ciclo con guardas (un recorrido de
+memoria que solo llama a valid(i) cuando el lado izquierdo no decide).
+
+Se compara el programa tal cual, donde las condiciones de while e if
+saltan directamente con IF/CBREAK anidados, con el mismo programa
+escribiendo cada condición como (c) == true, que obliga a guardar el
+valor 0/1 de c en una temporal antes de probarlo. Las dos versiones
+evalúan el lado derecho solo cuando hace falta (la salida incluye las
+llamadas a valid); la diferencia es el costo de materializar el valor.
+
+    python -m benchmarks.bench_shortcircuit
+'''
+import re
+
+from benchmarks.common import best_time, compile_source, run_module
+from optimizer.passes import PassManager
+from output import CaptureSink
+from profiler import ProfilingMachine
+
+GUARDS = """
+const size = 64;
+const mem = ^(size * 8);
+var probes int = 0;
+
+func valid(i int) bool {
+    probes = probes + 1;
+    return `(mem + i * 8) != 0;
+}
+
+func fill() {
+    var i int = 0;
+    while (i < size) {
+        if (i / 3 * 3 == i) {
+            `(mem + i * 8) = i;
+        }
+        i = i + 1;
+    }
+}
+
+func scan(rounds int) int {
+    var total int = 0;
+    var r int = 0;
+    while (r < rounds) {
+        var i int = 0;
+        while (i < size && i - r / 4 < 48) {
+            if (i > 0 && valid(i)) {
+                total = total + 1;
+            }
+            if (i / 2 * 2 == i || valid(i)) {
+                total = total + 2;
+            }
+            i = i + 1;
+        }
+        r = r + 1;
+    }
+    return total;
+}
+
+fill();
+print scan(200);
+print ' ';
+print probes;
+"""
+
+# La misma fuente con las condiciones materializadas
+MATERIALIZED = re.sub(r'^( *(?:while|if) .*\)) \{$', r'\1 == true {', GUARDS, flags=re.M)
+
+def executed(module):
+    vm, _ = run_module(module, ProfilingMachine(CaptureSink()))
+    return sum(n for n, _ in vm.opcodes.values())
+
+def main():
+    print(f"{'nivel':<8}{'instr':>22}{'ms':>18}  salida")
+    for level in (0, 2):
+        base = PassManager(level).run(compile_source(MATERIALIZED))
+        module = PassManager(level).run(compile_source(GUARDS))
+        output = run_module(module)[1]
+        assert run_module(base)[1] == output, f"-O{level}: salida distinta"
+        t_base = best_time(lambda: run_module(base))
+        t_branch = best_time(lambda: run_module(module))
+        print(f"{f'-O{level}':<8}{f'{executed(base)} -> {executed(module)}':>22}"
+              f"{f'{1000 * t_base:.1f} -> {1000 * t_branch:.1f}':>18}  {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# bench_tailcall.py
+'''
+Llamadas de cola: sum(n, acc) recursiva con y sin la pasada tailcall,
+en la StackMachine (tiempo y profundidad máxima de call_stack) y en la
+ClosureMachine, que usa la pila de Python y sin la pasada no pasa del
+límite de recursión.
+
+    python -m benchmarks.bench_tailcall
+'''
+import contextlib
+import io
+
+from benchmarks.common import best_time, compile_source, run_module
+from closure_machine import ClosureMachine
+from optimizer.tailcall import tailcall_module
+from stack_machine import StackMachine
+
+SOURCE = """
+func sum(n int, acc int) int {
+    if n == 0 {
+        return acc;
+    }
+    return sum(n - 1, acc + n);
+}
+print sum(%d, 0);
+"""
+
+class DepthMachine(StackMachine):
+    # Registra la profundidad máxima de call_stack
+    def __init__(self):
+        super().__init__()
+        self.max_depth = 0
+
+    def op_CALL(self, name):
+        super().op_CALL(name)
+        self.max_depth = max(self.max_depth, len(self.call_stack))
+
+def run_closures(module):
+    machine = ClosureMachine()
+    machine.load_module(module)
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            machine.run()
+        except RecursionError:
+            return False
+    return True
+
+def main():
+    print(f"{'n':>8}{'variante':>10}{'ms':>10}{'frames':>9}{'closures':>10}")
+    for n in (1_000, 10_000, 100_000):
+        for name, optimize in (('-', False), ('tailcall', True)):
+            module = compile_source(SOURCE % n)
+            if optimize:
+                tailcall_module(module)
+            vm, output = run_module(module, DepthMachine())
+            assert output == str(n * (n + 1) // 2)
+            elapsed = best_time(lambda: run_module(module), repeat=1)
+            closures = 'ok' if run_closures(module) else 'recursión'
+            print(f"{n:>8}{name:>10}{1000 * elapsed:>10.1f}{vm.max_depth:>9}{closures:>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# common.py
+'''
+Utilidades compartidas por los benchmarks.
+
+Los scripts de esta carpeta se ejecutan desde la raíz del proyecto como
+módulos, por ejemplo:
+
+    python -m benchmarks.opcode_pairs
+
+Compilan los archivos de samples/ a un IRModule (silenciando la tabla de
+símbolos que imprime el verificador) y los ejecutan en la StackMachine.
+'''
+import contextlib
+import io
+import time
+
+from program import compile_source
+from stack_machine import StackMachine
+
+# Programas de ejemplo que compilan y terminan en la StackMachine
+SAMPLES = [
+    'samples/basic.gox',
+    'samples/criba.gox',
+    'samples/print.gox',
+    'samples/sho.gox',
+]
+
+# N usado para shor en las mediciones (151821 tarda demasiado)
+SHOR_N = 3127
+
+def read_sample(path, shor_n=SHOR_N):
+    txt = open(path, encoding='utf-8').read()
+    if shor_n is not None:
+        txt = txt.replace('shor(151821)', f'shor({shor_n})')
+    return txt
+
+def compile_file(path, shor_n=SHOR_N):
+    return compile_source(read_sample(path, shor_n))
+
+def load_vm(module, vm=None):
+    '''
+    Carga todas las funciones del módulo en una StackMachine y deja
+    como programa principal la función main.
+    '''
+    vm = vm or StackMachine()
+    vm.load_functions({name: func.code for name, func in module.functions.items()},
+                      {name: func.parmnames for name, func in module.functions.items()})
+    vm.load_program(module.functions['main'].code)
+    return vm
+
+def run_module(module, vm=None):
+    '''
+    Ejecuta el módulo y retorna (vm, salida impresa).
+    '''
+    vm = load_vm(module, vm)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        vm.run()
+    return vm, out.getvalue()
+
+def best_time(fn, repeat=3):
+    '''
+    Mejor tiempo (segundos) de `repeat` ejecuciones de fn().
+    '''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
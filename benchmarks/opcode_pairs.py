@@ -0,0 +1,78 @@
+# opcode_pairs.py
+'''
+Frecuencia de pares de opcodes en los samples.
+
+Cuenta los pares (op1, op2) adyacentes tanto en el código generado
+(estático) como en las instrucciones ejecutadas por la StackMachine
+(dinámico), además de las ternas más frecuentes. Solo se cuentan
+instrucciones consecutivas de la misma función, que son las únicas que
+se pueden fusionar. Estas cifras son las que justifican el conjunto de
+superinstrucciones de optimizer/fusion.py.
+
+    python -m benchmarks.opcode_pairs
+'''
+from collections import Counter
+
+from benchmarks.common import SAMPLES, compile_file, run_module
+from stack_machine import StackMachine
+
+class PairCountingMachine(StackMachine):
+    '''
+    StackMachine que cuenta los pares de opcodes ejecutados.
+    '''
+    def __init__(self):
+        super().__init__()
+        self.pairs = Counter()
+        self.triples = Counter()
+
+    def run(self):
+        self.pc = 0
+        self.running = True
+        window = ()
+        last = (None, -1)
+        while self.running and self.pc < len(self.program):
+            opname = self.program[self.pc][0]
+            if last != (self.program, self.pc - 1):
+                window = ()
+            window = window[-2:] + (opname,)
+            if len(window) >= 2:
+                self.pairs[window[-2:]] += 1
+            if len(window) == 3:
+                self.triples[window] += 1
+            last = (self.program, self.pc)
+            getattr(self, f"op_{opname}")(*self.program[self.pc][1:])
+            self.pc += 1
+
+def static_counts(module):
+    pairs = Counter()
+    triples = Counter()
+    for func in module.functions.values():
+        ops = [instr[0] for instr in func.code]
+        pairs.update(zip(ops, ops[1:]))
+        triples.update(zip(ops, ops[1:], ops[2:]))
+    return pairs, triples
+
+def report(title, static, dynamic, limit):
+    total = sum(dynamic.values())
+    print(f"{title:<34}{'estático':>10}{'dinámico':>12}{'%':>8}")
+    for key, count in dynamic.most_common(limit):
+        print(f"{' '.join(key):<34}{static[key]:>10}{count:>12}{100 * count / total:>8.1f}")
+    print()
+
+def main():
+    static_pairs, static_triples = Counter(), Counter()
+    dynamic_pairs, dynamic_triples = Counter(), Counter()
+    for path in SAMPLES:
+        module = compile_file(path)
+        pairs, triples = static_counts(module)
+        static_pairs.update(pairs)
+        static_triples.update(triples)
+        vm, _ = run_module(module, PairCountingMachine())
+        dynamic_pairs.update(vm.pairs)
+        dynamic_triples.update(vm.triples)
+
+    report('par', static_pairs, dynamic_pairs, 20)
+    report('terna', static_triples, dynamic_triples, 15)
+
+if __name__ == '__main__':
+    main()
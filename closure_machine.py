@@ -0,0 +1,463 @@
+# closure_machine.py
+'''
+Motor de ejecución basado en closures
+=====================================
+
+La StackMachine interpreta la lista de tuplas de cada función: por cada
+instrucción busca el método op_XXX, apila y desapila valores etiquetados
+y, en los saltos, recorre el código buscando el ELSE/ENDIF/ENDLOOP
+correspondiente. Este motor hace ese trabajo una sola vez, al cargar el
+módulo: cada IRFunction.code se traduce a un árbol de closures de Python.
+
+  * Las expresiones se reconstruyen simulando la pila durante la
+    compilación. `LOCAL_GET a; CONSTI 1; ADDI` se convierte en una sola
+    closure `lambda frame: frame[a] + 1`. En ejecución no hay pila.
+  * Las variables locales viven en una lista (frame) indexada por slot.
+  * Cada sentencia (LOCAL_SET, PRINTI, IF, LOOP, ...) es una closure que
+    retorna None o una señal (_BREAK, _CONTINUE, _RETURN).
+  * IF/ELSE/ENDIF y LOOP/CBREAK/ENDLOOP se convierten en if/while de
+    Python dentro de la closure del bloque.
+
+Los valores quedan en la pila simbólica hasta que una sentencia los
+consume. Si una sentencia se ejecuta mientras hay valores pendientes
+debajo de sus operandos, éstos se calculan primero en un slot temporal,
+de modo que el orden de los efectos (llamadas, impresiones) es el mismo
+que en la StackMachine.
+
+Cada llamada de GoxLang es una llamada de Python (varias, con las
+closures anidadas), así que la profundidad de recursión está limitada
+por sys.getrecursionlimit(): una recursión que no es de cola de unos
+pocos cientos de niveles ya lo excede. En ese caso call() lanza
+RuntimeError, como los demás errores de ejecución; la StackMachine, que
+guarda las llamadas en su propia pila, no tiene ese límite. No se
+reintenta allí porque los efectos de la ejecución parcial (impresiones,
+globales) ya ocurrieron.
+
+Uso:
+
+    machine = ClosureMachine()
+    machine.load_module(module)
+    machine.run()                  # ejecuta main
+    machine.call('gcd', 48, 18)    # o cualquier otra función
+'''
+from memory import Memory
+from output import BufferedSink
+from optimizer.fusion import expand_code
+
+# Señales que retornan las sentencias para salir de ciclos y funciones
+_BREAK = 'break'
+_CONTINUE = 'continue'
+_RETURN = 'return'
+
+_ARITH = {
+    'ADDI': '+', 'SUBI': '-', 'MULI': '*', 'DIVI': '//',
+    'ADDF': '+', 'SUBF': '-', 'MULF': '*', 'DIVF': '/',
+}
+
+_COMPARE = {
+    'LTI': '<', 'LEI': '<=', 'GTI': '>', 'GEI': '>=', 'EQI': '==', 'NEI': '!=',
+    'LTF': '<', 'LEF': '<=', 'GTF': '>', 'GEF': '>=', 'EQF': '==', 'NEF': '!=',
+}
+
+# Operaciones de memoria: retornan un valor (lectura/GROW) o escriben
+_MEMORY_READ = {'PEEKI', 'PEEKF', 'PEEKB', 'GROW'}
+_MEMORY_WRITE = {'POKEI', 'POKEF', 'POKEB'}
+
+# Cómo se lee cada tipo de operando dentro de una closure especializada
+_OPERAND = {
+    'const': '{}',
+    'local': 'frame[{}]',
+    'expr': '{}(frame)',
+}
+
+_factories = {}
+
+def _factory(template, kinds):
+    '''
+    Retorna una fábrica factory(a, b) que construye una closure para la
+    plantilla dada, especializada según el tipo de cada operando. Por
+    ejemplo '{a} + {b}' con ('local', 'const') produce
+    lambda frame: frame[a] + b. Las fábricas se generan una sola vez.
+    '''
+    key = (template, kinds)
+    if key not in _factories:
+        operands = {name: _OPERAND[kind].format(name) for name, kind in zip('ab', kinds)}
+        source = (f"def factory(a=None, b=None):\n"
+                  f"    return lambda frame: {template.format(**operands)}\n")
+        namespace = {}
+        exec(source, namespace)
+        _factories[key] = namespace['factory']
+    return _factories[key]
+
+class _Value:
+    '''
+    Valor en la pila simbólica. kind es 'const' (arg = valor), 'local'
+    (arg = slot) o 'expr' (arg = closure). Las comparaciones guardan
+    además (símbolo, a, b, negada) para generar pruebas sin pasar por 0/1.
+    '''
+    __slots__ = ('kind', 'arg', 'compare')
+
+    def __init__(self, kind, arg, compare=None):
+        self.kind = kind
+        self.arg = arg
+        self.compare = compare
+
+    def closure(self):
+        return _factory('{a}', (self.kind,))(self.arg)
+
+    def test(self):
+        # Closure que retorna la veracidad del valor
+        if self.compare:
+            symbol, a, b, negated = self.compare
+            template = f'not ({{a}} {symbol} {{b}})' if negated else f'{{a}} {symbol} {{b}}'
+            return _factory(template, (a.kind, b.kind))(a.arg, b.arg)
+        return self.closure()
+
+    def negated(self):
+        symbol, a, b, negated = self.compare
+        return _Value(self.kind, self.arg, (symbol, a, b, not negated))
+
+def _sequence(statements):
+    if len(statements) == 1:
+        return statements[0]
+    statements = tuple(statements)
+
+    def run(frame):
+        for statement in statements:
+            signal = statement(frame)
+            if signal is not None:
+                return signal
+    return run
+
+def _noop(frame):
+    return None
+
+def _loop(body, exit_test):
+    if exit_test is not None:
+        # El cuerpo comienza con CBREAK: while not <prueba de salida>
+        def run(frame):
+            while not exit_test(frame):
+                signal = body(frame)
+                if signal is not None and signal is not _CONTINUE:
+                    return None if signal is _BREAK else signal
+    else:
+        def run(frame):
+            while True:
+                signal = body(frame)
+                if signal is not None and signal is not _CONTINUE:
+                    return None if signal is _BREAK else signal
+    return run
+
+def _if(test, then, orelse):
+    if orelse is None:
+        def run(frame):
+            if test(frame):
+                return then(frame)
+    else:
+        def run(frame):
+            if test(frame):
+                return then(frame)
+            return orelse(frame)
+    return run
+
+class _FunctionCompiler:
+    '''
+    Traduce el código de una IRFunction a una closure invocable con los
+    argumentos de la función.
+    '''
+    def __init__(self, machine, func):
+        self.machine = machine
+        self.func = func
+        self.module = func.module
+        self.slots = {name: index for index, name in enumerate(func.parmnames)}
+        for name in func.locals:
+            self._slot(name)
+        self.ret_slot = self._slot('$ret')
+        self.temps = set()
+        self.code = expand_code(func.code)
+
+    def _slot(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.slots)
+        return self.slots[name]
+
+    def _new_temp(self):
+        slot = self._slot(f'$t{len(self.slots)}')
+        self.temps.add(slot)
+        return slot
+
+    def compile(self):
+        statements, pc = self._block(0, ())
+        if pc != len(self.code):
+            raise RuntimeError(f"{self.code[pc][0]} sin bloque correspondiente en '{self.func.name}'")
+        body = _sequence(statements) if statements else _noop
+        nparams = len(self.func.parmnames)
+        padding = (None,) * (len(self.slots) - nparams)
+        ret_slot = self.ret_slot
+        name = self.func.name
+
+        def invoke(*args):
+            if len(args) != nparams:
+                raise RuntimeError(f"Función '{name}' espera {nparams} argumentos")
+            frame = [*args, *padding]
+            if body(frame) is _RETURN:
+                return frame[ret_slot]
+        return invoke
+
+    # --- Pila simbólica
+
+    def _materialize(self, stack, statements):
+        # Calcula en temporales los valores pendientes antes de una sentencia
+        for index, value in enumerate(stack):
+            if value.kind == 'const' or (value.kind == 'local' and value.arg in self.temps):
+                continue
+            slot = self._new_temp()
+            statements.append(self._store(slot, value))
+            stack[index] = _Value('local', slot)
+
+    def _emit(self, stack, statements, statement):
+        self._materialize(stack, statements)
+        statements.append(statement)
+
+    def _store(self, slot, value):
+        fn = value.closure()
+
+        def run(frame):
+            frame[slot] = fn(frame)
+        return run
+
+    def _discard(self, value):
+        fn = value.closure()
+
+        def run(frame):
+            fn(frame)
+        return run
+
+    @staticmethod
+    def _pop(stack, count):
+        if len(stack) < count:
+            raise RuntimeError("Pila desbalanceada")
+        values = stack[len(stack) - count:]
+        del stack[len(stack) - count:]
+        return values
+
+    def _binop(self, opname, a, b):
+        if opname in _ARITH:
+            symbol = _ARITH[opname]
+            if a.kind == b.kind == 'const' and not (symbol in ('//', '/') and b.arg == 0):
+                return _Value('const', eval(f'a {symbol} b', {'a': a.arg, 'b': b.arg}))
+            fn = _factory(f'{{a}} {symbol} {{b}}', (a.kind, b.kind))(a.arg, b.arg)
+            return _Value('expr', fn)
+        symbol = _COMPARE[opname]
+        fn = _factory(f'1 if {{a}} {symbol} {{b}} else 0', (a.kind, b.kind))(a.arg, b.arg)
+        return _Value('expr', fn, (symbol, a, b, False))
+
+    def _call(self, name, args):
+        functions = self.machine.functions
+        args = tuple(arg.closure() for arg in args)
+        if len(args) == 0:
+            return lambda frame: functions[name]()
+        if len(args) == 1:
+            a, = args
+            return lambda frame: functions[name](a(frame))
+        if len(args) == 2:
+            a, b = args
+            return lambda frame: functions[name](a(frame), b(frame))
+        if len(args) == 3:
+            a, b, c = args
+            return lambda frame: functions[name](a(frame), b(frame), c(frame))
+        return lambda frame: functions[name](*[arg(frame) for arg in args])
+
+    # --- Bloques y sentencias
+
+    def _block(self, pc, stops):
+        '''
+        Compila instrucciones desde pc hasta encontrar un opcode en stops.
+        Retorna (lista de sentencias, pc del opcode de parada).
+        '''
+        code = self.code
+        stack = []
+        statements = []
+        while pc < len(code):
+            instr = code[pc]
+            opname = instr[0]
+            if opname in stops:
+                break
+
+            if opname in ('CONSTI', 'CONSTF'):
+                stack.append(_Value('const', instr[1]))
+            elif opname in _ARITH or opname in _COMPARE:
+                a, b = self._pop(stack, 2)
+                if (opname == 'SUBI' and a.kind == 'const' and a.arg == 1 and b.compare):
+                    stack.append(b.negated())        # 1 - (prueba)
+                elif (opname == 'EQI' and b.kind == 'const' and b.arg == 0 and a.compare):
+                    stack.append(a.negated())        # (prueba) == 0
+                else:
+                    stack.append(self._binop(opname, a, b))
+            elif opname == 'ITOF':
+                a, = self._pop(stack, 1)
+                stack.append(_Value('expr', _factory('float({a})', (a.kind,))(a.arg)))
+            elif opname == 'FTOI':
+                a, = self._pop(stack, 1)
+                stack.append(_Value('expr', _factory('int({a})', (a.kind,))(a.arg)))
+            elif opname == 'LOCAL_GET':
+                stack.append(_Value('local', self._slot(instr[1])))
+            elif opname == 'GLOBAL_GET':
+                stack.append(_Value('expr', self._global_get(instr[1])))
+            elif opname == 'CALL':
+                callee = self.module.functions.get(instr[1])
+                if callee is None:
+                    raise RuntimeError(f"Función '{instr[1]}' no definida")
+                args = self._pop(stack, len(callee.parmnames))
+                value = _Value('expr', self._call(instr[1], args))
+                if callee.return_type:
+                    stack.append(value)
+                else:
+                    self._emit(stack, statements, self._discard(value))
+
+            elif opname == 'LOCAL_SET':
+                value, = self._pop(stack, 1)
+                self._emit(stack, statements, self._store(self._slot(instr[1]), value))
+            elif opname == 'GLOBAL_SET':
+                value, = self._pop(stack, 1)
+                self._emit(stack, statements, self._global_set(instr[1], value))
+            elif opname in ('PRINTI', 'PRINTF', 'PRINTB'):
+                value, = self._pop(stack, 1)
+                self._emit(stack, statements, self._print(opname, value))
+            elif opname in _MEMORY_READ:
+                operand, = self._pop(stack, 1)
+                stack.append(_Value('expr', self._memory_read(opname, operand)))
+            elif opname in _MEMORY_WRITE:
+                addr, value = self._pop(stack, 2)
+                self._emit(stack, statements, self._memory_write(opname, addr, value))
+            elif opname == 'FLUSH':
+                flush = self.machine.output.flush
+                self._emit(stack, statements, lambda frame: flush())
+            elif opname == 'RET':
+                value = self._pop(stack, 1)[0] if stack else None
+                self._emit(stack, statements, self._return(value))
+            elif opname == 'IF':
+                test, = self._pop(stack, 1)
+                self._materialize(stack, statements)
+                then, pc = self._block(pc + 1, ('ELSE', 'ENDIF'))
+                orelse = []
+                if pc < len(code) and code[pc][0] == 'ELSE':
+                    orelse, pc = self._block(pc + 1, ('ENDIF',))
+                if pc >= len(code):
+                    raise RuntimeError("IF sin ENDIF correspondiente")
+                statements.append(_if(test.test(),
+                                      _sequence(then) if then else _noop,
+                                      _sequence(orelse) if orelse else None))
+            elif opname == 'LOOP':
+                self._materialize(stack, statements)
+                body, pc = self._block(pc + 1, ('ENDLOOP',))
+                if pc >= len(code):
+                    raise RuntimeError("LOOP sin ENDLOOP correspondiente")
+                exit_test = getattr(body[0], 'exit_test', None) if body else None
+                if exit_test is not None:
+                    body = body[1:]
+                statements.append(_loop(_sequence(body) if body else _noop, exit_test))
+            elif opname == 'CBREAK':
+                test, = self._pop(stack, 1)
+                self._emit(stack, statements, self._cbreak(test.test()))
+            elif opname == 'CONTINUE':
+                self._emit(stack, statements, lambda frame: _CONTINUE)
+            else:
+                raise RuntimeError(f"Instrucción no soportada: {opname}")
+            pc += 1
+
+        # Valores que nadie consumió (p.ej. el resultado de una llamada
+        # usada como sentencia): se evalúan y se descartan.
+        for value in stack:
+            if value.kind == 'expr':
+                statements.append(self._discard(value))
+        return statements, pc
+
+    def _global_get(self, name):
+        globals_ = self.machine.globals
+
+        def run(frame):
+            if name not in globals_:
+                raise RuntimeError(f"Variable global '{name}' no definida")
+            return globals_[name]
+        return run
+
+    def _global_set(self, name, value):
+        globals_ = self.machine.globals
+        fn = value.closure()
+
+        def run(frame):
+            globals_[name] = fn(frame)
+        return run
+
+    def _memory_read(self, opname, operand):
+        method = getattr(self.machine.memory, opname.lower())
+        fn = operand.closure()
+        return lambda frame: method(fn(frame))
+
+    def _memory_write(self, opname, addr, value):
+        method = getattr(self.machine.memory, opname.lower())
+        a = addr.closure()
+        v = value.closure()
+
+        def run(frame):
+            method(a(frame), v(frame))
+        return run
+
+    def _print(self, opname, value):
+        write = self.machine.output.write
+        fn = value.closure()
+        if opname == 'PRINTB':
+            def run(frame):
+                write(chr(fn(frame)))
+        else:
+            def run(frame):
+                write(str(fn(frame)))
+        return run
+
+    def _return(self, value):
+        if value is None:
+            return lambda frame: _RETURN
+        slot = self.ret_slot
+        fn = value.closure()
+
+        def run(frame):
+            frame[slot] = fn(frame)
+            return _RETURN
+        return run
+
+    @staticmethod
+    def _cbreak(test):
+        def run(frame):
+            if test(frame):
+                return _BREAK
+        run.exit_test = test
+        return run
+
+class ClosureMachine:
+    '''
+    Ejecuta un IRModule compilando cada función a closures.
+    '''
+    def __init__(self, output=None):
+        self.globals = {}                     # Variables globales
+        self.memory = Memory()                # Memoria lineal
+        self.output = output if output is not None else BufferedSink()
+        self.functions = {}                   # Nombre -> función compilada
+
+    def load_module(self, module):
+        for name, func in module.functions.items():
+            self.functions[name] = _FunctionCompiler(self, func).compile()
+
+    def call(self, name, *args):
+        if name not in self.functions:
+            raise RuntimeError(f"Función '{name}' no definida")
+        try:
+            return self.functions[name](*args)
+        except RecursionError:
+            raise RuntimeError(f"Recursión demasiado profunda en '{name}' "
+                               "(límite de la ClosureMachine; usar la StackMachine)") from None
+        finally:
+            self.output.flush()
+
+    def run(self):
+        return self.call('main')
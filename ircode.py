@@ -89,6 +89,9 @@ nuestro Código IR:
     PEEKB                    ; Leer byte desde memoria (dirección en la pila)
     POKEB                    ; Escribir byte en memoria (valor, dirección en la pila)
 
+    ; Salida
+    FLUSH                    ; Entregar la salida acumulada (ver output.py)
+
     ; Carga/almacenamiento de variables.
     ; Estas instrucciones leen/escriben variables locales y globales. Las variables
     ; son referenciadas por algún tipo de nombre que las identifica. La gestión
@@ -117,7 +120,7 @@ nuestro Código IR:
     ENDLOOP                  ; Fin del ciclo
 
     ; Memoria
-    GROW                     ; Incrementar memoria (tamaño en la pila) (retorna nuevo tamaño)
+    GROW                     ; Incrementar memoria (celdas en la pila) (retorna la dirección base de la nueva región)
 
 Una palabra sobre el acceso a memoria... las instrucciones PEEK y POKE
 se usan para acceder a direcciones de memoria cruda. Ambas instrucciones
@@ -126,6 +129,47 @@ la instrucción POKE, el valor a almacenar se apila después de la dirección
 El orden es importante y es fácil equivocarse. Así que presta mucha
 atención a eso.
 
+La memoria se organiza en celdas de 8 bytes y las direcciones son índices
+de celda: PEEKI/POKEI leen y escriben la celda como entero de 64 bits,
+PEEKF/POKEF como flotante de 64 bits y PEEKB/POKEB el primer byte de la
+celda. GROW n reserva n celdas nuevas y retorna la dirección de la
+primera, de modo que
+
+    const base = ^(n + 1);
+
+reserva las posiciones base .. base + n.
+
+Los operadores lógicos && y || se evalúan en cortocircuito: el operando
+derecho solo se evalúa si el izquierdo no decide el resultado. Como el
+IR no tiene saltos, se traducen a IF. En la prueba de un while o de un
+if no se calcula el valor 0/1, se salta directamente. La salida de un
+while usa la comparación inversa (la de INVERSE_COMPARES en
+optimizer/irutil.py); si la prueba no es una comparación entera (por
+ejemplo una llamada, o una comparación de flotantes, donde la inversa
+no vale con NaN) se usa CONSTI 1; <prueba>; SUBI; CBREAK:
+
+    while a < n && b != 0 {...}        LOOP
+                                         <a>; <n>; GEI; CBREAK
+                                         <b>; CONSTI 0; EQI; CBREAK
+                                         ...
+                                       ENDLOOP
+
+    if a < n && b != 0 {...}           <a < n>; IF
+                                         <b != 0>; IF ... ELSE ENDIF
+                                       ELSE ENDIF
+
+Un if con && y rama else (o con ||) repite la rama else (o la
+consecuencia) en los dos IF; si esa rama es larga, o si el operador se
+usa como valor, el resultado se guarda en una temporal:
+
+    x = a && b;                        <a>; IF
+                                         <b>; LOCAL_SET $temp1
+                                       ELSE
+                                         CONSTI 0; LOCAL_SET $temp1
+                                       ENDIF
+                                       LOCAL_GET $temp1
+                                       LOCAL_SET x
+
 Su tarea
 =========
 Su tarea es la siguiente: Escribe código que recorra la estructura del
@@ -197,6 +241,7 @@ from rich   import print
 from typing import List, Union
 
 from parser.modelo  import *
+from optimizer.irutil import INVERSE_COMPARES
 from semantic.symtab import Symtab
 
 # Todo el código IR se empaquetará en un módulo. Un 
@@ -217,12 +262,14 @@ class IRModule:
 			
 # Variables Globales
 class IRGlobal:
-	def __init__(self, name, type):
+	def __init__(self, name, type, const=False):
 		self.name = name
 		self.type = type
+		self.const = const   # Declarada con const (no se reasigna)
 		
 	def dump(self):
-		print(f"GLOBAL::: {self.name}: {self.type}")
+		kind = 'const' if self.const else 'var'
+		print(f"GLOBAL::: {self.name}: {self.type} ({kind})")
 
 # Las funciones sirven como contenedor de las 
 # instrucciones IR de bajo nivel específicas de cada
@@ -242,10 +289,32 @@ class IRFunction:
 		self.imported = imported
 		self.locals = { }    # Variables Locales
 		self.code = [ ]      # Lista de Instrucciones IR 
+		self.ntemps = 0      # Temporales creadas con new_temp
 		
 	def new_local(self, name, type):
 		self.locals[name] = type
 		
+	# Generar una variable temporal, única dentro de la función. En main
+	# es global: el código del nivel superior no tiene variables locales
+	def new_temp(self, type):
+		while True:
+			self.ntemps += 1
+			name = f'$temp{self.ntemps}'
+			if name not in self.locals and name not in self.parmnames and name not in self.module.globals:
+				break
+		if self.name == 'main':
+			self.module.globals[name] = IRGlobal(name, type)
+		else:
+			self.new_local(name, type)
+		return name
+		
+	# Instrucciones para leer y escribir una temporal creada con new_temp
+	def temp_get(self, name):
+		return ('GLOBAL_GET' if self.name == 'main' else 'LOCAL_GET', name)
+		
+	def temp_set(self, name):
+		return ('GLOBAL_SET' if self.name == 'main' else 'LOCAL_SET', name)
+		
 	def append(self, instr):
 		self.code.append(instr)
 		
@@ -266,10 +335,25 @@ _typemap = {
 	'char' : 'I',
 }
 
-# Generar un nombre de variable temporal único
-def new_temp(n=[0]):
-	n[0] += 1
-	return f'$temp{n[0]}'
+# Instrucción de escritura en memoria según el tipo del valor
+_poke_code = {
+	'int'  : 'POKEI',
+	'bool' : 'POKEI',
+	'float': 'POKEF',
+	'char' : 'POKEB',
+}
+
+# Valor de un literal char tal como lo entrega el lexer ('a', '\n')
+def _char_value(literal):
+	text = literal[1:-1] if literal.startswith("'") else literal
+	return text.encode('latin-1', 'backslashreplace').decode('unicode_escape')
+
+# Operadores de comparación y lógicos (su resultado es bool)
+_bool_ops = {'LT', 'LE', 'GT', 'GE', 'EQ', 'NE', 'LAND', 'LOR'}
+
+# Instrucciones máximas que se repiten en los dos IF de una condición con
+# && o || antes de guardar su valor en una temporal
+_DUPLICATE_LIMIT = 8
 
 # Una función de nivel superior que comenzará a generar IRCode
 
@@ -303,6 +387,9 @@ class IRCode(Visitor):
 		('char', 'GE', 'char') : 'GEI',
 		('char', 'EQ', 'char') : 'EQI',
 		('char', 'NE', 'char') : 'NEI',
+
+		('bool', 'EQ', 'bool') : 'EQI',
+		('bool', 'NE', 'bool') : 'NEI',
 	}
 	_unaryop_code = {
 		('PLUS', 'int')   : [],
@@ -310,7 +397,7 @@ class IRCode(Visitor):
 		('MINUS', 'int')   : [('CONSTI', -1), ('MULI',)],
 		('MINUS', 'float') : [('CONSTF', -1.0), ('MULF',)],
 		('NOT', 'bool')  : [('CONSTI', -1), ('MULI',)],
-		('^', 'int')   : [ ('GROW',) ]
+		('GROW', 'int')   : [ ('GROW',) ]
 	}
 	_typecast_code = {
 		# (from, to) : [ ops ]
@@ -346,6 +433,12 @@ class IRCode(Visitor):
 	
 	def visit(self, n:Assignment, func:IRFunction):
 		#Acepta para Assignment
+		if isinstance(n.loc, MemoryAddress):
+			# POKE: primero la dirección y luego el valor
+			n.loc.address.accept(self, func)
+			n.expr.accept(self, func)
+			func.append((_poke_code[n.loc.type],))
+			return
 		n.expr.accept(self, func)
 		if isinstance(n.loc, NamedLocation):
 			# Determinar si es local o global basado en el scope
@@ -354,15 +447,13 @@ class IRCode(Visitor):
 				func.append(('LOCAL_SET', n.loc.name))
 			else:
 				func.append(('GLOBAL_SET', n.loc.name))
-		else:
-			func.append(('POKEI',))
 
 	def visit(self, n:Print, func:IRFunction):
 		#Acepta para Print, diferencia entre int y float
 		n.expression.accept(self, func)
 		# Determinar el tipo de la expresión
 		expr_type = self._get_expression_type(n.expression)
-		if expr_type == 'int':
+		if expr_type in ('int', 'bool'):
 			func.append(('PRINTI',))
 		elif expr_type == 'float':
 			func.append(('PRINTF',))
@@ -373,6 +464,8 @@ class IRCode(Visitor):
 		if hasattr(expr, 'type'):
 			return expr.type
 		elif isinstance(expr, BinOp):
+			if expr.op in _bool_ops:
+				return 'bool'
 			left_type = self._get_expression_type(expr.left)
 			right_type = self._get_expression_type(expr.right)
 			# Si ambos operandos son del mismo tipo, ese es el tipo resultante
@@ -390,31 +483,54 @@ class IRCode(Visitor):
 		else:
 			raise TypeError(f"No se puede determinar el tipo de la expresión {expr}")
 
+	def _code(self, nodes, func:IRFunction):
+		# Genera el código de los nodos aparte y lo retorna como lista
+		saved, func.code = func.code, []
+		try:
+			for node in nodes:
+				node.accept(self, func)
+			return func.code
+		finally:
+			func.code = saved
+
+	def _if_code(self, test, then, orelse, func:IRFunction):
+		# if test {then} else {orelse}, con && y || como IF anidados
+		if isinstance(test, BinOp) and test.op == 'LAND' and len(orelse) <= _DUPLICATE_LIMIT:
+			inner = self._if_code(test.right, then, orelse, func)
+			return self._if_code(test.left, inner, orelse, func)
+		if isinstance(test, BinOp) and test.op == 'LOR' and len(then) <= _DUPLICATE_LIMIT:
+			inner = self._if_code(test.right, then, orelse, func)
+			return self._if_code(test.left, then, inner, func)
+		return self._code([test], func) + [('IF',)] + then + [('ELSE',)] + orelse + [('ENDIF',)]
+
+	def _exit_code(self, test, func:IRFunction):
+		# Sale del ciclo si test es falsa
+		if isinstance(test, BinOp) and test.op == 'LAND':
+			return self._exit_code(test.left, func) + self._exit_code(test.right, func)
+		if isinstance(test, BinOp) and test.op == 'LOR':
+			return self._if_code(test.left, [], self._exit_code(test.right, func), func)
+		code = self._code([test], func)
+		if code and code[-1][0] in INVERSE_COMPARES:
+			return code[:-1] + [(INVERSE_COMPARES[code[-1][0]],), ('CBREAK',)]
+		return [('CONSTI', 1)] + code + [('SUBI',), ('CBREAK',)]
+
 	def visit(self, n:If, func:IRFunction):
 		#Acepta para If
-		n.test.accept(self, func)
-		func.append(('IF',))
-		for stmt in n.consequence:
-			stmt.accept(self, func)
-		func.append(('ELSE',))
-		if n.alternative:
-			for stmt in n.alternative:
-				stmt.accept(self, func)
-		func.append(('ENDIF',))
+		then = self._code(n.consequence, func)
+		orelse = self._code(n.alternative or [], func)
+		func.extend(self._if_code(n.test, then, orelse, func))
 
 	def visit(self, n:While, func:IRFunction):
 		#Acepta para While
 		func.append(('LOOP',))
-		func.append(('CONSTI', 1))
-		n.test.accept(self, func)
-		func.append(('SUBI',))
-		func.append(('CBREAK',))
+		func.extend(self._exit_code(n.test, func))
 		for stmt in n.body:
 			stmt.accept(self, func)
 		func.append(('ENDLOOP',))
 
 	def visit(self, n:Break, func:IRFunction):
-		#Acepta para Break
+		#Acepta para Break (CBREAK requiere la prueba en la pila)
+		func.append(('CONSTI', 1))
 		func.append(('CBREAK',))
 
 	def visit(self, n:Continue, func:IRFunction):
@@ -443,7 +559,7 @@ class IRCode(Visitor):
 				# Si es global, agregar al módulo
 				if n.value != None:
 					func.append(('GLOBAL_SET', n.name))
-				func.module.globals[n.name] = IRGlobal(n.name, _typemap[n.type])
+				func.module.globals[n.name] = IRGlobal(n.name, _typemap[n.type], n.is_const)
 
 	def visit(self, n:Function, func:IRFunction):
 		#Acepta para Function
@@ -451,11 +567,14 @@ class IRCode(Visitor):
 		new_func = IRFunction(module, n.name, 
 							[p.name for p in n.parameters],
 							[_typemap[p.type] for p in n.parameters],
-							_typemap[n.return_type])
+							_typemap.get(n.return_type))   # None: no retorna valor
 		
 		# Procesar el cuerpo de la función
 		for stmt in n.body:
 			stmt.accept(self, new_func)
+		# RET implícito al final del cuerpo (funciones sin valor de retorno)
+		if not new_func.code or new_func.code[-1] != ('RET',):
+			new_func.append(('RET',))
 
 	# --- Expressions
 	
@@ -467,8 +586,8 @@ class IRCode(Visitor):
 		#Acepta para Float
 		func.append(('CONSTF', n.value))
 	def visit(self, n:Char, func:IRFunction):
-		#Acepta para Char
-		func.append(('CONSTB', n.value))
+		#Acepta para Char (se representa como el código del carácter)
+		func.append(('CONSTI', ord(_char_value(n.value))))
 
 	def visit(self, n:Bool, func:IRFunction):
 		#Acepta para Bool
@@ -476,6 +595,25 @@ class IRCode(Visitor):
 
 	def visit(self, n:BinOp, func:IRFunction):
 		#Acepta para BinOp
+		if n.op in ('LAND', 'LOR'):
+			# Cortocircuito: el valor queda en una temporal
+			temp = func.new_temp('I')
+			n.left.accept(self, func)
+			func.append(('IF',))
+			if n.op == 'LAND':
+				n.right.accept(self, func)
+			else:
+				func.append(('CONSTI', 1))
+			func.append(func.temp_set(temp))
+			func.append(('ELSE',))
+			if n.op == 'LAND':
+				func.append(('CONSTI', 0))
+			else:
+				n.right.accept(self, func)
+			func.append(func.temp_set(temp))
+			func.append(('ENDIF',))
+			func.append(func.temp_get(temp))
+			return
 		n.left.accept(self, func)
 		n.right.accept(self, func)
 		left_type = self._get_expression_type(n.left)
@@ -485,7 +623,7 @@ class IRCode(Visitor):
 	def visit(self, n:UnaryOp, func:IRFunction):
 		#Acepta para UnaryOp
 		n.operand.accept(self, func)
-		for instr in self._unaryop_code[(n.op, n.operand.type)]:
+		for instr in self._unaryop_code[(n.op, self._get_expression_type(n.operand))]:
 			func.append(instr)
 
 	def visit(self, n:TypeCast, func:IRFunction):
@@ -512,26 +650,9 @@ class IRCode(Visitor):
 			func.append(('GLOBAL_GET', n.name))
 
 	def visit(self, n:MemoryAddress, func:IRFunction):
-		if n.usage == 'load':
-			# Visitar n.address
-			n.address.accept(self, func)
-			if n.type in {'int', 'bool'}:
-				func.append('PEEKI',)
-			elif n.type == 'float':
-				func.append('PEEKF',)
-			elif n.type == 'char':
-				func.append('PEEKB',)
-		elif n.usage == 'store':
-			# Visitar n.address
-			n.address.accept(self, func)
-			# Visitar n.store_value (agregado en nodo Assignment)
-			n.store_value.accept(self, func)
-			if n.type in {'int', 'bool'}:
-				func.append('POKEI',)
-			elif n.type == 'float':
-				func.append('POKEF',)
-			elif n.type == 'char':
-				func.append('POKEB',)
+		# Lectura de memoria (la escritura se genera en Assignment)
+		n.address.accept(self, func)
+		func.append(('PEEKI',))
 
 
 if __name__ == '__main__':
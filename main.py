@@ -1,12 +1,49 @@
 # main.py
+import argparse
 import json
+from ircode import IRCode
 from lexer.tokenizer import Lexer, tokens_spec
 from parser.parser import Parser
 from semantic.check import Checker
+from optimizer.cfg import build_cfg
+from optimizer.liveness import Liveness
+from optimizer.passes import LEVELS, PIPELINE, PassManager
 from rich import print as pprint
 
-def main():
-    source_path = "samples/shor.gox"  # Cambia si tienes otro archivo
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compilador de GoxLang")
+    parser.add_argument("source", nargs="?", default="samples/shor.gox",
+                        help="archivo fuente (por omisión samples/shor.gox)")
+    for level, description in LEVELS.items():
+        parser.add_argument(f"-O{level}", dest="level", action="store_const", const=level,
+                            help=description)
+    parser.add_argument("--enable", action="append", default=[], metavar="PASADA",
+                        help="activa una pasada sin importar el nivel")
+    parser.add_argument("--disable", action="append", default=[], metavar="PASADA",
+                        help="desactiva una pasada")
+    parser.add_argument("--inline-budget", type=int, metavar="N",
+                        help="instrucciones máximas de una función expandida en línea")
+    parser.add_argument("--time-passes", action="store_true",
+                        help="muestra el tiempo e instrucciones de cada pasada")
+    parser.add_argument("--verify-ir", dest="verify", action="store_true", default=None,
+                        help="verifica el IR entre pasadas (activo por omisión sin python -O)")
+    parser.add_argument("--no-verify-ir", dest="verify", action="store_false")
+    parser.add_argument("--dump-ir", action="store_true", help="muestra el IR optimizado")
+    parser.add_argument("--dump-cfg", action="store_true",
+                        help="muestra el CFG de cada función en formato DOT")
+    parser.add_argument("--list-passes", action="store_true",
+                        help="lista las pasadas registradas y termina")
+    parser.set_defaults(level=0)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list_passes:
+        for p in PIPELINE:
+            print(f"  {p.name:<12} -O{p.level}  {p.description}")
+        return
+
+    source_path = args.source
 
     # Leer código fuente
     try:
@@ -60,6 +97,28 @@ def main():
         print("\n[INFO] Análisis semántico completado con éxito.")
     except Exception as e:
         print(e)
+        return
+
+    # Generar y optimizar el código intermedio
+    module = IRCode.gencode(ast.stmts, env)
+    try:
+        options = {}
+        if args.inline_budget is not None:
+            options['inline'] = {'budget': args.inline_budget}
+        manager = PassManager(args.level, args.enable, args.disable, args.verify, options)
+        manager.run(module)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+    print(f"\n[INFO] Código intermedio generado (-O{args.level}).")
+    if args.time_passes:
+        print(manager.report())
+    if args.dump_ir:
+        module.dump()
+    if args.dump_cfg:
+        for func in module.functions.values():
+            cfg = build_cfg(func)
+            print(cfg.to_dot(Liveness(cfg)))
 
 if __name__ == "__main__":
     main()
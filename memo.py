@@ -0,0 +1,112 @@
+# memo.py
+'''
+Memoización de funciones puras
+==============================
+
+MemoizingMachine es una StackMachine que guarda en un caché LRU el
+resultado de las llamadas a las funciones indicadas. Solo se debe usar
+con funciones puras (ver optimizer/purity.py): el resultado se reutiliza
+sin volver a ejecutar la función.
+
+    vm = MemoizingMachine(memoizable_functions(module), maxsize=4096)
+    vm.load_functions(...)
+    vm.load_program(...)
+    vm.run()
+    print(vm.cache.report())
+
+En cada CALL a una función memoizada se arma la clave (función,
+argumentos) con los valores etiquetados de la pila. Si está en el caché
+se descartan los argumentos y se apila el resultado sin entrar a la
+función. Si no, la función se ejecuta normalmente y su RET guarda en el
+caché el valor del tope de la pila.
+'''
+import collections
+
+from stack_machine import StackMachine
+
+class MemoCache:
+    '''
+    Caché LRU acotado a `maxsize` entradas, con aciertos y fallos por
+    función.
+    '''
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()   # (función, args) -> valor
+        self.stats = {}                            # función -> [aciertos, fallos]
+        self.evictions = 0
+
+    @property
+    def hits(self):
+        return sum(hits for hits, _ in self.stats.values())
+
+    @property
+    def misses(self):
+        return sum(misses for _, misses in self.stats.values())
+
+    def lookup(self, key):
+        '''
+        Retorna el valor guardado para key, o None si no está.
+        '''
+        stat = self.stats.get(key[0])
+        if stat is None:
+            stat = self.stats[key[0]] = [0, 0]
+        value = self.entries.get(key)
+        if value is None:
+            stat[1] += 1
+            return None
+        self.entries.move_to_end(key)
+        stat[0] += 1
+        return value
+
+    def store(self, key, value):
+        entries = self.entries
+        entries[key] = value
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def report(self):
+        lines = [f"{'función':<16}{'aciertos':>12}{'fallos':>12}{'tasa':>8}"]
+        for name, (hits, misses) in sorted(self.stats.items(), key=lambda item: -sum(item[1])):
+            rate = 100 * hits / (hits + misses) if hits + misses else 0.0
+            lines.append(f"{name:<16}{hits:>12}{misses:>12}{rate:>7.1f}%")
+        lines.append(f"{len(self.entries)} entradas de {self.maxsize}, {self.evictions} descartadas")
+        return '\n'.join(lines)
+
+class MemoizingMachine(StackMachine):
+    def __init__(self, functions=(), maxsize=1024, output=None):
+        super().__init__(output)
+        self.memoized = set(functions)        # Funciones cuyo resultado se guarda
+        self.cache = MemoCache(maxsize)
+        self._pending = []                    # (clave, profundidad) de llamadas sin resultado aún
+
+    def start(self):
+        super().start()
+        self._pending = []
+
+    def op_CALL(self, name):
+        if name not in self.memoized:
+            return StackMachine.op_CALL(self, name)
+        count = len(self.function_params.get(name, ()))
+        stack = self.stack
+        if len(stack) < count:
+            raise RuntimeError(f"Faltan argumentos en llamada a {name}")
+        key = (name, tuple(stack[len(stack) - count:]))
+        value = self.cache.lookup(key)
+        if value is not None:
+            del stack[len(stack) - count:]
+            stack.append(value)
+            return
+        StackMachine.op_CALL(self, name)
+        self._pending.append((key, len(self.call_stack)))
+
+    def op_RET(self):
+        pending = self._pending
+        if pending and pending[-1][1] == len(self.call_stack):
+            key, _ = pending.pop()
+            if self.stack:
+                self.cache.store(key, self.stack[-1])
+        StackMachine.op_RET(self)
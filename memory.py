@@ -0,0 +1,98 @@
+# memory.py
+'''
+Memoria lineal de la máquina virtual
+====================================
+
+La memoria es un bytearray organizado en celdas de 8 bytes. Las
+direcciones son índices de celda (ver la descripción de PEEK/POKE en
+ircode.py); un acceso fuera de las celdas reservadas lanza IndexError:
+
+    PEEKI/POKEI   celda como entero con signo de 64 bits
+    PEEKF/POKEF   celda como flotante de 64 bits
+    PEEKB/POKEB   primer byte de la celda
+
+El acceso tipado se hace con vistas memoryview.cast('q') y cast('d')
+sobre el mismo buffer, de modo que leer o escribir una palabra es una
+indexación directa, sin struct.unpack ni tuplas intermedias. Los enteros
+de GoxLang no tienen límite, pero una celda sí: POKEI de un valor fuera
+del rango de int64 lanza OverflowError.
+
+GROW n reserva n celdas y retorna la dirección de la primera. La
+capacidad reservada crece al doble cuando se agota, así que una serie
+de GROW pequeños copia el buffer O(log n) veces. Antes de extender el
+bytearray hay que liberar las vistas (un bytearray con vistas activas
+no puede cambiar de tamaño).
+'''
+
+WORD = 8
+
+# Rango de PEEKI/POKEI (entero con signo de 64 bits)
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+class Memory:
+    def __init__(self, capacity=1024):
+        self.size = 0                         # Celdas reservadas con GROW
+        self.data = bytearray(capacity * WORD)
+        self._make_views()
+
+    def _make_views(self):
+        view = memoryview(self.data)
+        self.words = view.cast('q')
+        self.floats = view.cast('d')
+        view.release()
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.data) // WORD
+
+    def grow(self, cells):
+        '''
+        Reserva `cells` celdas nuevas (inicializadas en 0) y retorna la
+        dirección de la primera.
+        '''
+        if cells < 0:
+            raise RuntimeError("GROW requiere un tamaño no negativo")
+        base = self.size
+        needed = base + cells
+        if needed > self.capacity:
+            self.words.release()
+            self.floats.release()
+            extra = max(needed, 2 * self.capacity) - self.capacity
+            self.data.extend(bytes(extra * WORD))
+            self._make_views()
+        self.size = needed
+        return base
+
+    def check(self, addr):
+        if not 0 <= addr < self.size:
+            raise IndexError(f"Dirección de memoria fuera de rango: {addr}")
+
+    def peeki(self, addr):
+        self.check(addr)
+        return self.words[addr]
+
+    def pokei(self, addr, value):
+        self.check(addr)
+        if not INT64_MIN <= value <= INT64_MAX:
+            raise OverflowError(f"POKEI: {value} no cabe en una celda de 64 bits")
+        self.words[addr] = value
+
+    def peekf(self, addr):
+        self.check(addr)
+        return self.floats[addr]
+
+    def pokef(self, addr, value):
+        self.check(addr)
+        self.floats[addr] = value
+
+    def peekb(self, addr):
+        self.check(addr)
+        return self.data[addr * WORD]
+
+    def pokeb(self, addr, value):
+        self.check(addr)
+        self.data[addr * WORD] = value & 0xFF
@@ -0,0 +1,146 @@
+# metering.py
+'''
+Límites de ejecución: combustible y tiempo
+==========================================
+
+MeteredMachine es una StackMachine que detiene el programa con
+OutOfFuel si consume más "combustible" del asignado o si se vence un
+plazo de tiempo real. Sirve para ejecutar programas no confiables: un
+`while true {}` termina con un error limpio en lugar de ocupar el
+proceso para siempre.
+
+El combustible se mide en instrucciones, pero no se cobra en cada
+instrucción sino en los bordes de bloque. Al cargar cada función se
+calcula, en una pasada sobre su código:
+
+  * el costo de cada iteración de un ciclo: las instrucciones de su
+    cuerpo más el costo de la primera iteración de sus ciclos anidados,
+    que se cobra en el ENDLOOP o CONTINUE que vuelve al LOOP,
+  * el costo de entrada: las instrucciones fuera de los ciclos más la
+    primera iteración de cada ciclo, que se cobra en el CALL (o al
+    iniciar run).
+
+Así cada iteración se paga antes de empezar, incluida la última, que
+sale con CBREAK sin llegar al ENDLOOP.
+
+Todo programa que no termina pasa infinitas veces por un salto hacia
+atrás o por un CALL, así que siempre se detiene. Los costos son una
+cota superior (se cobran las dos ramas de un IF).
+
+El reloj se consulta solo cada CLOCK_INTERVAL unidades de combustible,
+así que el costo en la parte caliente es una suma y una comparación por
+iteración o llamada.
+
+    vm = MeteredMachine(fuel=10_000_000, time_limit=2.0)
+    vm.load_functions(...)
+    vm.load_program(...)
+    vm.run()                     # OutOfFuel si se pasa de alguno
+'''
+import time
+
+from stack_machine import StackMachine
+
+# Combustible consumido entre dos consultas del reloj
+CLOCK_INTERVAL = 20_000
+
+class OutOfFuel(RuntimeError):
+    '''
+    El programa superó su combustible (reason == 'fuel') o su plazo de
+    tiempo (reason == 'time').
+    '''
+    def __init__(self, reason, used):
+        self.reason = reason
+        self.used = used
+        if reason == 'fuel':
+            message = f"Combustible agotado tras {used} instrucciones"
+        else:
+            message = f"Tiempo agotado tras {used} instrucciones"
+        super().__init__(message)
+
+def block_costs(code):
+    '''
+    Retorna (costo de entrada, {pc: costo}) para el código de una
+    función. El diccionario tiene el costo por iteración en la posición
+    de cada ENDLOOP y CONTINUE.
+    '''
+    costs = {}
+    open_loops = [[0, []]]                    # [instrucciones, pcs de salto atrás]
+    for pc, instr in enumerate(code):
+        opname = instr[0]
+        open_loops[-1][0] += 1
+        if opname == 'LOOP':
+            open_loops.append([0, []])
+        elif opname == 'CONTINUE':
+            open_loops[-1][1].append(pc)
+        elif opname == 'ENDLOOP':
+            count, back_edges = open_loops.pop()
+            for back_pc in back_edges + [pc]:
+                costs[back_pc] = count
+            # La primera iteración se paga al entrar (la que sale con
+            # CBREAK nunca llega al ENDLOOP)
+            open_loops[-1][0] += count
+    return open_loops[0][0], costs
+
+class MeteredMachine(StackMachine):
+    def __init__(self, fuel=None, time_limit=None, output=None, clock=time.monotonic):
+        super().__init__(output)
+        self.fuel = fuel                      # Instrucciones permitidas (None: sin límite)
+        self.time_limit = time_limit          # Segundos (None: sin límite)
+        self.clock = clock
+        self.used = 0                         # Combustible consumido
+        self.deadline = None
+        self._limit = 0                       # Próximo valor de `used` que requiere revisar
+        self._costs = {}                      # id(código) -> (código, costo entrada, costos)
+        self._call_costs = {}                 # función -> costo de entrada
+
+    def run(self):
+        self.used = 0
+        self.deadline = None if self.time_limit is None else self.clock() + self.time_limit
+        self._limit = 0
+        self._charge(self._block_costs(self.program)[1])
+        super().run()
+
+    def _block_costs(self, code):
+        entry = self._costs.get(id(code))
+        if entry is None:
+            entry = self._costs[id(code)] = (code, *block_costs(code))
+        return entry
+
+    def load_functions(self, functions_dict, params_dict=None):
+        super().load_functions(functions_dict, params_dict)
+        self._call_costs = {}
+
+    def _call_cost(self, name):
+        self._call_costs[name] = self._block_costs(self.functions[name])[1]
+        return self._call_costs[name]
+
+    def _charge(self, cost):
+        self.used += cost
+        if self.used > self._limit:
+            self._check_limits()
+
+    def _check_limits(self):
+        if self.fuel is not None and self.used > self.fuel:
+            raise OutOfFuel('fuel', self.used)
+        if self.deadline is not None and self.clock() > self.deadline:
+            raise OutOfFuel('time', self.used)
+        limit = self.used + CLOCK_INTERVAL if self.deadline is not None else float('inf')
+        self._limit = min(limit, self.fuel) if self.fuel is not None else limit
+
+    # --- Puntos de cobro (el cobro va en línea: se ejecutan muy seguido)
+
+    def op_CALL(self, name):
+        if name in self.functions:
+            cost = self._call_costs.get(name)
+            self.used += cost if cost is not None else self._call_cost(name)
+            if self.used > self._limit:
+                self._check_limits()
+        StackMachine.op_CALL(self, name)
+
+    def op_ENDLOOP(self):
+        self.used += self._block_costs(self.program)[2][self.pc]
+        if self.used > self._limit:
+            self._check_limits()
+        StackMachine.op_CONTINUE(self)
+
+    op_CONTINUE = op_ENDLOOP
@@ -0,0 +1,246 @@
+# cfg.py
+'''
+Grafo de flujo de control (CFG) de una IRFunction
+=================================================
+
+El código IR es estructurado (IF/ELSE/ENDIF, LOOP/CBREAK/CONTINUE/
+ENDLOOP), así que los bloques básicos se obtienen cortando el código en
+las instrucciones de control:
+
+  * terminan un bloque: IF, IF_CMP, ELSE, CBREAK, CBREAK_IFNOT,
+    CONTINUE, ENDLOOP y RET,
+  * empiezan un bloque: LOOP (cabecera del ciclo, destino de CONTINUE y
+    ENDLOOP) y ENDIF (punto de unión del if).
+
+Aristas:
+
+    IF / IF_CMP          bloque siguiente (consecuencia) y el bloque
+                         después del ELSE, o el ENDIF si no hay ELSE
+    ELSE                 el ENDIF (fin de la consecuencia)
+    CBREAK[_IFNOT]       bloque siguiente y el bloque después del ENDLOOP
+    CONTINUE / ENDLOOP   la cabecera del ciclo (arista de retorno)
+    RET                  ninguna
+    otra                 bloque siguiente
+
+Un bloque sin sucesores sale de la función. Los bloques se numeran en el
+orden del código y block.start:block.end es su rango en func.code (los
+índices siguen valiendo mientras el código no cambie).
+
+    cfg = build_cfg(func)
+    cfg.idom                 # dominador inmediato de cada bloque
+    cfg.dominates(a, b)
+    print(cfg.to_dot())      # dot -Tpng
+
+La liveness de las variables locales está en liveness.py.
+'''
+
+# Instrucciones que terminan un bloque básico
+TERMINATORS = {'IF', 'IF_CMP', 'ELSE', 'CBREAK', 'CBREAK_IFNOT', 'CONTINUE', 'ENDLOOP', 'RET'}
+
+class BasicBlock:
+    __slots__ = ('index', 'start', 'end', 'succs', 'preds')
+
+    def __init__(self, index, start, end):
+        self.index = index
+        self.start = start                    # Primer pc del bloque
+        self.end = end                        # pc siguiente al último
+        self.succs = []
+        self.preds = []
+
+    def __repr__(self):
+        return f"BasicBlock({self.index}, {self.start}:{self.end})"
+
+class CFG:
+    def __init__(self, func, blocks, block_of):
+        self.func = func
+        self.code = func.code
+        self.blocks = blocks
+        self.block_of = block_of              # pc -> índice del bloque
+        self._idom = None
+        self._order = None
+
+    @property
+    def entry(self):
+        return self.blocks[0] if self.blocks else None
+
+    def instructions(self, block):
+        return self.code[block.start:block.end]
+
+    def reverse_postorder(self):
+        '''
+        Índices de los bloques alcanzables desde la entrada, en orden
+        postorden inverso (cada bloque antes que sus sucesores, salvo en
+        las aristas de retorno).
+        '''
+        if self._order is None:
+            order = []
+            if self.blocks:
+                seen = {0}
+                stack = [(0, iter(self.blocks[0].succs))]
+                while stack:
+                    index, succs = stack[-1]
+                    for succ in succs:
+                        if succ not in seen:
+                            seen.add(succ)
+                            stack.append((succ, iter(self.blocks[succ].succs)))
+                            break
+                    else:
+                        stack.pop()
+                        order.append(index)
+            order.reverse()
+            self._order = order
+        return self._order
+
+    def reachable(self):
+        return set(self.reverse_postorder())
+
+    @property
+    def idom(self):
+        '''
+        Dominador inmediato de cada bloque (None para la entrada y para
+        los bloques inalcanzables). Algoritmo iterativo de Cooper, Harvey
+        y Kennedy sobre el postorden inverso.
+        '''
+        if self._idom is None:
+            order = self.reverse_postorder()
+            rank = {index: i for i, index in enumerate(order)}
+            idom = [None] * len(self.blocks)
+            if order:
+                idom[order[0]] = order[0]
+            changed = True
+            while changed:
+                changed = False
+                for index in order[1:]:
+                    new = None
+                    for pred in self.blocks[index].preds:
+                        if idom[pred] is None:
+                            continue
+                        if new is None:
+                            new = pred
+                            continue
+                        a, b = pred, new
+                        while a != b:
+                            while rank[a] > rank[b]:
+                                a = idom[a]
+                            while rank[b] > rank[a]:
+                                b = idom[b]
+                        new = a
+                    if idom[index] != new:
+                        idom[index] = new
+                        changed = True
+            if order:
+                idom[order[0]] = None
+            self._idom = idom
+        return self._idom
+
+    def dominates(self, a, b):
+        '''
+        True si todo camino desde la entrada hasta el bloque b pasa por
+        el bloque a (un bloque se domina a sí mismo).
+        '''
+        idom = self.idom
+        while b is not None:
+            if a == b:
+                return True
+            b = idom[b]
+        return False
+
+    def to_dot(self, liveness=None):
+        '''
+        El grafo en formato DOT de Graphviz. Con `liveness` cada bloque
+        muestra además las locales vivas a la entrada y a la salida.
+        '''
+        name = self.func.name
+        lines = [f'digraph "{name}" {{', '    node [shape=box, fontname="monospace"];']
+        for block in self.blocks:
+            text = [f"B{block.index}"]
+            if liveness is not None:
+                text.append(f"in: {' '.join(sorted(liveness.live_in(block.index)))}")
+            text += [' '.join(str(part) for part in instr) for instr in self.instructions(block)]
+            if liveness is not None:
+                text.append(f"out: {' '.join(sorted(liveness.live_out(block.index)))}")
+            label = ''.join(line.replace('"', '\\"') + '\\l' for line in text)
+            lines.append(f'    B{block.index} [label="{label}"];')
+        for block in self.blocks:
+            for succ in block.succs:
+                style = ' [style=dashed]' if succ <= block.index else ''
+                lines.append(f'    B{block.index} -> B{succ}{style};')
+        lines.append('}')
+        return '\n'.join(lines)
+
+def _match_blocks(code):
+    # IF -> ELSE/ENDIF, ELSE -> ENDIF, CBREAK/CONTINUE/ENDLOOP -> LOOP,
+    # LOOP -> ENDLOOP
+    match = {}
+    opened = []
+    loops = []
+    for pc, instr in enumerate(code):
+        opname = instr[0]
+        if opname in ('IF', 'IF_CMP'):
+            opened.append(pc)
+        elif opname == 'ELSE':
+            match[opened.pop()] = pc
+            opened.append(pc)
+        elif opname == 'ENDIF':
+            match[opened.pop()] = pc
+        elif opname == 'LOOP':
+            loops.append(pc)
+        elif opname == 'ENDLOOP':
+            match[pc] = loop = loops.pop()
+            match[loop] = pc
+        elif opname in ('CBREAK', 'CBREAK_IFNOT', 'CONTINUE'):
+            match[pc] = loops[-1]
+    return match
+
+def build_cfg(func):
+    '''
+    Construye el CFG del código de la función.
+    '''
+    code = func.code
+    size = len(code)
+    match = _match_blocks(code)
+
+    leaders = [False] * (size + 1)
+    leaders[0] = True
+    for pc, instr in enumerate(code):
+        opname = instr[0]
+        if opname in TERMINATORS:
+            leaders[pc + 1] = True
+        elif opname == 'LOOP' or opname == 'ENDIF':
+            leaders[pc] = True
+
+    blocks = []
+    block_of = [0] * size
+    start = 0
+    for pc in range(1, size + 1):
+        if leaders[pc] or pc == size:
+            if start < pc:
+                blocks.append(BasicBlock(len(blocks), start, pc))
+            start = pc
+    for block in blocks:
+        block_of[block.start:block.end] = [block.index] * (block.end - block.start)
+
+    def target(pc):
+        return block_of[pc] if pc < size else None
+
+    for block in blocks:
+        last = block.end - 1
+        opname = code[last][0]
+        if opname in ('IF', 'IF_CMP'):
+            other = match[last]
+            targets = (target(block.end), target(other + 1 if code[other][0] == 'ELSE' else other))
+        elif opname == 'ELSE':
+            targets = (target(match[last]),)
+        elif opname in ('CBREAK', 'CBREAK_IFNOT'):
+            targets = (target(block.end), target(match[match[last]] + 1))
+        elif opname in ('CONTINUE', 'ENDLOOP'):
+            targets = (block_of[match[last]],)
+        elif opname == 'RET':
+            targets = ()
+        else:
+            targets = (target(block.end),)
+        for succ in targets:
+            if succ is not None and succ not in block.succs:
+                block.succs.append(succ)
+                blocks[succ].preds.append(block.index)
+    return CFG(func, blocks, block_of)
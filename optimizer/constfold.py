@@ -0,0 +1,147 @@
+# constfold.py
+'''
+Plegado y propagación de constantes
+===================================
+
+Plegado: una operación cuyos operandos son literales se evalúa al
+compilar.
+
+    CONSTI 2                       CONSTI 6
+    CONSTI 3           ==>
+    MULI
+
+Como el código es de pila, basta mirar las instrucciones ya emitidas:
+si las dos últimas son constantes del tipo que espera la operación, la
+operación se reemplaza por su resultado. Al repetir esto en una sola
+pasada se pliegan expresiones completas, como (2 * 3) + 4. No se pliega
+una división por cero ni la conversión a entero de un flotante infinito
+o NaN: el error se sigue produciendo al ejecutar.
+
+Propagación: las variables globales declaradas con const y asignadas
+una sola vez con un literal (después del plegado) en el nivel superior
+de main se reemplazan por su valor en todas las funciones:
+
+    const n = 100;                 GLOBAL_GET n  ==>  CONSTI 100
+
+Después de propagar se vuelve a plegar, de modo que
+
+    const n = 100;
+    const base = ^(n + 1);
+
+deja GROW con el literal 101. La asignación GLOBAL_SET se conserva: la
+variable global sigue existiendo.
+'''
+import math
+
+def _int_div(a, b):
+    return a // b if b != 0 else None
+
+def _float_div(a, b):
+    return a / b if b != 0 else None
+
+def _float_to_int(a):
+    return int(a) if math.isfinite(a) else None
+
+# opcode: (tipo de los operandos, tipo del resultado, función)
+_BINARY = {
+    'ADDI': ('CONSTI', 'CONSTI', lambda a, b: a + b),
+    'SUBI': ('CONSTI', 'CONSTI', lambda a, b: a - b),
+    'MULI': ('CONSTI', 'CONSTI', lambda a, b: a * b),
+    'DIVI': ('CONSTI', 'CONSTI', _int_div),
+    'LTI': ('CONSTI', 'CONSTI', lambda a, b: int(a < b)),
+    'LEI': ('CONSTI', 'CONSTI', lambda a, b: int(a <= b)),
+    'GTI': ('CONSTI', 'CONSTI', lambda a, b: int(a > b)),
+    'GEI': ('CONSTI', 'CONSTI', lambda a, b: int(a >= b)),
+    'EQI': ('CONSTI', 'CONSTI', lambda a, b: int(a == b)),
+    'NEI': ('CONSTI', 'CONSTI', lambda a, b: int(a != b)),
+    'ADDF': ('CONSTF', 'CONSTF', lambda a, b: a + b),
+    'SUBF': ('CONSTF', 'CONSTF', lambda a, b: a - b),
+    'MULF': ('CONSTF', 'CONSTF', lambda a, b: a * b),
+    'DIVF': ('CONSTF', 'CONSTF', _float_div),
+    'LTF': ('CONSTF', 'CONSTI', lambda a, b: int(a < b)),
+    'LEF': ('CONSTF', 'CONSTI', lambda a, b: int(a <= b)),
+    'GTF': ('CONSTF', 'CONSTI', lambda a, b: int(a > b)),
+    'GEF': ('CONSTF', 'CONSTI', lambda a, b: int(a >= b)),
+    'EQF': ('CONSTF', 'CONSTI', lambda a, b: int(a == b)),
+    'NEF': ('CONSTF', 'CONSTI', lambda a, b: int(a != b)),
+}
+
+_UNARY = {
+    'ITOF': ('CONSTI', 'CONSTF', float),
+    'FTOI': ('CONSTF', 'CONSTI', _float_to_int),
+}
+
+def fold_code(code):
+    '''
+    Retorna una nueva lista de instrucciones con las operaciones sobre
+    literales ya evaluadas.
+    '''
+    out = []
+    for instr in code:
+        opname = instr[0]
+        if opname in _BINARY and len(out) >= 2:
+            operand, result, fn = _BINARY[opname]
+            if out[-2][0] == operand and out[-1][0] == operand:
+                value = fn(out[-2][1], out[-1][1])
+                if value is not None:
+                    del out[-2:]
+                    out.append((result, value))
+                    continue
+        elif opname in _UNARY and out:
+            operand, result, fn = _UNARY[opname]
+            if out[-1][0] == operand:
+                value = fn(out[-1][1])
+                if value is not None:
+                    out[-1] = (result, value)
+                    continue
+        out.append(instr)
+    return out
+
+def constant_globals(module):
+    '''
+    Retorna {nombre: instrucción CONST} para las constantes globales cuyo
+    valor se conoce al compilar.
+    '''
+    stores = {}
+    for func in module.functions.values():
+        for instr in func.code:
+            if instr[0] == 'GLOBAL_SET':
+                stores[instr[1]] = stores.get(instr[1], 0) + 1
+
+    values = {}
+    main = module.functions.get('main')
+    if main is None:
+        return values
+    depth = 0
+    for index, instr in enumerate(main.code):
+        opname = instr[0]
+        if opname in ('IF', 'IF_CMP', 'LOOP'):
+            depth += 1
+        elif opname in ('ENDIF', 'ENDLOOP'):
+            depth -= 1
+        elif opname == 'GLOBAL_SET' and depth == 0 and index > 0:
+            glob = module.globals.get(instr[1])
+            previous = main.code[index - 1]
+            if (glob is not None and glob.const and stores[instr[1]] == 1
+                    and previous[0] in ('CONSTI', 'CONSTF')):
+                values[instr[1]] = previous
+    return values
+
+def fold_module(module):
+    '''
+    Pliega las constantes de todas las funciones y propaga las
+    constantes globales (en el lugar).
+    '''
+    for func in module.functions.values():
+        func.code = fold_code(func.code)
+    propagated = set()
+    while True:
+        values = {name: value for name, value in constant_globals(module).items()
+                  if name not in propagated}
+        if not values:
+            return module
+        propagated.update(values)
+        for func in module.functions.values():
+            code = [values.get(instr[1], instr) if instr[0] == 'GLOBAL_GET' else instr
+                    for instr in func.code]
+            func.code = fold_code(code)
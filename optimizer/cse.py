@@ -0,0 +1,170 @@
+# cse.py
+'''
+Eliminación de subexpresiones comunes (numeración de valores local)
+===================================================================
+
+Dentro de cada bloque básico (ver cfg.py) se simula la pila asignando a
+cada valor un número; dos valores con el mismo número son iguales:
+
+  * las constantes con el mismo literal tienen el mismo número,
+  * las lecturas de una local tienen el número de su valor actual
+    (LOCAL_SET x le da a x el número del valor asignado, así una copia
+    var a int = x; tiene el mismo número que x),
+  * una operación pura sobre operandos ya numerados tiene el número que
+    se le dio antes a la misma operación sobre los mismos números (con
+    los operandos ordenados si la operación es conmutativa).
+
+Cuando una expresión con al menos una operación recibe un número que ya
+se calculó antes en el bloque, se reemplaza por la lectura de una local
+que todavía tenga ese valor o, si no la hay, de una temporal
+(IRFunction.new_temp) en la que se guarda la primera evaluación:
+
+    LOCAL_GET a                      LOCAL_GET a
+    LOCAL_GET b                      LOCAL_GET b
+    DIVI                             DIVI
+    ...                 ==>          LOCAL_TEE $temp1
+    LOCAL_GET a                      ...
+    LOCAL_GET b                      LOCAL_GET $temp1
+    DIVI
+
+Con la temporal se agrega un LOCAL_TEE, así que solo se reemplazan las
+expresiones de tres o más instrucciones.
+
+Son puras las operaciones de SIDE_EFFECT_FREE (dce.py) salvo GLOBAL_GET, las divisiones
+(si la primera no falló, la repetida tampoco) y las llamadas a funciones
+con valor de retorno que purity.py considera puras. Las lecturas de
+globales y de memoria no se numeran. main no se procesa: en la
+StackMachine no tiene variables locales para la temporal.
+'''
+import itertools
+
+from optimizer.cfg import build_cfg
+from optimizer.dce import SIDE_EFFECT_FREE
+from optimizer.irutil import FLOAT_RESULTS, stack_effect
+from optimizer.purity import pure_functions
+
+# Operaciones puras que se numeran (además de las llamadas puras). Las
+# lecturas de globales no: un GLOBAL_SET o una llamada pueden cambiarlas.
+PURE_OPS = (SIDE_EFFECT_FREE - {'GLOBAL_GET'}) | {'DIVI', 'DIVF'}
+
+# Operaciones en las que el orden de los operandos no importa
+COMMUTATIVE = {'ADDI', 'MULI', 'EQI', 'NEI', 'ADDF', 'MULF', 'EQF', 'NEF'}
+
+def _number_block(block, module, pure):
+    # Retorna ({primero: (último, número, local)}, {número: pc de su
+    # primera evaluación}) con las expresiones repetidas del bloque
+    numbers = {}            # clave -> número
+    holder = {}             # local -> número de su valor actual
+    first = {}              # número -> pc de la primera evaluación
+    replace = {}
+    stack = []              # (número, primero, último, operaciones)
+    counter = itertools.count()
+
+    for pc, instr in enumerate(block):
+        opname = instr[0]
+        pops, pushes = stack_effect(instr, module)
+        operands = stack[len(stack) - pops:] if pops else []
+        del stack[len(stack) - len(operands):]
+        # Valores que vienen de otro bloque
+        operands = [(next(counter), None, None, 0) for _ in range(pops - len(operands))] + operands
+        if opname in ('LOCAL_SET', 'LOCAL_TEE'):
+            holder[instr[1]] = operands[0][0]
+            if pushes:
+                stack.append((operands[0][0], None, pc, 0))
+            continue
+        if pushes != 1:
+            stack += [(next(counter), None, pc, 0) for _ in range(pushes)]
+            continue
+
+        if opname == 'LOCAL_GET':
+            if instr[1] not in holder:
+                holder[instr[1]] = next(counter)
+            stack.append((holder[instr[1]], pc, pc, 0))
+            continue
+        if opname in ('CONSTI', 'CONSTF'):
+            key = instr
+        elif opname in PURE_OPS or (opname == 'CALL' and instr[1] in pure):
+            vns = [e[0] for e in operands]
+            if opname in COMMUTATIVE:
+                vns.sort()
+            key = (instr, *vns)
+        else:
+            stack.append((next(counter), None, pc, 0))
+            continue
+        if key not in numbers:
+            numbers[key] = next(counter)
+        vn = numbers[key]
+
+        clean = (all(e[1] is not None for e in operands)
+                 and all(a[2] + 1 == b[1] for a, b in zip(operands, operands[1:]))
+                 and (not operands or operands[-1][2] == pc - 1))
+        start = operands[0][1] if operands else pc
+        ops = sum(e[3] for e in operands) + (1 if pops else 0)
+        if vn not in first:
+            first[vn] = pc
+        elif clean and ops:
+            var = next((name for name, v in holder.items() if v == vn), None)
+            if var is not None or pc - start >= 2:
+                for k in [k for k in replace if start <= k <= pc]:
+                    del replace[k]
+                replace[start] = (pc, vn, var)
+        stack.append((vn, start if clean else None, pc, ops))
+    return replace, first
+
+def _result_type(instr, module):
+    if instr[0] == 'CALL':
+        return module.functions[instr[1]].return_type
+    return 'F' if instr[0] in FLOAT_RESULTS else 'I'
+
+def _cse_block(block, func, module, pure):
+    # Retorna (código nuevo del bloque, expresiones reemplazadas)
+    replace, first = _number_block(block, module, pure)
+    temps = {}              # número -> temporal
+    tee = {}                # pc -> temporal
+    for last, vn, var in sorted(replace.values(), key=lambda r: first[r[1]]):
+        if var is None and vn not in temps:
+            pc = first[vn]
+            temps[vn] = tee[pc] = func.new_temp(_result_type(block[pc], module))
+    out = []
+    pc = 0
+    while pc < len(block):
+        if pc in replace:
+            last, vn, var = replace[pc]
+            out.append(('LOCAL_GET', var if var is not None else temps[vn]))
+            pc = last + 1
+            continue
+        out.append(block[pc])
+        if pc in tee:
+            out.append(('LOCAL_TEE', tee[pc]))
+        pc += 1
+    return out, len(replace)
+
+def cse_function(func, module, pure=None):
+    '''
+    Elimina las subexpresiones comunes de cada bloque básico de la
+    función (en el lugar). `pure` son las funciones cuyas llamadas se
+    pueden reutilizar (por omisión, las de purity.pure_functions).
+    Retorna el número de expresiones reemplazadas.
+    '''
+    if func.name == 'main' or func.imported:
+        return 0
+    if pure is None:
+        pure = pure_functions(module)
+    cfg = build_cfg(func)
+    code = []
+    total = 0
+    for block in cfg.blocks:
+        new, count = _cse_block(cfg.instructions(block), func, module, pure)
+        code += new
+        total += count
+    func.code = code
+    return total
+
+def cse_module(module):
+    '''
+    Aplica cse_function a todas las funciones del módulo.
+    '''
+    pure = pure_functions(module)
+    for func in module.functions.values():
+        cse_function(func, module, pure)
+    return module
@@ -0,0 +1,161 @@
+# dce.py
+'''
+Eliminación de código muerto
+============================
+
+Tres transformaciones:
+
+  * Código inalcanzable: lo que sigue a un RET o CONTINUE hasta el
+    cierre del bloque que lo contiene (ELSE, ENDIF, ENDLOOP o el final
+    de la función). Los if con una prueba constante (CONSTI c; IF, lo
+    que deja el plegado de constantes) se reemplazan por la rama que se
+    ejecuta.
+
+  * Asignaciones muertas: LOCAL_SET x cuando x no está viva después de
+    la asignación (ver liveness.py). Si la expresión asignada no tiene
+    efectos (SIDE_EFFECT_FREE) se elimina junto con la asignación; si no,
+    la asignación se conserva porque es la que desapila el valor. Un
+    LOCAL_TEE muerto se elimina siempre (el valor queda en la pila).
+
+  * Funciones muertas: las que no se alcanzan en el grafo de llamadas
+    desde main. Como cambian las funciones visibles del módulo, es una
+    pasada aparte ('dead-functions'); no conviene activarla si el módulo
+    se usa con CompiledProgram para llamar funciones desde Python.
+'''
+from optimizer.cfg import build_cfg
+from optimizer.irutil import expression_start, local_write
+from optimizer.liveness import Liveness
+
+# Instrucciones sin efectos: si su resultado no se usa se pueden eliminar.
+# Algunas pueden fallar (una lectura de una variable sin valor, FTOI con
+# inf o NaN) y al eliminarlas solo desaparece ese error. No están DIVI,
+# que puede dividir por cero, PEEK, que puede leer fuera de la memoria,
+# ni CALL, que puede hacer cualquier cosa.
+SIDE_EFFECT_FREE = {
+    'CONSTI', 'CONSTF', 'LOCAL_GET', 'GLOBAL_GET',
+    'ADDI', 'SUBI', 'MULI', 'LTI', 'LEI', 'GTI', 'GEI', 'EQI', 'NEI',
+    'ADDF', 'SUBF', 'MULF', 'LTF', 'LEF', 'GTF', 'GEF', 'EQF', 'NEF',
+    'ITOF', 'FTOI', 'NEGI', 'NEGF',
+}
+
+# Instrucciones sin efectos que además no pueden fallar: se pueden
+# ejecutar aunque el programa original no llegara a hacerlo (por ejemplo
+# antes de un ciclo que da cero vueltas). Las lecturas de variables
+# quedan fuera porque dependen de que la variable ya tenga valor.
+CANNOT_FAIL = SIDE_EFFECT_FREE - {'LOCAL_GET', 'GLOBAL_GET', 'FTOI'}
+
+def _block_end(code, index):
+    # Índice del ELSE/ENDIF/ENDLOOP que cierra el bloque en el que está
+    # code[index] (o len(code))
+    depth = 0
+    while index < len(code):
+        opname = code[index][0]
+        if opname in ('IF', 'IF_CMP', 'LOOP'):
+            depth += 1
+        elif opname in ('ENDIF', 'ENDLOOP'):
+            if depth == 0:
+                return index
+            depth -= 1
+        elif opname == 'ELSE' and depth == 0:
+            return index
+        index += 1
+    return index
+
+def remove_unreachable(code):
+    '''
+    Retorna el código sin las instrucciones inalcanzables y sin los if de
+    prueba constante.
+    '''
+    out = []
+    index = 0
+    while index < len(code):
+        instr = code[index]
+        if instr[0] == 'CONSTI' and index + 1 < len(code) and code[index + 1] == ('IF',):
+            middle = _block_end(code, index + 2)
+            end = _block_end(code, middle + 1) if code[middle][0] == 'ELSE' else middle
+            if instr[1]:
+                out += remove_unreachable(code[index + 2:middle])
+            elif middle != end:
+                out += remove_unreachable(code[middle + 1:end])
+            index = end + 1
+            if out and out[-1][0] in ('RET', 'CONTINUE'):
+                # La rama conservada termina en un salto
+                index = _block_end(code, index)
+            continue
+        out.append(instr)
+        if instr[0] in ('RET', 'CONTINUE'):
+            index = _block_end(code, index + 1)
+        else:
+            index += 1
+    return out
+
+def remove_dead_stores(func, module=None):
+    '''
+    Elimina las asignaciones muertas de la función (en el lugar), hasta
+    que no quede ninguna. Retorna el número de instrucciones eliminadas.
+    '''
+    total = 0
+    while True:
+        code = func.code
+        cfg = build_cfg(func)
+        live = Liveness(cfg)
+        removed = set()
+        for block in cfg.blocks:
+            after = None
+            for pc in range(block.start, block.end):
+                name = local_write(code[pc])
+                if name is None:
+                    continue
+                if after is None:
+                    after = live.live_after(block)
+                if name in after[pc - block.start]:
+                    continue
+                if code[pc][0] == 'LOCAL_TEE':
+                    removed.add(pc)
+                    continue
+                start = expression_start(code, pc, module)
+                if start is not None and all(code[k][0] in SIDE_EFFECT_FREE for k in range(start, pc)):
+                    removed.update(range(start, pc + 1))
+        if not removed:
+            return total
+        func.code = [instr for pc, instr in enumerate(code) if pc not in removed]
+        total += len(removed)
+
+def dce_module(module):
+    '''
+    Elimina el código inalcanzable y las asignaciones muertas de todas
+    las funciones del módulo (en el lugar).
+    '''
+    for func in module.functions.values():
+        func.code = remove_unreachable(func.code)
+        remove_dead_stores(func, module)
+    return module
+
+def reachable_functions(module, roots=('main',)):
+    '''
+    Nombres de las funciones alcanzables desde `roots` en el grafo de
+    llamadas.
+    '''
+    seen = set()
+    pending = [name for name in roots if name in module.functions]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        for instr in module.functions[name].code:
+            if instr[0] == 'CALL' and instr[1] in module.functions:
+                pending.append(instr[1])
+    return seen
+
+def remove_dead_functions(module):
+    '''
+    Elimina del módulo las funciones que main no llega a llamar. Un
+    módulo sin main no se modifica.
+    '''
+    if 'main' not in module.functions:
+        return module
+    live = reachable_functions(module)
+    for name in [name for name in module.functions if name not in live]:
+        del module.functions[name]
+    return module
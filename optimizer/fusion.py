@@ -0,0 +1,160 @@
+# fusion.py
+'''
+Fusión de superinstrucciones
+============================
+
+El generador de código produce secuencias muy regulares. Esta pasada
+reemplaza las más frecuentes por una sola instrucción, de modo que la
+StackMachine hace un solo despacho donde antes hacía dos o tres.
+
+El conjunto se eligió a partir de las frecuencias de pares y ternas de
+opcodes ejecutados en los samples (python -m benchmarks.opcode_pairs).
+Con shor(3127) los resultados dinámicos más importantes fueron:
+
+    LOCAL_GET LOCAL_GET            21.8 %
+    LOCAL_GET CONSTI                7.7 %
+    LOCAL_GET LOCAL_GET DIVI/MULI  11.5 %  (ternas)
+    CONSTI GTI SUBI CBREAK          3.1 %  (prueba del while)
+    EQI IF / NEI IF                 2.3 %
+
+Superinstrucciones:
+
+    LOCAL_GET2 a b        ; LOCAL_GET a; LOCAL_GET b
+    BINOP_LL op a b       ; LOCAL_GET a; LOCAL_GET b; op
+    BINOP_LC op a value   ; LOCAL_GET a; CONSTI value; op
+    IF_CMP op             ; op; IF            (comparar y saltar)
+    CBREAK_IFNOT [op]     ; prueba invertida del while
+
+Si la prueba de un while no es una comparación entera, se genera como:
+
+    LOOP
+    CONSTI 1
+    <prueba>
+    SUBI
+    CBREAK
+
+La pasada elimina CONSTI 1 y SUBI y deja CBREAK_IFNOT, que sale del
+ciclo cuando la prueba es falsa. Si la prueba termina en una comparación
+entera, ésta se incorpora como operando (CBREAK_IFNOT op). Si la prueba
+ya está invertida (<comparación>; CBREAK, como la genera ircode.py para
+las comparaciones o la deja el peephole), la comparación se incorpora
+invertida de nuevo.
+
+Los operadores `op` son siempre operaciones enteras (ADDI, SUBI, MULI,
+DIVI y las comparaciones LTI..NEI).
+'''
+from optimizer.irutil import INT_BINOPS, INT_COMPARES, INVERSE_COMPARES, expression_start
+
+def fuse_code(code, module=None):
+    '''
+    Retorna una nueva lista de instrucciones con las superinstrucciones
+    aplicadas. El módulo se usa para conocer la aridad de las funciones
+    llamadas dentro de la prueba de un while.
+    '''
+    return _fuse_sequences(_fuse_loop_tests(code, module))
+
+def fuse_module(module):
+    '''
+    Aplica la fusión a todas las funciones del módulo (en el lugar).
+    '''
+    for func in module.functions.values():
+        func.code = fuse_code(func.code, module)
+    return module
+
+def _fuse_loop_tests(code, module):
+    code = list(code)
+    removed = set()
+    for index, instr in enumerate(code):
+        if instr != ('LOOP',) or index + 1 >= len(code) or code[index + 1] != ('CONSTI', 1):
+            continue
+        # Buscar el SUBI; CBREAK que cierra la prueba de este ciclo
+        test_start = index + 2
+        for end in range(test_start, len(code) - 1):
+            if code[end] == ('SUBI',) and code[end + 1] == ('CBREAK',):
+                break
+        else:
+            continue
+        if end == test_start or expression_start(code, end, module) != test_start:
+            continue
+        removed.add(index + 1)
+        removed.add(end)
+        last = code[end - 1]
+        if last[0] in INT_COMPARES and end - 1 > test_start:
+            removed.add(end - 1)
+            code[end + 1] = ('CBREAK_IFNOT', last[0])
+        else:
+            code[end + 1] = ('CBREAK_IFNOT',)
+    return [instr for index, instr in enumerate(code) if index not in removed]
+
+def _match_load_op(code, index):
+    # LOCAL_GET a; (LOCAL_GET b | CONSTI value); op
+    if index + 2 >= len(code):
+        return None
+    first, second, third = code[index:index + 3]
+    if first[0] != 'LOCAL_GET' or third[0] not in INT_BINOPS:
+        return None
+    if second[0] == 'LOCAL_GET':
+        return ('BINOP_LL', third[0], first[1], second[1])
+    if second[0] == 'CONSTI':
+        return ('BINOP_LC', third[0], first[1], second[1])
+    return None
+
+def _fuse_sequences(code):
+    fused = []
+    index = 0
+    while index < len(code):
+        instr = code[index]
+        nextop = code[index + 1][0] if index + 1 < len(code) else None
+
+        load_op = _match_load_op(code, index)
+        if load_op:
+            fused.append(load_op)
+            index += 3
+        elif instr[0] in INT_COMPARES and nextop == 'IF':
+            fused.append(('IF_CMP', instr[0]))
+            index += 2
+        elif instr[0] in INT_COMPARES and nextop == 'CBREAK':
+            # Prueba de un while ya invertida (ircode.py o el peephole)
+            fused.append(('CBREAK_IFNOT', INVERSE_COMPARES[instr[0]]))
+            index += 2
+        elif (instr[0] == 'LOCAL_GET' and nextop == 'LOCAL_GET'
+              and not _match_load_op(code, index + 1)):
+            fused.append(('LOCAL_GET2', instr[1], code[index + 1][1]))
+            index += 2
+        else:
+            fused.append(instr)
+            index += 1
+    return fused
+
+def expand_code(code):
+    '''
+    Inversa de fuse_code: reemplaza cada superinstrucción (y cada
+    instrucción propia del peephole) por la secuencia equivalente de
+    instrucciones básicas. La usan los motores de ejecución alternativos,
+    que solo entienden el conjunto básico. CBREAK_IFNOT se expande como
+    <prueba> == 0 seguido de CBREAK.
+    '''
+    expanded = []
+    for instr in code:
+        opname = instr[0]
+        if opname == 'LOCAL_GET2':
+            expanded += [('LOCAL_GET', instr[1]), ('LOCAL_GET', instr[2])]
+        elif opname == 'BINOP_LL':
+            expanded += [('LOCAL_GET', instr[2]), ('LOCAL_GET', instr[3]), (instr[1],)]
+        elif opname == 'BINOP_LC':
+            expanded += [('LOCAL_GET', instr[2]), ('CONSTI', instr[3]), (instr[1],)]
+        elif opname == 'IF_CMP':
+            expanded += [(instr[1],), ('IF',)]
+        elif opname == 'CBREAK_IFNOT':
+            if len(instr) > 1:
+                expanded.append((instr[1],))
+            expanded += [('CONSTI', 0), ('EQI',), ('CBREAK',)]
+        elif opname == 'NEGI':
+            expanded += [('CONSTI', -1), ('MULI',)]
+        elif opname == 'NEGF':
+            expanded += [('CONSTF', -1.0), ('MULF',)]
+        elif opname == 'LOCAL_TEE':
+            expanded += [('LOCAL_SET', instr[1]), ('LOCAL_GET', instr[1])]
+        else:
+            expanded.append(instr)
+    return expanded
@@ -0,0 +1,173 @@
+# inline.py
+'''
+Expansión en línea (inlining) de funciones pequeñas
+===================================================
+
+Reemplaza CALL f por el cuerpo de f cuando f es pequeña y no recursiva.
+Los argumentos ya están en la pila, así que el cuerpo copiado empieza
+guardándolos en los parámetros (en orden inverso) y termina dejando el
+valor de retorno en la pila:
+
+    func mod(a int, b int) int {         LOCAL_SET b$1$mod
+        return a - b * (a / b);          LOCAL_SET a$1$mod
+    }                                    LOCAL_GET a$1$mod
+                                         ...
+    CALL mod               ==>           SUBI
+
+Las locales y parámetros del cuerpo copiado se renombran como
+nombre$n$función (n cuenta las expansiones en la función que llama),
+así no chocan con las de quien llama ni entre dos copias.
+
+Una función se puede expandir si:
+
+  * no es main ni una función importada,
+  * no está en un ciclo del grafo de llamadas (recursión directa o
+    mutua),
+  * tiene un solo RET, al final (el código es estructurado: un RET en
+    medio del cuerpo no tiene equivalente sin llamada),
+  * su tamaño (instrucciones sin el RET) no supera el presupuesto.
+
+Las funciones se procesan de abajo hacia arriba en el grafo de llamadas,
+de modo que el tamaño que cuenta es el de la función con sus propias
+llamadas ya expandidas. Las llamadas desde main no se expanden: el
+código del nivel superior no tiene variables locales en la StackMachine.
+
+Con un perfil (ver profile_from) el presupuesto depende de la llamada:
+las aristas caller -> callee ejecutadas al menos hot_calls veces usan
+hot_budget y las que no se ejecutaron nunca no se expanden.
+
+    python -m benchmarks.bench_inline
+'''
+
+# Instrucciones (sin contar el RET) de una función expandible
+DEFAULT_BUDGET = 40
+
+# Presupuesto y llamadas mínimas de una arista caliente del perfil
+HOT_BUDGET = 200
+HOT_CALLS = 1000
+
+def profile_from(vm):
+    '''
+    Perfil {(caller, callee): llamadas} a partir de una ProfilingMachine
+    ya ejecutada.
+    '''
+    return {edge: stat[0] for edge, stat in vm.edges.items()}
+
+def _callees(func):
+    return {instr[1] for instr in func.code if instr[0] == 'CALL'}
+
+def recursive_functions(module):
+    '''
+    Funciones que pueden llamarse a sí mismas (directa o indirectamente).
+    '''
+    graph = {name: _callees(func) & module.functions.keys()
+             for name, func in module.functions.items()}
+    recursive = set()
+    for name in graph:
+        seen = set()
+        pending = list(graph[name])
+        while pending:
+            callee = pending.pop()
+            if callee == name:
+                recursive.add(name)
+                break
+            if callee not in seen:
+                seen.add(callee)
+                pending.extend(graph[callee])
+    return recursive
+
+def _bottom_up(module):
+    # Postorden del grafo de llamadas: cada función después de sus callees
+    order = []
+    seen = set()
+    for root in module.functions:
+        if root in seen:
+            continue
+        seen.add(root)
+        stack = [(root, iter(sorted(_callees(module.functions[root]))))]
+        while stack:
+            name, callees = stack[-1]
+            for callee in callees:
+                if callee in module.functions and callee not in seen:
+                    seen.add(callee)
+                    stack.append((callee, iter(sorted(_callees(module.functions[callee])))))
+                    break
+            else:
+                stack.pop()
+                order.append(name)
+    return order
+
+def _size(func):
+    code = func.code
+    if func.imported or not code or code[-1] != ('RET',):
+        return None
+    if any(instr[0] == 'RET' for instr in code[:-1]):
+        return None
+    return len(code) - 1
+
+def _rename(instr, names):
+    opname = instr[0]
+    if opname in ('LOCAL_GET', 'LOCAL_SET', 'LOCAL_TEE'):
+        return (opname, names[instr[1]])
+    if opname == 'LOCAL_GET2':
+        return (opname, names[instr[1]], names[instr[2]])
+    if opname == 'BINOP_LL':
+        return (opname, instr[1], names[instr[2]], names[instr[3]])
+    if opname == 'BINOP_LC':
+        return (opname, instr[1], names[instr[2]], instr[3])
+    return instr
+
+class _Names(dict):
+    # Nombre original -> nombre renombrado, creado al primer uso
+    def __init__(self, suffix):
+        super().__init__()
+        self.suffix = suffix
+
+    def __missing__(self, name):
+        renamed = self[name] = f"{name}${self.suffix}"
+        return renamed
+
+def _expand(caller, callee, count):
+    names = _Names(f"{count}${callee.name}")
+    body = [('LOCAL_SET', names[parm]) for parm in reversed(callee.parmnames)]
+    body += [_rename(instr, names) for instr in callee.code[:-1]]
+    types = dict(zip(callee.parmnames, callee.parmtypes))
+    types.update(callee.locals)
+    for name, renamed in names.items():
+        if name in types:
+            caller.locals[renamed] = types[name]
+    return body
+
+def inline_module(module, budget=DEFAULT_BUDGET, profile=None,
+                  hot_calls=HOT_CALLS, hot_budget=HOT_BUDGET):
+    '''
+    Expande en línea las llamadas a funciones pequeñas (en el lugar).
+    Retorna el número de llamadas expandidas.
+    '''
+    recursive = recursive_functions(module)
+    expanded = 0
+    for name in _bottom_up(module):
+        caller = module.functions[name]
+        if name == 'main' or caller.imported:
+            continue
+        code = []
+        count = 0
+        for instr in caller.code:
+            callee = module.functions.get(instr[1]) if instr[0] == 'CALL' else None
+            if callee is None or callee.name in recursive or callee.name == 'main':
+                code.append(instr)
+                continue
+            limit = budget
+            if profile is not None:
+                calls = profile.get((name, callee.name), 0)
+                limit = 0 if calls == 0 else hot_budget if calls >= hot_calls else budget
+            size = _size(callee)
+            if size is None or size > limit or limit == 0:
+                code.append(instr)
+                continue
+            count += 1
+            code += _expand(caller, callee, count)
+        if count:
+            caller.code = code
+            expanded += count
+    return expanded
@@ -0,0 +1,122 @@
+# irutil.py
+'''
+Utilidades para analizar el código IR de una función.
+
+El código IR es una lista de tuplas (opcode, operandos...). La mayoría
+de las transformaciones necesitan saber cuántos valores consume y
+produce cada instrucción en la pila. Esa información está en la tabla
+_stack_effect. Las instrucciones CALL dependen de la función llamada,
+por lo que se resuelven con el IRModule.
+'''
+
+# (valores consumidos, valores producidos) por cada opcode
+_stack_effect = {
+    'CONSTI': (0, 1),
+    'CONSTF': (0, 1),
+    'ADDI': (2, 1), 'SUBI': (2, 1), 'MULI': (2, 1), 'DIVI': (2, 1),
+    'ANDI': (2, 1), 'ORI': (2, 1),
+    'LTI': (2, 1), 'LEI': (2, 1), 'GTI': (2, 1),
+    'GEI': (2, 1), 'EQI': (2, 1), 'NEI': (2, 1),
+    'ADDF': (2, 1), 'SUBF': (2, 1), 'MULF': (2, 1), 'DIVF': (2, 1),
+    'LTF': (2, 1), 'LEF': (2, 1), 'GTF': (2, 1),
+    'GEF': (2, 1), 'EQF': (2, 1), 'NEF': (2, 1),
+    'ITOF': (1, 1), 'FTOI': (1, 1),
+    'PRINTI': (1, 0), 'PRINTF': (1, 0), 'PRINTB': (1, 0), 'FLUSH': (0, 0),
+    'PEEKI': (1, 1), 'PEEKF': (1, 1), 'PEEKB': (1, 1),
+    'POKEI': (2, 0), 'POKEF': (2, 0), 'POKEB': (2, 0),
+    'GROW': (1, 1),
+    'LOCAL_GET': (0, 1), 'LOCAL_SET': (1, 0),
+    'GLOBAL_GET': (0, 1), 'GLOBAL_SET': (1, 0),
+    'IF': (1, 0), 'ELSE': (0, 0), 'ENDIF': (0, 0),
+    'LOOP': (0, 0), 'CBREAK': (1, 0), 'CONTINUE': (0, 0), 'ENDLOOP': (0, 0),
+    'RET': (0, 0),
+
+    # Superinstrucciones (optimizer/fusion.py)
+    'LOCAL_GET2': (0, 2),
+    'BINOP_LL': (0, 1),
+    'BINOP_LC': (0, 1),
+    'IF_CMP': (2, 0),
+
+    # Instrucciones del peephole (optimizer/peephole.py)
+    'NEGI': (1, 1), 'NEGF': (1, 1),
+    'LOCAL_TEE': (1, 1),
+}
+
+# Operaciones binarias enteras sin efectos secundarios
+INT_BINOPS = {'ADDI', 'SUBI', 'MULI', 'DIVI', 'LTI', 'LEI', 'GTI', 'GEI', 'EQI', 'NEI'}
+
+# Comparaciones enteras (producen 0/1)
+INT_COMPARES = {'LTI', 'LEI', 'GTI', 'GEI', 'EQI', 'NEI'}
+
+# Comparación inversa: not (a op b) == a inversa b
+INVERSE_COMPARES = {'LTI': 'GEI', 'LEI': 'GTI', 'GTI': 'LEI',
+                    'GEI': 'LTI', 'EQI': 'NEI', 'NEI': 'EQI'}
+
+# Instrucciones cuyo resultado es flotante
+FLOAT_RESULTS = {'CONSTF', 'ADDF', 'SUBF', 'MULF', 'DIVF', 'ITOF', 'NEGF', 'PEEKF'}
+
+# Instrucciones de control estructurado
+CONTROL_OPS = {'IF', 'IF_CMP', 'ELSE', 'ENDIF', 'LOOP', 'CBREAK',
+               'CBREAK_IFNOT', 'CONTINUE', 'ENDLOOP', 'RET'}
+
+def stack_effect(instr, module=None):
+    '''
+    Retorna (consumidos, producidos) para la instrucción dada. Para CALL
+    se consulta la función en el módulo: consume sus parámetros y produce
+    un valor si tiene tipo de retorno.
+    '''
+    opname = instr[0]
+    if opname == 'CALL':
+        if module is None or instr[1] not in module.functions:
+            raise KeyError(f"No se conoce la función '{instr[1]}'")
+        func = module.functions[instr[1]]
+        return len(func.parmnames), (1 if func.return_type else 0)
+    if opname == 'CBREAK_IFNOT':
+        return (2 if len(instr) > 1 else 1), 0
+    return _stack_effect[opname]
+
+def expression_start(code, end, module=None):
+    '''
+    Busca hacia atrás desde code[end-1] el índice donde comienza la
+    expresión que deja exactamente un valor en la pila al llegar a `end`.
+    Retorna None si en el camino aparece una instrucción de control o
+    una instrucción desconocida.
+    '''
+    need = 1
+    for index in range(end - 1, -1, -1):
+        instr = code[index]
+        if instr[0] in CONTROL_OPS:
+            return None
+        try:
+            pops, pushes = stack_effect(instr, module)
+        except KeyError:
+            return None
+        if pushes > need:
+            return None
+        need = need - pushes + pops
+        if need == 0:
+            return index
+    return None
+
+def local_reads(instr):
+    '''
+    Variables locales que lee la instrucción (incluidas las fusionadas).
+    '''
+    opname = instr[0]
+    if opname == 'LOCAL_GET':
+        return (instr[1],)
+    if opname == 'LOCAL_GET2':
+        return (instr[1], instr[2])
+    if opname == 'BINOP_LL':
+        return (instr[2], instr[3])
+    if opname == 'BINOP_LC':
+        return (instr[2],)
+    return ()
+
+def local_write(instr):
+    '''
+    Variable local que escribe la instrucción, o None.
+    '''
+    if instr[0] in ('LOCAL_SET', 'LOCAL_TEE'):
+        return instr[1]
+    return None
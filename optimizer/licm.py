@@ -0,0 +1,347 @@
+# licm.py
+'''
+Movimiento de código invariante y reducción de fuerza en ciclos
+===============================================================
+
+Los ciclos del IR son regiones estructuradas LOOP ... ENDLOOP. El
+"preheader" de un ciclo es el código justo antes de su LOOP: se ejecuta
+una vez cada vez que se entra al ciclo.
+
+Código invariante (LICM): una expresión de operaciones que no pueden
+fallar (CANNOT_FAIL, ver dce.py) cuyas hojas son constantes o variables
+que el ciclo no modifica da el mismo valor en todas las iteraciones. Se calcula una vez
+en el preheader, en una variable nueva, y dentro del ciclo se lee esa
+variable. Se mueven las expresiones invariantes maximales con al menos
+una operación; las repetidas comparten la variable:
+
+    LOOP                               GLOBAL_GET w
+      ...                              GLOBAL_GET h
+      GLOBAL_GET w          ==>        MULI
+      GLOBAL_GET h                     GLOBAL_SET $inv1
+      MULI                             LOOP
+      ...                                ...
+    ENDLOOP                              GLOBAL_GET $inv1
+                                         ...
+                                       ENDLOOP
+
+El preheader se ejecuta aunque el ciclo dé cero vueltas, así que solo se
+mueve lo que no puede fallar: FTOI (int() de inf o NaN) y DIVI se quedan
+en el ciclo, y una variable solo se lee antes del LOOP si seguro tiene
+valor. Una variable es invariante si el ciclo no la escribe, tiene
+valor al entrar (es un parámetro, una global const leída desde una
+función, o se asigna antes del LOOP fuera de cualquier bloque que ya
+se cerró) y, si es global y el ciclo tiene un CALL, ninguna función la
+asigna.
+
+Reducción de fuerza: una variable de inducción es una variable v que el
+ciclo escribe una sola vez, fuera de cualquier if o ciclo interno, como
+v = v + paso (paso constante o invariante). Un producto v * c con c
+invariante se reemplaza por una variable t que se inicializa en el
+preheader con v * c y se actualiza con t = t + paso * c justo después
+de la asignación de v, de modo que la multiplicación se convierte en una
+suma:
+
+    LOOP                               LOCAL_GET i
+      LOCAL_GET i                      CONSTI 8
+      CONSTI 8                         MULI
+      MULI                             LOCAL_SET $iv1
+      ...                 ==>          LOOP
+      LOCAL_GET i                        LOCAL_GET $iv1
+      CONSTI 1                           ...
+      ADDI                               LOCAL_SET i
+      LOCAL_SET i                        LOCAL_GET $iv1
+    ENDLOOP                              CONSTI 8
+                                         ADDI
+                                         LOCAL_SET $iv1
+                                       ENDLOOP
+
+En la StackMachine una MULI cuesta lo mismo que una ADDI, así que la
+ganancia es solo de instrucciones: cada producto reemplazado ahorra dos
+y la actualización cuesta cuatro por iteración. Por eso solo se reduce
+cuando el ciclo tiene al menos min_products productos iguales.
+
+Las variables nuevas son locales ($inv1, $iv1, ...) y, en main, que no
+tiene variables locales en la StackMachine, globales. Los ciclos se
+procesan de afuera hacia adentro, así una expresión sale del ciclo más
+externo en el que es invariante.
+
+    python -m benchmarks.bench_licm
+'''
+from collections import Counter
+
+from ircode import IRGlobal
+from optimizer.dce import CANNOT_FAIL
+from optimizer.irutil import FLOAT_RESULTS, local_write, stack_effect
+
+# Productos iguales de una variable de inducción necesarios para reducirlos
+MIN_PRODUCTS = 3
+
+def _read_var(instr):
+    # ('L', nombre) o ('G', nombre) de la variable que lee la instrucción
+    if instr[0] == 'LOCAL_GET':
+        return ('L', instr[1])
+    if instr[0] == 'GLOBAL_GET':
+        return ('G', instr[1])
+    return None
+
+def _written_var(instr):
+    name = local_write(instr)
+    if name is not None:
+        return ('L', name)
+    if instr[0] == 'GLOBAL_SET':
+        return ('G', instr[1])
+    return None
+
+def _assigned_before(code, start):
+    # Variables que seguro tienen valor al llegar a code[start]: las que
+    # se escriben en los bloques que siguen abiertos en ese punto
+    open_blocks = [set()]
+    for instr in code[:start]:
+        opname = instr[0]
+        if opname in ('IF', 'IF_CMP', 'LOOP'):
+            open_blocks.append(set())
+        elif opname == 'ELSE':
+            open_blocks[-1] = set()
+        elif opname in ('ENDIF', 'ENDLOOP'):
+            open_blocks.pop()
+        else:
+            var = _written_var(instr)
+            if var is not None:
+                open_blocks[-1].add(var)
+    return set().union(*open_blocks)
+
+def _loop_end(code, start):
+    # Índice del ENDLOOP que cierra el LOOP de code[start]
+    depth = 0
+    for pc in range(start, len(code)):
+        if code[pc][0] == 'LOOP':
+            depth += 1
+        elif code[pc][0] == 'ENDLOOP':
+            depth -= 1
+            if depth == 0:
+                return pc
+    raise ValueError(f"LOOP sin ENDLOOP en {start}")
+
+class _Temps:
+    # Variables nuevas de la pasada: locales, o globales en main
+    def __init__(self, func, module):
+        self.func = func
+        self.module = module
+        self.is_global = func.name == 'main'
+        self.count = Counter()
+
+    def new(self, prefix, type):
+        taken = self.module.globals if self.is_global else self.func.locals
+        while True:
+            self.count[prefix] += 1
+            name = f"${prefix}{self.count[prefix]}"
+            if name not in taken and name not in self.func.parmnames:
+                break
+        if self.is_global:
+            self.module.globals[name] = IRGlobal(name, type)
+        else:
+            self.func.new_local(name, type)
+        return name
+
+    def var(self, name):
+        return ('G' if self.is_global else 'L', name)
+
+    def get(self, name):
+        return ('GLOBAL_GET' if self.is_global else 'LOCAL_GET', name)
+
+    def set(self, name):
+        return ('GLOBAL_SET' if self.is_global else 'LOCAL_SET', name)
+
+class _Loop:
+    # Qué variables son invariantes en code[start:end+1] (LOOP ... ENDLOOP)
+    def __init__(self, code, start, end, defined, call_globals):
+        self.writes = Counter()
+        has_call = False
+        for instr in code[start + 1:end]:
+            var = _written_var(instr)
+            if var is not None:
+                self.writes[var] += 1
+            has_call = has_call or instr[0] == 'CALL'
+        self.defined = defined
+        self.call_globals = call_globals if has_call else set()
+
+    def invariant(self, var):
+        return (var not in self.writes and var in self.defined
+                and not (var[0] == 'G' and var[1] in self.call_globals))
+
+    def leaf(self, instr):
+        # Constante entera o lectura de una variable invariante
+        if instr[0] == 'CONSTI':
+            return True
+        var = _read_var(instr)
+        return var is not None and self.invariant(var)
+
+def _invariant_ranges(code, loop, module):
+    # Rangos (primero, último) de las expresiones invariantes maximales
+    # con al menos una operación dentro de code (sin el LOOP/ENDLOOP)
+    stack = []          # (primero, último, invariante, operaciones)
+    found = []
+    for pc, instr in enumerate(code):
+        pops, pushes = stack_effect(instr, module)
+        operands = stack[len(stack) - pops:] if pops else []
+        del stack[len(stack) - len(operands):]
+        contiguous = (all(a[1] + 1 == b[0] for a, b in zip(operands, operands[1:]))
+                      and (not operands or operands[-1][1] == pc - 1))
+        var = _read_var(instr)
+        if (pushes == 1 and contiguous and all(e[2] for e in operands)
+                and (loop.invariant(var) if var is not None else instr[0] in CANNOT_FAIL)):
+            first = operands[0][0] if operands else pc
+            ops = sum(e[3] for e in operands) + (1 if pops else 0)
+            stack.append((first, pc, True, ops))
+            continue
+        found += [(e[0], e[1]) for e in operands if e[2] and e[3]]
+        stack += [(pc, pc, False, 0)] * pushes
+    return found
+
+def _hoist(body, loop, temps, module):
+    # Retorna (preheader, cuerpo nuevo, expresiones movidas)
+    replace = {}
+    names = {}
+    preheader = []
+    for first, last in _invariant_ranges(body, loop, module):
+        expr = tuple(body[first:last + 1])
+        if expr not in names:
+            kind = 'F' if expr[-1][0] in FLOAT_RESULTS else 'I'
+            names[expr] = temps.new('inv', kind)
+            preheader += list(expr) + [temps.set(names[expr])]
+            loop.defined.add(temps.var(names[expr]))
+        replace[first] = (last, temps.get(names[expr]))
+    out = []
+    pc = 0
+    while pc < len(body):
+        if pc in replace:
+            last, instr = replace[pc]
+            out.append(instr)
+            pc = last + 1
+        else:
+            out.append(body[pc])
+            pc += 1
+    return preheader, out, len(names)
+
+def _step(window, var, loop):
+    # Paso de v = v + paso en las tres instrucciones antes del SET, o None
+    if len(window) != 3:
+        return None
+    a, b, op = window
+    if op == ('ADDI',):
+        if _read_var(a) == var and loop.leaf(b):
+            return b
+        if _read_var(b) == var and loop.leaf(a):
+            return a
+    if op == ('SUBI',) and _read_var(a) == var and b[0] == 'CONSTI':
+        return ('CONSTI', -b[1])
+    return None
+
+def _induction_variables(body, loop):
+    # {variable: (índice de la asignación, paso)}
+    ivs = {}
+    depth = 0
+    for pc, instr in enumerate(body):
+        opname = instr[0]
+        if opname in ('IF', 'IF_CMP', 'LOOP'):
+            depth += 1
+        elif opname in ('ENDIF', 'ENDLOOP'):
+            depth -= 1
+        var = _written_var(instr)
+        if (var is None or depth or pc < 3 or opname == 'LOCAL_TEE'
+                or loop.writes[var] != 1 or var not in loop.defined
+                or (var[0] == 'G' and var[1] in loop.call_globals)):
+            continue
+        step = _step(body[pc - 3:pc], var, loop)
+        if step is not None:
+            ivs[var] = (pc, step)
+    return ivs
+
+def _reduce(body, loop, temps, min_products):
+    # Retorna (preheader, cuerpo nuevo, productos reducidos)
+    ivs = _induction_variables(body, loop)
+    products = {}           # (variable, factor) -> índices de los MULI
+    for pc in range(2, len(body)):
+        if body[pc] != ('MULI',):
+            continue
+        a, b = body[pc - 2], body[pc - 1]
+        if _read_var(a) in ivs and loop.leaf(b):
+            key = (_read_var(a), b)
+        elif _read_var(b) in ivs and loop.leaf(a):
+            key = (_read_var(b), a)
+        else:
+            continue
+        products.setdefault(key, []).append(pc)
+    preheader = []
+    replace = {}            # índice del MULI -> instrucción
+    updates = {}            # índice de la asignación -> actualización
+    reduced = 0
+    for (var, factor), sites in products.items():
+        if len(sites) < min_products:
+            continue
+        set_pc, step = ivs[var]
+        name = temps.new('iv', 'I')
+        read = ('LOCAL_GET' if var[0] == 'L' else 'GLOBAL_GET', var[1])
+        preheader += [read, factor, ('MULI',), temps.set(name)]
+        if step[0] == 'CONSTI' and factor[0] == 'CONSTI':
+            delta = ('CONSTI', step[1] * factor[1])
+        elif step == ('CONSTI', 1):
+            delta = factor
+        else:
+            delta_name = temps.new('iv', 'I')
+            preheader += [step, factor, ('MULI',), temps.set(delta_name)]
+            delta = temps.get(delta_name)
+        updates.setdefault(set_pc, []).extend(
+            [temps.get(name), delta, ('ADDI',), temps.set(name)])
+        for pc in sites:
+            replace[pc] = temps.get(name)
+        reduced += len(sites)
+    out = []
+    for pc, instr in enumerate(body):
+        if pc + 2 in replace or pc + 1 in replace:
+            continue
+        out.append(replace.get(pc, instr))
+        out += updates.get(pc, [])
+    return preheader, out, reduced
+
+def licm_function(func, module, min_products=MIN_PRODUCTS):
+    '''
+    Mueve el código invariante fuera de los ciclos de la función y
+    reduce los productos de variables de inducción (en el lugar).
+    Retorna (expresiones movidas, productos reducidos).
+    '''
+    temps = _Temps(func, module)
+    call_globals = {instr[1] for f in module.functions.values() if f.name != 'main'
+                    for instr in f.code if instr[0] == 'GLOBAL_SET'}
+    params = {('L', name) for name in func.parmnames}
+    if func.name != 'main':
+        # Una global const se declara con su valor antes de cualquier
+        # función que la use; de las demás no se sabe si ya tienen valor
+        params |= {('G', name) for name, glob in module.globals.items() if glob.const}
+    code = func.code
+    hoisted = reduced = 0
+    pc = 0
+    while pc < len(code):
+        if code[pc] != ('LOOP',):
+            pc += 1
+            continue
+        end = _loop_end(code, pc)
+        defined = params | _assigned_before(code, pc)
+        loop = _Loop(code, pc, end, defined, call_globals)
+        preheader, body, count = _hoist(code[pc + 1:end], loop, temps, module)
+        extra, body, products = _reduce(body, loop, temps, min_products)
+        code = code[:pc] + preheader + extra + [('LOOP',)] + body + code[end:]
+        hoisted += count
+        reduced += products
+        pc += len(preheader) + len(extra) + 1
+    func.code = code
+    return hoisted, reduced
+
+def licm_module(module, min_products=MIN_PRODUCTS):
+    '''
+    Aplica licm_function a todas las funciones del módulo.
+    '''
+    for func in module.functions.values():
+        if not func.imported:
+            licm_function(func, module, min_products)
+    return module
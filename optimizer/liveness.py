@@ -0,0 +1,99 @@
+# liveness.py
+'''
+Análisis de variables vivas (liveness) de las locales de una función.
+
+Una local está viva en un punto si algún camino desde ahí la lee antes
+de volver a escribirla. Es el análisis hacia atrás clásico sobre el CFG:
+
+    live_out(B) = unión de live_in(S) para cada sucesor S
+    live_in(B)  = use(B) | (live_out(B) - def(B))
+
+use(B) son las locales que B lee antes de escribirlas y def(B) las que
+escribe. Los conjuntos se representan como enteros (un bit por local),
+de modo que las uniones y diferencias son operaciones de bits, y los
+bloques se recorren en postorden hasta llegar al punto fijo.
+
+    live = Liveness(build_cfg(func))
+    live.live_in(0)           # locales leídas antes de escribirse:
+                              # parámetros y locales sin inicializar
+    live.live_after(block)    # conjunto vivo después de cada instrucción
+'''
+from optimizer.irutil import local_reads, local_write
+
+class Liveness:
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.names = []
+        self.bit = {}
+        blocks = cfg.blocks
+        code = cfg.code
+        self.use = [0] * len(blocks)
+        self.defs = [0] * len(blocks)
+        for block in blocks:
+            use = defs = 0
+            for pc in range(block.start, block.end):
+                instr = code[pc]
+                for name in local_reads(instr):
+                    mask = self._mask(name)
+                    if not defs & mask:
+                        use |= mask
+                name = local_write(instr)
+                if name is not None:
+                    defs |= self._mask(name)
+            self.use[block.index] = use
+            self.defs[block.index] = defs
+
+        self.live_in_bits = [0] * len(blocks)
+        self.live_out_bits = [0] * len(blocks)
+        reachable = cfg.reachable()
+        order = cfg.reverse_postorder()[::-1]
+        order += [b.index for b in blocks if b.index not in reachable]
+        changed = True
+        while changed:
+            changed = False
+            for index in order:
+                out = 0
+                for succ in blocks[index].succs:
+                    out |= self.live_in_bits[succ]
+                live = self.use[index] | (out & ~self.defs[index])
+                self.live_out_bits[index] = out
+                if live != self.live_in_bits[index]:
+                    self.live_in_bits[index] = live
+                    changed = True
+
+    def _mask(self, name):
+        bit = self.bit.get(name)
+        if bit is None:
+            bit = self.bit[name] = 1 << len(self.names)
+            self.names.append(name)
+        return bit
+
+    def names_of(self, bits):
+        return {name for name in self.names if bits & self.bit[name]}
+
+    def live_in(self, index):
+        return self.names_of(self.live_in_bits[index])
+
+    def live_out(self, index):
+        return self.names_of(self.live_out_bits[index])
+
+    def is_live_out(self, index, name):
+        return bool(self.live_out_bits[index] & self.bit.get(name, 0))
+
+    def live_after(self, block):
+        '''
+        Lista con el conjunto de locales vivas inmediatamente después de
+        cada instrucción del bloque.
+        '''
+        code = self.cfg.code
+        live = self.live_out_bits[block.index]
+        after = [0] * (block.end - block.start)
+        for pc in range(block.end - 1, block.start - 1, -1):
+            after[pc - block.start] = live
+            instr = code[pc]
+            name = local_write(instr)
+            if name is not None:
+                live &= ~self.bit[name]
+            for name in local_reads(instr):
+                live |= self.bit[name]
+        return [self.names_of(bits) for bits in after]
@@ -0,0 +1,118 @@
+# passes.py
+'''
+Administrador de pasadas de optimización
+========================================
+
+Las pasadas se registran en PIPELINE en el orden en que se ejecutan.
+Cada pasada recibe el IRModule, lo modifica en el lugar y declara el
+nivel mínimo de optimización (-O1..-O3) en el que se activa:
+
+    -O0   sin optimizaciones
+    -O1   pasadas baratas y locales
+    -O2   -O1 más las pasadas que analizan el flujo de control
+    -O3   -O2 más las transformaciones específicas de la StackMachine
+          (superinstrucciones)
+
+Cualquier pasada puede activarse o desactivarse por nombre sin importar
+el nivel (PassManager(enable=..., disable=...), o --enable/--disable en
+main.py). `options` pasa argumentos adicionales a una pasada, por ejemplo
+PassManager(2, options={'inline': {'budget': 80}}).
+
+Por cada pasada ejecutada se registra el tiempo y el número de
+instrucciones del módulo antes y después. Si verify es verdadero (por
+omisión, cuando Python corre sin -O) el IR se verifica antes de la
+primera pasada y después de cada una; un IR inválido produce
+IRVerificationError con el nombre de la pasada responsable.
+'''
+import time
+from collections import namedtuple
+
+from optimizer.constfold import fold_module
+from optimizer.cse import cse_module
+from optimizer.dce import dce_module, remove_dead_functions
+from optimizer.fusion import fuse_module
+from optimizer.inline import inline_module
+from optimizer.licm import licm_module
+from optimizer.tailcall import tailcall_module
+from optimizer.peephole import peephole_module
+from optimizer.verify import IRVerificationError, verify_module
+
+Pass = namedtuple('Pass', ['name', 'run', 'level', 'description'])
+
+PassResult = namedtuple('PassResult', ['name', 'seconds', 'before', 'after'])
+
+LEVELS = {
+    0: 'sin optimizaciones',
+    1: 'pasadas locales',
+    2: 'pasadas sobre el flujo de control',
+    3: 'todas, incluidas las específicas de la StackMachine',
+}
+
+PIPELINE = [
+    Pass('tailcall', tailcall_module, 2, 'llamadas de cola recursivas como ciclos'),
+    Pass('inline', inline_module, 2, 'expansión en línea de funciones pequeñas'),
+    Pass('constfold', fold_module, 1, 'plegado y propagación de constantes'),
+    Pass('cse', cse_module, 2, 'subexpresiones comunes en cada bloque básico'),
+    Pass('peephole', peephole_module, 1, 'reescritura de patrones locales (mirilla)'),
+    Pass('licm', licm_module, 2, 'código invariante fuera de los ciclos y reducción de fuerza'),
+    Pass('dce', dce_module, 2, 'código inalcanzable y asignaciones muertas'),
+    Pass('dead-functions', remove_dead_functions, 2, 'funciones que main no llama'),
+    Pass('fusion', fuse_module, 3, 'superinstrucciones de la StackMachine'),
+]
+
+def passes_for_level(level):
+    '''
+    Nombres de las pasadas activas en el nivel dado, en orden.
+    '''
+    if level not in LEVELS:
+        raise ValueError(f"Nivel de optimización inválido: {level}")
+    return [p.name for p in PIPELINE if 0 < p.level <= level]
+
+def instruction_count(module):
+    return sum(len(func.code) for func in module.functions.values())
+
+class PassManager:
+    def __init__(self, level=2, enable=(), disable=(), verify=None, options=None):
+        known = {p.name for p in PIPELINE}
+        unknown = (set(enable) | set(disable)) - known
+        if unknown:
+            raise ValueError(f"Pasadas desconocidas: {', '.join(sorted(unknown))}")
+        active = (set(passes_for_level(level)) | set(enable)) - set(disable)
+        self.level = level
+        self.passes = [p for p in PIPELINE if p.name in active]
+        self.verify = __debug__ if verify is None else verify
+        self.options = options or {}          # pasada -> argumentos adicionales
+        self.results = []
+
+    def run(self, module):
+        '''
+        Ejecuta las pasadas activas sobre el módulo (en el lugar) y lo
+        retorna. Los resultados quedan en self.results.
+        '''
+        self.results = []
+        if self.verify:
+            self._verify(module, 'entrada')
+        for p in self.passes:
+            before = instruction_count(module)
+            start = time.perf_counter()
+            p.run(module, **self.options.get(p.name, {}))
+            seconds = time.perf_counter() - start
+            self.results.append(PassResult(p.name, seconds, before, instruction_count(module)))
+            if self.verify:
+                self._verify(module, p.name)
+        return module
+
+    def _verify(self, module, stage):
+        try:
+            verify_module(module)
+        except IRVerificationError as e:
+            raise IRVerificationError(f"IR inválido después de '{stage}': {e}") from None
+
+    def report(self):
+        lines = [f"{'pasada':<16}{'ms':>9}{'antes':>9}{'después':>9}{'delta':>8}"]
+        for r in self.results:
+            lines.append(f"{r.name:<16}{1000 * r.seconds:>9.3f}{r.before:>9}{r.after:>9}"
+                         f"{r.after - r.before:>+8}")
+        total = sum(r.seconds for r in self.results)
+        lines.append(f"{'total':<16}{1000 * total:>9.3f}")
+        return '\n'.join(lines)
@@ -0,0 +1,123 @@
+# peephole.py
+'''
+Optimizador de mirilla (peephole)
+=================================
+
+Recorre el código con una ventana deslizante sobre las últimas
+instrucciones emitidas y reemplaza los patrones de la tabla RULES por
+secuencias más baratas. Cada vez que una regla se aplica se vuelve a
+revisar la cola, así que las reescrituras se encadenan (NEGI NEGI, que
+aparece al reescribir --x, desaparece por completo).
+
+Reglas:
+
+    CONSTI -1; MULI            ==>  NEGI
+    CONSTF -1.0; MULF          ==>  NEGF
+    NEGI; NEGI                 ==>  (nada)
+    CONSTI 0; ADDI/SUBI        ==>  (nada)
+    CONSTI 1; MULI/DIVI        ==>  (nada)
+    LOCAL_SET x; LOCAL_GET x   ==>  LOCAL_TEE x
+    LOCAL_GET x; LOCAL_SET x   ==>  (nada)
+    ELSE; ENDIF                ==>  ENDIF
+    CONSTI 1; <a> <b> cmp; SUBI; CBREAK
+                               ==>  <a> <b> cmp'; CBREAK
+
+La última es la prueba de un while negada con 1 - prueba: si la prueba
+termina en una comparación entera basta con usar la comparación inversa
+(LTI -> GEI, EQI -> NEI, ...). El generador ya emite así las pruebas
+que son comparaciones; la regla cubre las que lo son después de otras
+pasadas.
+
+NEGI, NEGF y LOCAL_TEE (guardar en la local y dejar el valor en la
+pila) solo existen en la StackMachine; los demás motores los expanden
+con optimizer.fusion.expand_code, igual que las superinstrucciones.
+
+    python -m benchmarks.bench_peephole
+'''
+from collections import Counter, namedtuple
+
+from optimizer.irutil import INVERSE_COMPARES, expression_start
+
+Rule = namedtuple('Rule', ['name', 'pattern', 'rewrite'])
+
+def _window(replace):
+    # Regla sobre la ventana fija: replace(ventana) -> reemplazo o None
+    def rewrite(out, size, module):
+        replacement = replace(out[len(out) - size:])
+        return None if replacement is None else (len(out) - size, replacement)
+    return rewrite
+
+def _when_const(value, replacement):
+    return _window(lambda w: replacement if w[0][1] == value else None)
+
+def _same_local(replacement):
+    return _window(lambda w: replacement(w[0][1]) if w[0][1] == w[1][1] else None)
+
+def _invert_loop_test(out, size, module):
+    # out termina en <cmp>; SUBI; CBREAK. La prueba debe empezar justo
+    # después de un CONSTI 1.
+    end = len(out) - 2
+    start = expression_start(out, end, module)
+    if start is None or start == 0 or out[start - 1] != ('CONSTI', 1):
+        return None
+    compare = out[end - 1][0]
+    return start - 1, out[start:end - 1] + [(INVERSE_COMPARES[compare],), ('CBREAK',)]
+
+RULES = [
+    Rule('neg-int', ('CONSTI', 'MULI'), _when_const(-1, [('NEGI',)])),
+    Rule('neg-float', ('CONSTF', 'MULF'), _when_const(-1.0, [('NEGF',)])),
+    Rule('double-neg', ('NEGI', 'NEGI'), _window(lambda w: [])),
+    Rule('add-zero', ('CONSTI', 'ADDI'), _when_const(0, [])),
+    Rule('sub-zero', ('CONSTI', 'SUBI'), _when_const(0, [])),
+    Rule('mul-one', ('CONSTI', 'MULI'), _when_const(1, [])),
+    Rule('div-one', ('CONSTI', 'DIVI'), _when_const(1, [])),
+    Rule('tee', ('LOCAL_SET', 'LOCAL_GET'), _same_local(lambda name: [('LOCAL_TEE', name)])),
+    Rule('self-assign', ('LOCAL_GET', 'LOCAL_SET'), _same_local(lambda name: [])),
+    Rule('empty-else', ('ELSE', 'ENDIF'), _window(lambda w: [('ENDIF',)])),
+] + [
+    Rule('loop-test', (compare, 'SUBI', 'CBREAK'), _invert_loop_test)
+    for compare in sorted(INVERSE_COMPARES)
+]
+
+# Reglas por último opcode del patrón
+_BY_LAST = {}
+for _rule in RULES:
+    _BY_LAST.setdefault(_rule.pattern[-1], []).append(_rule)
+
+def _apply(out, module, stats):
+    for rule in _BY_LAST.get(out[-1][0], ()):
+        size = len(rule.pattern)
+        if len(out) < size or any(out[len(out) - size + i][0] != op
+                                  for i, op in enumerate(rule.pattern)):
+            continue
+        result = rule.rewrite(out, size, module)
+        if result is None:
+            continue
+        start, replacement = result
+        out[start:] = replacement
+        stats[rule.name] += 1
+        return True
+    return False
+
+def peephole_code(code, module=None, stats=None):
+    '''
+    Retorna una nueva lista de instrucciones con las reglas aplicadas.
+    Si se pasa `stats` (un Counter) se suman las veces que se aplicó
+    cada regla.
+    '''
+    if stats is None:
+        stats = Counter()
+    out = []
+    for instr in code:
+        out.append(instr)
+        while out and _apply(out, module, stats):
+            pass
+    return out
+
+def peephole_module(module, stats=None):
+    '''
+    Aplica el peephole a todas las funciones del módulo (en el lugar).
+    '''
+    for func in module.functions.values():
+        func.code = peephole_code(func.code, module, stats)
+    return module
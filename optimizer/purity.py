@@ -0,0 +1,74 @@
+# purity.py
+'''
+Análisis de pureza de las funciones de un IRModule.
+
+Una función es pura si su resultado depende solo de sus argumentos y no
+tiene efectos visibles: no lee ni escribe variables globales, no usa la
+memoria lineal, no imprime y solo llama a funciones puras. Llamarla dos
+veces con los mismos argumentos da el mismo resultado, así que se puede
+memoizar (ver memo.py).
+
+La pureza se propaga por el grafo de llamadas: se parte de suponer que
+todas las funciones son puras y se descartan, hasta llegar a un punto
+fijo, las que tienen una instrucción impura o llaman a una función
+impura o desconocida. Las funciones recursivas (directa o mutuamente)
+siguen siendo puras si nada en el ciclo es impuro.
+'''
+
+# Instrucciones con efectos (o que dependen de estado fuera de la llamada)
+IMPURE_OPS = {
+    'GLOBAL_GET', 'GLOBAL_SET',
+    'PRINTI', 'PRINTF', 'PRINTB', 'FLUSH',
+    'PEEKI', 'PEEKF', 'PEEKB', 'POKEI', 'POKEF', 'POKEB', 'GROW',
+}
+
+def impure_reasons(module):
+    '''
+    Retorna {función: motivo} para las funciones impuras del módulo. Las
+    funciones que no aparecen son puras.
+    '''
+    reasons = {}
+    calls = {}
+    for name, func in module.functions.items():
+        calls[name] = set()
+        if func.imported:
+            reasons[name] = "función importada"
+            continue
+        for instr in func.code:
+            if instr[0] in IMPURE_OPS:
+                reasons[name] = f"usa {instr[0]}"
+                break
+            if instr[0] == 'CALL':
+                calls[name].add(instr[1])
+
+    changed = True
+    while changed:
+        changed = False
+        for name, callees in calls.items():
+            if name in reasons:
+                continue
+            for callee in sorted(callees):
+                if callee not in module.functions:
+                    reasons[name] = f"llama a {callee}, que no está definida"
+                elif callee in reasons:
+                    reasons[name] = f"llama a {callee}, que es impura"
+                else:
+                    continue
+                changed = True
+                break
+    return reasons
+
+def pure_functions(module):
+    '''
+    Conjunto de nombres de las funciones puras del módulo.
+    '''
+    reasons = impure_reasons(module)
+    return {name for name in module.functions if name not in reasons}
+
+def memoizable_functions(module):
+    '''
+    Funciones puras que retornan un valor (las que vale la pena memoizar).
+    main nunca se incluye: corre una sola vez.
+    '''
+    return {name for name in pure_functions(module)
+            if name != 'main' and module.functions[name].return_type}
@@ -0,0 +1,96 @@
+# tailcall.py
+'''
+Eliminación de llamadas de cola (tail calls) recursivas
+=======================================================
+
+Una llamada de una función a sí misma seguida de RET (directamente o
+después de cerrar uno o más if) es una llamada de cola: el frame de
+quien llama ya no se usa. La pasada la convierte en
+una reasignación de los parámetros y un salto al inicio de la función,
+así la recursión corre en espacio de pila constante y sin el costo de
+CALL/RET:
+
+    func sum(n int, acc int) int {        LOOP
+        if n == 0 {                         ...
+            return acc;                     IF
+        }                                     LOCAL_GET acc
+        return sum(n - 1, acc + n);           RET
+    }                                       ENDIF
+                                            <n - 1> <acc + n>
+    ...                                     LOCAL_SET acc
+    <args>; CALL sum; RET      ==>          LOCAL_SET n
+                                            CONTINUE
+                                          ENDLOOP
+
+El IR no tiene saltos arbitrarios, así que el cuerpo completo se envuelve
+en un LOOP y el salto al inicio es un CONTINUE. Por la misma razón solo
+se transforman las llamadas que no están dentro de un while de la propia
+función (ahí CONTINUE volvería al while y no al inicio). Los argumentos
+ya están todos evaluados en la pila antes de la primera asignación, de
+modo que la reasignación es simultánea.
+'''
+
+def _returns_after(code, pc):
+    # True si desde code[pc] se llega a un RET sin ejecutar nada más que
+    # cierres de if (ENDIF, o ELSE, que salta a su ENDIF)
+    while pc < len(code):
+        opname = code[pc][0]
+        if opname == 'RET':
+            return True
+        if opname == 'ENDIF':
+            pc += 1
+        elif opname == 'ELSE':
+            depth = 1
+            while depth:
+                pc += 1
+                if code[pc][0] in ('IF', 'IF_CMP'):
+                    depth += 1
+                elif code[pc][0] == 'ENDIF':
+                    depth -= 1
+        else:
+            return False
+    return False
+
+def _tail_calls(func):
+    # Índices de los CALL propios en posición de cola, fuera de ciclos
+    code = func.code
+    depth = 0
+    calls = []
+    for pc, instr in enumerate(code):
+        opname = instr[0]
+        if opname == 'LOOP':
+            depth += 1
+        elif opname == 'ENDLOOP':
+            depth -= 1
+        elif (opname == 'CALL' and instr[1] == func.name and depth == 0
+              and _returns_after(code, pc + 1)):
+            calls.append(pc)
+    return calls
+
+def eliminate_tail_calls(func):
+    '''
+    Reescribe las llamadas de cola de la función a sí misma (en el
+    lugar). Retorna el número de llamadas eliminadas.
+    '''
+    calls = set(_tail_calls(func))
+    if not calls:
+        return 0
+    jump = [('LOCAL_SET', name) for name in reversed(func.parmnames)] + [('CONTINUE',)]
+    code = [('LOOP',)]
+    # El RET que sigue inmediatamente a la llamada queda inalcanzable
+    skip = {pc + 1 for pc in calls if func.code[pc + 1] == ('RET',)}
+    for pc, instr in enumerate(func.code):
+        if pc not in skip:
+            code += jump if pc in calls else [instr]
+    code.append(('ENDLOOP',))
+    func.code = code
+    return len(calls)
+
+def tailcall_module(module):
+    '''
+    Elimina las llamadas de cola recursivas de todas las funciones.
+    '''
+    for func in module.functions.values():
+        if not func.imported:
+            eliminate_tail_calls(func)
+    return module
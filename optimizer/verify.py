@@ -0,0 +1,84 @@
+# verify.py
+'''
+Verificador del IR.
+
+Revisa que el código de cada función esté bien formado:
+
+  * todos los opcodes son conocidos (ver irutil._stack_effect) y los CALL
+    llaman a funciones del módulo,
+  * los bloques están balanceados: IF/IF_CMP [ELSE] ENDIF y LOOP ENDLOOP,
+    con CBREAK/CBREAK_IFNOT/CONTINUE solo dentro de un ciclo,
+  * la pila nunca se desapila de más, en ningún camino,
+  * LOCAL_GET/LOCAL_SET/LOCAL_TEE usan parámetros o variables locales de la
+    función (o nombres asignados en ella, como los temporales).
+
+El PassManager lo ejecuta entre pasadas (ver passes.py) para detectar la
+pasada que dejó el IR inválido.
+'''
+from optimizer.irutil import stack_effect
+
+class IRVerificationError(Exception):
+    pass
+
+_OPENERS = {'IF', 'IF_CMP', 'LOOP'}
+_LOOP_EXITS = {'CBREAK', 'CBREAK_IFNOT', 'CONTINUE'}
+
+def verify_function(func, module):
+    name = func.name
+    known = set(func.parmnames) | set(func.locals)
+    known |= {instr[1] for instr in func.code if instr[0] in ('LOCAL_SET', 'LOCAL_TEE')}
+    blocks = []                               # [opcode, profundidad al abrir]
+    depth = 0
+    for pc, instr in enumerate(func.code):
+        opname = instr[0]
+
+        def fail(message):
+            raise IRVerificationError(f"{name}:{pc} {instr}: {message}")
+
+        if opname == 'CALL' and instr[1] not in module.functions:
+            fail(f"función '{instr[1]}' no definida")
+        try:
+            pops, pushes = stack_effect(instr, module)
+        except KeyError:
+            fail("opcode desconocido")
+        if opname in ('LOCAL_GET', 'LOCAL_SET', 'LOCAL_TEE') and instr[1] not in known:
+            fail(f"variable '{instr[1]}' no definida")
+        if opname == 'BINOP_LL' and not {instr[2], instr[3]} <= known:
+            fail("variable no definida")
+        if opname == 'BINOP_LC' and instr[2] not in known:
+            fail(f"variable '{instr[2]}' no definida")
+        if opname == 'LOCAL_GET2' and not {instr[1], instr[2]} <= known:
+            fail("variable no definida")
+
+        if depth < pops:
+            fail(f"desapila {pops} valores con {depth} en la pila")
+        depth += pushes - pops
+
+        if opname in _OPENERS:
+            blocks.append([opname, depth])
+        elif opname == 'ELSE':
+            if not blocks or blocks[-1][0] not in ('IF', 'IF_CMP'):
+                fail("ELSE sin IF")
+            blocks[-1][0] = 'ELSE'
+            depth = blocks[-1][1]
+        elif opname == 'ENDIF':
+            if not blocks or blocks[-1][0] not in ('IF', 'IF_CMP', 'ELSE'):
+                fail("ENDIF sin IF")
+            depth = min(depth, blocks.pop()[1])
+        elif opname == 'ENDLOOP':
+            if not blocks or blocks[-1][0] != 'LOOP':
+                fail("ENDLOOP sin LOOP")
+            depth = blocks.pop()[1]
+        elif opname in _LOOP_EXITS:
+            if not any(block[0] == 'LOOP' for block in blocks):
+                fail(f"{opname} fuera de un ciclo")
+    if blocks:
+        raise IRVerificationError(f"{name}: {blocks[-1][0]} sin cerrar")
+
+def verify_module(module):
+    '''
+    Lanza IRVerificationError con la función y la instrucción del primer
+    problema encontrado.
+    '''
+    for func in module.functions.values():
+        verify_function(func, module)
@@ -0,0 +1,130 @@
+# output.py
+'''
+Salida de los programas GoxLang
+===============================
+
+PRINTI, PRINTF y PRINTB no escriben directamente en sys.stdout sino en
+un "sink" de salida que cada motor de ejecución recibe al construirse.
+Todos los sinks tienen la misma interfaz:
+
+    write(text)     agrega texto a la salida
+    flush()         entrega lo acumulado a su destino
+    close()         fin de la salida (lo llama run_async al terminar)
+
+Sinks disponibles:
+
+  * BufferedSink: acumula en un io.StringIO y escribe en el stream
+    cuando se supera `threshold` caracteres, al terminar el programa y
+    con la instrucción FLUSH. Es el sink por defecto: un programa que
+    imprime 100k números hace unas pocas escrituras en lugar de 100k.
+  * CaptureSink: guarda toda la salida en memoria (getvalue()), útil en
+    pruebas sin redirigir sys.stdout.
+  * DirectSink: escribe y hace flush en cada write (el comportamiento
+    anterior), para sesiones interactivas.
+  * AsyncSink: entrega la salida como un stream asíncrono de fragmentos
+    para StackMachine.run_async:
+
+        vm = StackMachine(AsyncSink())
+        task = asyncio.create_task(vm.run_async())
+        async for chunk in vm.output:
+            ...
+
+Si no se indica un stream se usa el sys.stdout vigente en el momento de
+escribir, de modo que contextlib.redirect_stdout sigue funcionando.
+'''
+import asyncio
+import io
+import sys
+
+class BufferedSink:
+    def __init__(self, stream=None, threshold=8192):
+        self.stream = stream
+        self.threshold = threshold
+        self.buffer = io.StringIO()
+        self.writes = 0                       # Escrituras hechas al stream
+
+    def write(self, text):
+        buffer = self.buffer
+        buffer.write(text)
+        if buffer.tell() >= self.threshold:
+            self.flush()
+
+    def flush(self):
+        text = self.buffer.getvalue()
+        if not text:
+            return
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        stream = self.stream or sys.stdout
+        stream.write(text)
+        stream.flush()
+        self.writes += 1
+
+    def close(self):
+        self.flush()
+
+class CaptureSink:
+    def __init__(self):
+        self.buffer = io.StringIO()
+
+    def write(self, text):
+        self.buffer.write(text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        return self.buffer.getvalue()
+
+class DirectSink:
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, text):
+        stream = self.stream or sys.stdout
+        stream.write(text)
+        stream.flush()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class AsyncSink:
+    def __init__(self, threshold=8192):
+        self.threshold = threshold
+        self.buffer = io.StringIO()
+        self.queue = asyncio.Queue()
+        self.closed = False
+
+    def write(self, text):
+        buffer = self.buffer
+        buffer.write(text)
+        if buffer.tell() >= self.threshold:
+            self.flush()
+
+    def flush(self):
+        text = self.buffer.getvalue()
+        if text:
+            self.buffer.seek(0)
+            self.buffer.truncate()
+            self.queue.put_nowait(text)
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            self.closed = True
+            self.queue.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self.queue.get()
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
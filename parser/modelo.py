@@ -348,6 +348,7 @@ class Location(Expression):
 @dataclass
 class MemoryAddress(Expression):
     address: int
+    type: str = None
 
 # 4.3 Ubicaciones nombradas
 #
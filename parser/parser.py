@@ -117,6 +117,8 @@ class Parser:
     def statement(self):
         if self.match("ID"):
             return self.assignment()
+        elif self.match("DEREF"):
+            return self.memory_assignment()
         elif self.match("VAR") or self.match("CONST"):
             return self.vardecl()
         elif self.match("FUNC"):
@@ -126,8 +128,10 @@ class Parser:
         elif self.match("WHILE"):
             return self.while_stmt()
         elif self.match("BREAK"):
+            self.consume("SEMI", "Se esperaba ';'")
             return Break()
         elif self.match("CONTINUE"):
+            self.consume("SEMI", "Se esperaba ';'")
             return Continue()
         elif self.match("RETURN"):
             return self.return_stmt()
@@ -148,8 +152,15 @@ class Parser:
         self.consume("SEMI", "Se esperaba ';'")
         return Assignment(NamedLocation(location.value), expression)
 
+    def memory_assignment(self):
+        address = self.factor()
+        self.consume("ASSIGN", "Se esperaba '='")
+        expression = self.expression()
+        self.consume("SEMI", "Se esperaba ';'")
+        return Assignment(MemoryAddress(address), expression)
+
     def vardecl(self):
-        is_const = self.tokens[self.current - 1].value == "CONST"
+        is_const = self.tokens[self.current - 1].type == "CONST"
         name = self.consume("ID", "Se esperaba un identificador")
         type_ = None
         if self.match("TYPE"):
@@ -217,7 +228,7 @@ class Parser:
     def orterm(self):
         left = self.andterm()
         while self.match("LOR"):
-            op = "||"
+            op = self.tokens[self.current - 1].type
             right = self.andterm()
             left = BinOp(op, left, right)
         return left
@@ -225,7 +236,7 @@ class Parser:
     def andterm(self):
         left = self.relterm()
         while self.match("LAND"):
-            op = "&&"
+            op = self.tokens[self.current - 1].type
             right = self.relterm()
             left = BinOp(op, left, right)
         return left
@@ -284,6 +295,8 @@ class Parser:
                 self.consume("RPAREN", "Se esperaba ')'")
                 return FunctionCall(name, arguments)
             return NamedLocation(name)
+        elif self.match("DEREF"):
+            return MemoryAddress(self.factor())
         else:
             raise SyntaxError(f"Línea {self.peek().lineno}: Expresión inesperada")
 
@@ -0,0 +1,184 @@
+# profiler.py
+'''
+Perfilador de la StackMachine
+=============================
+
+ProfilingMachine es una StackMachine que mide la ejecución:
+
+  * por opcode: cantidad de ejecuciones y tiempo acumulado
+  * por función: llamadas, tiempo exclusivo (instrucciones de la propia
+    función) e inclusivo (incluye las funciones llamadas)
+  * por arista de llamada (caller -> callee): llamadas y tiempos
+
+Se lee el reloj una sola vez por instrucción: el tiempo transcurrido
+desde la lectura anterior se asigna al opcode recién ejecutado y al
+frame de la función en curso. Cada frame acumula su tiempo exclusivo y
+lo vuelca a las tablas al retornar, así que el costo por instrucción es
+una lectura de reloj y unas pocas sumas.
+
+Las llamadas recursivas se cuentan como en cProfile: el tiempo inclusivo
+solo se suma en la activación más externa de cada función y las llamadas
+"primitivas" son las que no ocurren dentro de otra activación de la
+misma función.
+
+Exportación:
+
+    vm = ProfilingMachine()
+    ...
+    vm.run()
+    print(vm.report())
+    vm.dump_stats('shor.prof')      # pstats.Stats('shor.prof').sort_stats('tottime')
+    vm.dump_folded('shor.folded')   # flamegraph.pl shor.folded > shor.svg
+
+Las pilas "folded" tienen una línea por pila de llamadas, con el tiempo
+exclusivo en microsegundos: `main;_actual_main;shor;powmod;mod 1234`.
+'''
+import marshal
+import time
+
+from stack_machine import StackMachine
+
+# Archivo con el que aparecen las funciones GoxLang en pstats
+PSTATS_FILE = '<goxlang>'
+
+class _Frame:
+    __slots__ = ('name', 'parent', 'path', 'start', 'tt', 'primitive')
+
+    def __init__(self, name, parent, start, primitive):
+        self.name = name
+        self.parent = parent
+        self.path = parent.path + (name,) if parent else (name,)
+        self.start = start
+        self.tt = 0.0                         # Tiempo exclusivo de esta activación
+        self.primitive = primitive            # No es una llamada recursiva
+
+class ProfilingMachine(StackMachine):
+    def __init__(self, output=None, root='main', clock=time.perf_counter):
+        super().__init__(output)
+        self.root = root                      # Nombre del programa cargado
+        self.clock = clock
+        self.opcodes = {}                     # opcode -> [ejecuciones, tiempo]
+        self.function_stats = {}              # función -> [cc, nc, tt, ct]
+        self.edges = {}                       # (caller, callee) -> [nc, cc, tt, ct]
+        self.stacks = {}                      # pila de llamadas -> tiempo exclusivo
+        self._active = {}                     # función -> activaciones en curso
+
+    def run(self):
+        self.pc = 0
+        self.running = True
+        self.current_function = None
+        clock = self.clock
+        opcodes = self.opcodes
+        frame = self._enter(self.root, None, clock())
+        prev = frame.start
+        try:
+            while self.running and self.pc < len(self.program):
+                instr = self.program[self.pc]
+                opname = instr[0]
+                method = getattr(self, f"op_{opname}", None)
+                if method is None:
+                    raise RuntimeError(f"Instrucción desconocida: {opname}")
+                method(*instr[1:])
+                now = clock()
+                elapsed = now - prev
+                prev = now
+                stat = opcodes.get(opname)
+                if stat is None:
+                    stat = opcodes[opname] = [0, 0.0]
+                stat[0] += 1
+                stat[1] += elapsed
+                frame.tt += elapsed
+                if opname == 'CALL':
+                    frame = self._enter(instr[1], frame, now)
+                elif opname == 'RET' and frame.parent:
+                    frame = self._leave(frame, now)
+                self.pc += 1
+        finally:
+            now = clock()
+            while frame:
+                frame = self._leave(frame, now)
+            self.output.flush()
+
+    # --- Frames
+
+    def _enter(self, name, parent, now):
+        active = self._active.get(name, 0)
+        self._active[name] = active + 1
+        return _Frame(name, parent, now, active == 0)
+
+    def _leave(self, frame, now):
+        name = frame.name
+        self._active[name] -= 1
+        ct = now - frame.start if frame.primitive else 0.0
+        stat = self.function_stats.get(name)
+        if stat is None:
+            stat = self.function_stats[name] = [0, 0, 0.0, 0.0]
+        stat[0] += frame.primitive
+        stat[1] += 1
+        stat[2] += frame.tt
+        stat[3] += ct
+        if frame.parent:
+            edge = self.edges.get((frame.parent.name, name))
+            if edge is None:
+                edge = self.edges[(frame.parent.name, name)] = [0, 0, 0.0, 0.0]
+            edge[0] += 1
+            edge[1] += frame.primitive
+            edge[2] += frame.tt
+            edge[3] += ct
+        self.stacks[frame.path] = self.stacks.get(frame.path, 0.0) + frame.tt
+        return frame.parent
+
+    # --- Exportación
+
+    def pstats(self):
+        '''
+        Estadísticas en el formato que carga pstats.Stats:
+        {(archivo, línea, función): (cc, nc, tt, ct, callers)}.
+        '''
+        def label(name):
+            return (PSTATS_FILE, 0, name)
+
+        stats = {}
+        for name, (cc, nc, tt, ct) in self.function_stats.items():
+            stats[label(name)] = (cc, nc, tt, ct, {})
+        for (caller, callee), (nc, cc, tt, ct) in self.edges.items():
+            stats[label(callee)][4][label(caller)] = (nc, cc, tt, ct)
+        return stats
+
+    def dump_stats(self, path):
+        with open(path, 'wb') as f:
+            marshal.dump(self.pstats(), f)
+
+    def folded(self):
+        '''
+        Pilas de llamadas en formato "folded" (una por línea) con el
+        tiempo exclusivo en microsegundos.
+        '''
+        lines = []
+        for path, seconds in sorted(self.stacks.items()):
+            micros = round(seconds * 1e6)
+            if micros:
+                lines.append(f"{';'.join(path)} {micros}")
+        return '\n'.join(lines) + '\n'
+
+    def dump_folded(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.folded())
+
+    def report(self, limit=15):
+        total = sum(t for _, t in self.opcodes.values()) or 1.0
+        lines = [f"{'opcode':<16}{'veces':>12}{'tiempo':>10}{'%':>7}"]
+        for opname, (count, seconds) in sorted(self.opcodes.items(), key=lambda item: -item[1][1])[:limit]:
+            lines.append(f"{opname:<16}{count:>12}{seconds:>10.3f}{100 * seconds / total:>6.1f}%")
+
+        lines.append('')
+        lines.append(f"{'función':<16}{'llamadas':>12}{'exclusivo':>10}{'inclusivo':>10}")
+        for name, (cc, nc, tt, ct) in sorted(self.function_stats.items(), key=lambda item: -item[1][2])[:limit]:
+            calls = str(nc) if cc == nc else f"{nc}/{cc}"
+            lines.append(f"{name:<16}{calls:>12}{tt:>10.3f}{ct:>10.3f}")
+
+        lines.append('')
+        lines.append(f"{'llamada':<28}{'veces':>12}{'inclusivo':>10}")
+        for (caller, callee), (nc, cc, tt, ct) in sorted(self.edges.items(), key=lambda item: -item[1][3])[:limit]:
+            lines.append(f"{caller + ' -> ' + callee:<28}{nc:>12}{ct:>10.3f}")
+        return '\n'.join(lines)
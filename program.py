@@ -0,0 +1,144 @@
+# program.py
+'''
+API para usar GoxLang desde Python
+==================================
+
+CompiledProgram compila un programa una sola vez y permite llamar sus
+funciones desde Python tantas veces como se quiera:
+
+    program = CompiledProgram.from_source(open('samples/sho.gox').read())
+    program.call('gcd', 48, 18)          # 6
+    program.run()                        # ejecuta el programa completo
+
+Todas las llamadas reutilizan la misma StackMachine, con las funciones
+ya cargadas. Antes de cada llamada solo se reinicia el estado de la
+llamada (pila de valores, pila de retorno y variables locales); las
+variables globales y la memoria lineal son el estado del programa y se
+conservan entre llamadas, hasta llamar reset(). Las globales se
+inicializan al ejecutar run(), que corre el código del nivel superior.
+
+Los argumentos y el resultado se convierten según la firma de la
+función:
+
+    int     int (también se acepta bool)
+    float   float (también se acepta int)
+    bool    bool <-> 0/1
+    char    str de un carácter <-> código del carácter
+
+En el IR bool y char son enteros, así que si el programa se construye
+directamente desde un IRModule esas funciones reciben y retornan int.
+'''
+import contextlib
+import io
+
+from ircode import IRCode
+from lexer.tokenizer import Lexer, tokens_spec
+from memory import Memory
+from parser.modelo import Function
+from parser.parser import Parser
+from semantic.check import Checker
+from stack_machine import StackMachine
+
+# Tipo del IR -> tipo del fuente
+_IR_TYPES = {'I': 'int', 'F': 'float'}
+
+def _compile(text):
+    # El verificador imprime la tabla de símbolos: se silencia
+    with contextlib.redirect_stdout(io.StringIO()):
+        tokens = Lexer(tokens_spec).tokenize(text)
+        ast = Parser(tokens).parse()
+        env = Checker.check(ast)
+        return ast, IRCode.gencode(ast.stmts, env)
+
+def compile_source(text):
+    '''
+    Compila el texto fuente de GoxLang y retorna el IRModule.
+    '''
+    return _compile(text)[1]
+
+def _to_vm(value, type, name):
+    if type == 'float':
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return ('float', float(value))
+    elif type == 'char':
+        if isinstance(value, str) and len(value) == 1:
+            return ('int', ord(value))
+    elif type == 'bool':
+        if isinstance(value, (bool, int)):
+            return ('int', 1 if value else 0)
+    elif isinstance(value, int):
+        return ('int', int(value))
+    raise TypeError(f"Argumento '{name}': se esperaba {type}, no {value!r}")
+
+def _from_vm(value, type):
+    if type == 'bool':
+        return bool(value)
+    if type == 'char':
+        return chr(value)
+    return value
+
+class CompiledProgram:
+    def __init__(self, module, signatures=None, output=None):
+        '''
+        `signatures` opcional: {función: ([tipos de parámetros], tipo de
+        retorno)} con los tipos del fuente; si falta, se usan los del IR.
+        '''
+        self.module = module
+        self.signatures = {}
+        for name, func in module.functions.items():
+            self.signatures[name] = (
+                list(zip(func.parmnames, (_IR_TYPES.get(t, 'int') for t in func.parmtypes))),
+                _IR_TYPES.get(func.return_type))
+        for name, (parmtypes, return_type) in (signatures or {}).items():
+            parmnames = module.functions[name].parmnames
+            self.signatures[name] = (list(zip(parmnames, parmtypes)), return_type)
+        self.vm = StackMachine(output)
+        self.vm.load_functions({name: func.code for name, func in module.functions.items()},
+                               {name: func.parmnames for name, func in module.functions.items()})
+        self._stubs = {}                      # función -> [CALL función, RET]
+
+    @classmethod
+    def from_source(cls, text, output=None):
+        ast, module = _compile(text)
+        signatures = {stmt.name: ([p.type for p in stmt.parameters], stmt.return_type)
+                      for stmt in ast.stmts if isinstance(stmt, Function)}
+        return cls(module, signatures, output)
+
+    @property
+    def output(self):
+        return self.vm.output
+
+    def call(self, name, *args):
+        signature = self.signatures.get(name)
+        if signature is None:
+            raise RuntimeError(f"Función '{name}' no definida")
+        params, return_type = signature
+        if len(args) != len(params):
+            raise TypeError(f"{name}() espera {len(params)} argumentos, recibió {len(args)}")
+
+        vm = self.vm
+        vm.stack = [_to_vm(value, type, param) for value, (param, type) in zip(args, params)]
+        vm.call_stack = []
+        vm.locals_stack = []
+        stub = self._stubs.get(name)
+        if stub is None:
+            stub = self._stubs[name] = [('CALL', name), ('RET',)]
+        vm.program = stub
+        vm.run()
+        if return_type is None or not vm.stack:
+            return None
+        return _from_vm(vm.stack[-1][1], return_type)
+
+    def run(self):
+        '''
+        Ejecuta el programa completo (función main) y retorna su código
+        de salida.
+        '''
+        return self.call('main')
+
+    def reset(self):
+        '''
+        Descarta las variables globales y la memoria del programa.
+        '''
+        self.vm.globals = {}
+        self.vm.memory = Memory()
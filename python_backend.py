@@ -0,0 +1,371 @@
+# python_backend.py
+'''
+Backend de código Python
+========================
+
+Traduce un IRModule a código fuente de Python y lo compila con
+compile()/exec, de modo que el programa GoxLang lo ejecuta directamente
+el bytecode de CPython.
+
+  * Cada IRFunction se convierte en una función `f_<nombre>` cuyos
+    parámetros y variables locales son variables locales de Python
+    (`l_<nombre>`). Las globales son globales del módulo (`g_<nombre>`).
+  * La pila se simula durante la traducción: las expresiones se arman
+    como texto y solo se guardan en una variable de pila (`s0`, `s1`, ...)
+    cuando una sentencia se ejecuta con valores pendientes debajo de sus
+    operandos.
+  * PRINTI/PRINTF/PRINTB escriben en el sink de salida del programa
+    (`out_write`, ver output.py) y FLUSH llama a `out_flush`.
+  * PEEK/POKE/GROW se traducen a llamadas `mem_peeki(addr)`, ... a los
+    métodos de la Memory del programa (ver memory.py).
+  * LOOP/CBREAK/CONTINUE/ENDLOOP se traducen a `while`/`break`/`continue`
+    e IF/ELSE/ENDIF a `if`/`else`.
+
+Por ejemplo, la función mod de shor.gox queda como:
+
+    def f_mod(l_a, l_b):
+        return (l_a - (l_b * (l_a // l_b)))
+
+El código generado se guarda en disco junto al fuente, en
+`__goxcache__/<archivo>.py`, con un hash del IR en la primera línea; si
+el IR no cambia, la siguiente carga reutiliza ese archivo. Si el módulo
+usa alguna instrucción que el backend no soporta, el programa se ejecuta
+en la StackMachine.
+
+    program = PythonProgram(module, 'samples/shor.gox')
+    program.run()
+'''
+import hashlib
+import os
+
+from memory import Memory
+from output import BufferedSink
+from optimizer.fusion import expand_code
+from stack_machine import StackMachine
+
+_ARITH = {
+    'ADDI': '+', 'SUBI': '-', 'MULI': '*', 'DIVI': '//',
+    'ADDF': '+', 'SUBF': '-', 'MULF': '*', 'DIVF': '/',
+}
+
+_COMPARE = {
+    'LTI': '<', 'LEI': '<=', 'GTI': '>', 'GEI': '>=', 'EQI': '==', 'NEI': '!=',
+    'LTF': '<', 'LEF': '<=', 'GTF': '>', 'GEF': '>=', 'EQF': '==', 'NEF': '!=',
+}
+
+# Operaciones de memoria: funciones ligadas a la Memory del programa
+_MEMORY_READ = {'PEEKI': 'mem_peeki', 'PEEKF': 'mem_peekf', 'PEEKB': 'mem_peekb', 'GROW': 'mem_grow'}
+_MEMORY_WRITE = {'POKEI': 'mem_pokei', 'POKEF': 'mem_pokef', 'POKEB': 'mem_pokeb'}
+
+_NEGATED = {'<': '>=', '<=': '>', '>': '<=', '>=': '<', '==': '!=', '!=': '=='}
+
+CACHE_DIR = '__goxcache__'
+
+# Cambia cuando cambia el código generado (invalida la caché)
+GENERATOR_VERSION = '2'
+
+class Unsupported(Exception):
+    '''
+    El IR contiene algo que este backend no sabe traducir.
+    '''
+    pass
+
+def _name(prefix, name):
+    return prefix + name.replace('$', '_')
+
+class _Value:
+    '''
+    Expresión pendiente en la pila simbólica. `simple` indica que leerla
+    no tiene efectos ni depende del orden (constante o variable de pila).
+    Las comparaciones guardan su prueba (y la prueba negada) para usarla
+    sin pasar por 0/1.
+    '''
+    __slots__ = ('text', 'simple', 'test', 'negated')
+
+    def __init__(self, text, simple=False, test=None, negated=None):
+        self.text = text
+        self.simple = simple
+        self.test = test
+        self.negated = negated
+
+    def condition(self):
+        return self.test or self.text
+
+    def negation(self):
+        return self.negated or f'not {self.text}'
+
+class _FunctionTranslator:
+    def __init__(self, func):
+        self.func = func
+        self.module = func.module
+        self.code = expand_code(func.code)
+        self.assigned_globals = set()
+
+    def translate(self):
+        params = ', '.join(_name('l_', p) for p in self.func.parmnames)
+        body = []
+        pc = self._block(0, (), body, 1, loop_depth=0)
+        if pc != len(self.code):
+            raise Unsupported(f"{self.code[pc][0]} sin bloque correspondiente en '{self.func.name}'")
+        lines = [f"def {_name('f_', self.func.name)}({params}):"]
+        if self.assigned_globals:
+            lines.append('    global ' + ', '.join(sorted(self.assigned_globals)))
+        lines.extend(body or ['    pass'])
+        return lines
+
+    # --- Pila simbólica
+
+    def _spill(self, stack, out, indent):
+        # Guarda en variables de pila los valores pendientes antes de una sentencia
+        for depth, value in enumerate(stack):
+            if value.simple:
+                continue
+            var = f's{depth}'
+            out.append('    ' * indent + f'{var} = {value.text}')
+            stack[depth] = _Value(var, simple=True)
+
+    def _emit(self, stack, out, indent, line):
+        self._spill(stack, out, indent)
+        out.append('    ' * indent + line)
+
+    @staticmethod
+    def _pop(stack, count):
+        if len(stack) < count:
+            raise Unsupported("Pila desbalanceada")
+        values = stack[len(stack) - count:]
+        del stack[len(stack) - count:]
+        return values
+
+    # --- Bloques
+
+    def _block(self, pc, stops, out, indent, loop_depth, exit_test=None):
+        '''
+        Traduce instrucciones desde pc hasta un opcode de stops, agregando
+        las líneas a out. Si exit_test es una lista, las pruebas de los
+        CBREAK con los que comienza el bloque se agregan allí en lugar de
+        emitir los if.
+        Retorna el pc del opcode de parada.
+        '''
+        code = self.code
+        stack = []
+        while pc < len(code):
+            instr = code[pc]
+            opname = instr[0]
+            if opname in stops:
+                break
+
+            if opname in ('CONSTI', 'CONSTF'):
+                stack.append(_Value(repr(instr[1]), simple=True))
+            elif opname in _ARITH:
+                a, b = self._pop(stack, 2)
+                if opname == 'SUBI' and a.text == '1' and b.test:
+                    # 1 - (prueba): negación de la comparación
+                    stack.append(self._compare_value(b.negated, b.test))
+                else:
+                    stack.append(_Value(f'({a.text} {_ARITH[opname]} {b.text})'))
+            elif opname in _COMPARE:
+                a, b = self._pop(stack, 2)
+                symbol = _COMPARE[opname]
+                if opname == 'EQI' and b.text == '0' and a.test:
+                    stack.append(self._compare_value(a.negated, a.test))
+                elif opname.endswith('I'):
+                    stack.append(self._compare_value(f'({a.text} {symbol} {b.text})',
+                                                     f'({a.text} {_NEGATED[symbol]} {b.text})'))
+                else:
+                    test = f'({a.text} {symbol} {b.text})'
+                    stack.append(self._compare_value(test, f'not {test}'))
+            elif opname == 'ITOF':
+                a, = self._pop(stack, 1)
+                stack.append(_Value(f'float({a.text})'))
+            elif opname == 'FTOI':
+                a, = self._pop(stack, 1)
+                stack.append(_Value(f'int({a.text})'))
+            elif opname == 'LOCAL_GET':
+                stack.append(_Value(_name('l_', instr[1])))
+            elif opname == 'GLOBAL_GET':
+                stack.append(_Value(_name('g_', instr[1])))
+            elif opname == 'CALL':
+                callee = self.module.functions.get(instr[1])
+                if callee is None:
+                    raise Unsupported(f"Función '{instr[1]}' no definida")
+                args = self._pop(stack, len(callee.parmnames))
+                call = f"{_name('f_', instr[1])}({', '.join(a.text for a in args)})"
+                if callee.return_type:
+                    stack.append(_Value(call))
+                else:
+                    self._emit(stack, out, indent, call)
+
+            elif opname == 'LOCAL_SET':
+                value, = self._pop(stack, 1)
+                self._emit(stack, out, indent, f"{_name('l_', instr[1])} = {value.text}")
+            elif opname == 'GLOBAL_SET':
+                value, = self._pop(stack, 1)
+                var = _name('g_', instr[1])
+                self.assigned_globals.add(var)
+                self._emit(stack, out, indent, f'{var} = {value.text}')
+            elif opname in ('PRINTI', 'PRINTF'):
+                value, = self._pop(stack, 1)
+                self._emit(stack, out, indent, f"out_write(str({value.text}))")
+            elif opname == 'PRINTB':
+                value, = self._pop(stack, 1)
+                self._emit(stack, out, indent, f"out_write(chr({value.text}))")
+            elif opname == 'FLUSH':
+                self._emit(stack, out, indent, 'out_flush()')
+            elif opname in _MEMORY_READ:
+                operand, = self._pop(stack, 1)
+                stack.append(_Value(f'{_MEMORY_READ[opname]}({operand.text})'))
+            elif opname in _MEMORY_WRITE:
+                addr, value = self._pop(stack, 2)
+                self._emit(stack, out, indent, f'{_MEMORY_WRITE[opname]}({addr.text}, {value.text})')
+            elif opname == 'RET':
+                value = self._pop(stack, 1)[0] if stack else None
+                self._emit(stack, out, indent, f'return {value.text}' if value else 'return')
+            elif opname == 'IF':
+                test, = self._pop(stack, 1)
+                self._emit(stack, out, indent, f'if {test.condition()}:')
+                then = []
+                pc = self._block(pc + 1, ('ELSE', 'ENDIF'), then, indent + 1, loop_depth)
+                out.extend(then or ['    ' * (indent + 1) + 'pass'])
+                if pc < len(code) and code[pc][0] == 'ELSE':
+                    orelse = []
+                    pc = self._block(pc + 1, ('ENDIF',), orelse, indent + 1, loop_depth)
+                    if orelse:
+                        out.append('    ' * indent + 'else:')
+                        out.extend(orelse)
+                if pc >= len(code):
+                    raise Unsupported("IF sin ENDIF correspondiente")
+            elif opname == 'LOOP':
+                self._spill(stack, out, indent)
+                body, exit = [], []
+                pc = self._block(pc + 1, ('ENDLOOP',), body, indent + 1, loop_depth + 1, exit)
+                if pc >= len(code):
+                    raise Unsupported("LOOP sin ENDLOOP correspondiente")
+                if len(exit) > 1:
+                    tests = ' and '.join(f'({test.negation()})' for test in exit)
+                else:
+                    tests = exit[0].negation() if exit else 'True'
+                header = f'while {tests}:'
+                out.append('    ' * indent + header)
+                out.extend(body or ['    ' * (indent + 1) + 'pass'])
+            elif opname == 'CBREAK':
+                if loop_depth == 0:
+                    raise Unsupported("CBREAK fuera de un ciclo")
+                test, = self._pop(stack, 1)
+                if exit_test is not None and not out and not stack:
+                    exit_test.append(test)
+                else:
+                    self._emit(stack, out, indent, f'if {test.condition()}:')
+                    out.append('    ' * (indent + 1) + 'break')
+            elif opname == 'CONTINUE':
+                if loop_depth == 0:
+                    raise Unsupported("CONTINUE fuera de un ciclo")
+                self._emit(stack, out, indent, 'continue')
+            else:
+                raise Unsupported(f"Instrucción no soportada: {opname}")
+            pc += 1
+
+        # Valores que nadie consumió: se evalúan por sus efectos
+        for value in stack:
+            if not value.simple:
+                out.append('    ' * indent + value.text)
+        return pc
+
+    @staticmethod
+    def _compare_value(test, negated):
+        return _Value(f'(1 if {test} else 0)', test=test, negated=negated)
+
+def generate_source(module):
+    '''
+    Retorna el código Python equivalente al módulo. Lanza Unsupported si
+    alguna función usa instrucciones que el backend no traduce.
+    '''
+    lines = ['# Generado por python_backend.py a partir del IR de GoxLang', '']
+    for func in module.functions.values():
+        lines.extend(_FunctionTranslator(func).translate())
+        lines.append('')
+    return '\n'.join(lines)
+
+def ir_hash(module):
+    '''
+    Hash del IR del módulo (y de la versión del generador); identifica el
+    código generado en la caché.
+    '''
+    digest = hashlib.sha256(GENERATOR_VERSION.encode('ascii'))
+    for name, func in module.functions.items():
+        digest.update(repr((name, func.parmnames, func.return_type, func.code)).encode('utf-8'))
+    return digest.hexdigest()
+
+def cache_path(source_path):
+    directory, filename = os.path.split(os.path.abspath(source_path))
+    return os.path.join(directory, CACHE_DIR, filename + '.py')
+
+class PythonProgram:
+    '''
+    Un IRModule compilado a Python. Si el backend no soporta el módulo,
+    `fallback` es True y las llamadas se ejecutan en una StackMachine
+    creada al cargarlo, que comparte la memoria y la salida del programa
+    (las globales y la memoria se conservan entre llamadas, igual que en
+    el código compilado).
+    '''
+    def __init__(self, module, source_path=None, output=None):
+        self.module = module
+        self.source_path = source_path
+        self.fallback = False
+        self.reason = None
+        self.memory = Memory()
+        self.output = output if output is not None else BufferedSink()
+        self.namespace = {'out_write': self.output.write, 'out_flush': self.output.flush}
+        for fn in set(_MEMORY_READ.values()) | set(_MEMORY_WRITE.values()):
+            self.namespace[fn] = getattr(self.memory, fn[len('mem_'):])
+        try:
+            source, filename = self._load_source()
+        except Unsupported as e:
+            self.fallback = True
+            self.reason = str(e)
+            self.vm = StackMachine(self.output)
+            self.vm.memory = self.memory
+            self.vm.load_functions({n: f.code for n, f in module.functions.items()},
+                                   {n: f.parmnames for n, f in module.functions.items()})
+            return
+        exec(compile(source, filename, 'exec'), self.namespace)
+
+    def _load_source(self):
+        if self.source_path is None:
+            return generate_source(self.module), '<goxlang>'
+
+        path = cache_path(self.source_path)
+        header = f'# ir-hash: {ir_hash(self.module)}\n'
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                cached = f.read()
+            if cached.startswith(header):
+                return cached, path
+
+        source = header + generate_source(self.module)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(source)
+        return source, path
+
+    def call(self, name, *args):
+        if self.fallback:
+            return self._call_stack_machine(name, args)
+        func = self.namespace.get(_name('f_', name))
+        if func is None:
+            raise RuntimeError(f"Función '{name}' no definida")
+        try:
+            return func(*args)
+        finally:
+            self.output.flush()
+
+    def run(self):
+        return self.call('main')
+
+    def _call_stack_machine(self, name, args):
+        vm = self.vm
+        vm.stack = [('float' if isinstance(arg, float) else 'int', arg) for arg in args]
+        vm.call_stack = []
+        vm.locals_stack = []
+        vm.load_program([('CALL', name), ('RET',)])
+        vm.run()
+        return vm.stack[-1][1] if vm.stack else None
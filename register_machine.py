@@ -0,0 +1,459 @@
+# register_machine.py
+'''
+Backend de registros
+====================
+
+Traduce cada IRFunction a código de tres direcciones sobre registros
+virtuales y lo ejecuta en RegisterMachine, sin pila de valores.
+
+Los registros de una función son posiciones de su frame (una lista):
+
+  * primero los parámetros (en orden), luego las variables locales,
+  * luego las constantes que usa la función: el frame de cada llamada
+    se crea copiando una plantilla que ya las tiene cargadas, así que
+    CONSTI/CONSTF no generan instrucciones,
+  * y al final los temporales: la posición k de la pila del IR usa
+    siempre el temporal k.
+
+La traducción simula la pila con números de registro. LOCAL_GET y las
+constantes no generan código (se apila el registro de la variable o de
+la constante) y el resultado de una operación que termina en LOCAL_SET
+se escribe directamente en la variable:
+
+    LOCAL_GET i; CONSTI 1; ADDI; LOCAL_SET i      ->   ADD i, i, #1
+
+Los bloques estructurados se convierten en saltos a posiciones fijas, y
+una comparación seguida de IF o CBREAK se funde en un salto condicional:
+
+    LOOP; LOCAL_GET b; CONSTI 0; EQI; CBREAK
+        ->   JEQ b, #0, <fin del ciclo>
+
+Instrucciones (d: registro destino; a, b: registros; L: posición):
+
+    MOVE d a       ADD/SUB/MUL/DIV/MOD/FDIV d a b     ITOF/FTOI d a
+    LT/LE/GT/GE/EQ/NE d a b          JMP L    JZ a L    JNZ a L
+    JLT/JLE/JGT/JGE/JEQ/JNE a b L    CALL d nombre (args)    RET a
+    GGET d nombre    GSET nombre a    PRINTI/PRINTF/PRINTB a    FLUSH
+    PEEKI/PEEKF/PEEKB d a    POKEI/POKEF/POKEB a b    GROW d a
+
+Los valores no llevan etiqueta de tipo (el verificador ya los comprobó).
+Uso, igual que ClosureMachine:
+
+    machine = RegisterMachine()
+    machine.load_module(module)
+    machine.run()                  # ejecuta main
+    machine.call('gcd', 48, 18)
+'''
+from memory import Memory
+from output import BufferedSink
+from optimizer.fusion import expand_code
+
+_BINOPS = {
+    'ADDI': 'ADD', 'SUBI': 'SUB', 'MULI': 'MUL', 'DIVI': 'DIV', 'MODI': 'MOD',
+    'ADDF': 'ADD', 'SUBF': 'SUB', 'MULF': 'MUL', 'DIVF': 'FDIV',
+}
+
+_COMPARES = {
+    'LTI': 'LT', 'LEI': 'LE', 'GTI': 'GT', 'GEI': 'GE', 'EQI': 'EQ', 'NEI': 'NE',
+    'LTF': 'LT', 'LEF': 'LE', 'GTF': 'GT', 'GEF': 'GE', 'EQF': 'EQ', 'NEF': 'NE',
+}
+
+_NEGATED = {'LT': 'GE', 'LE': 'GT', 'GT': 'LE', 'GE': 'LT', 'EQ': 'NE', 'NE': 'EQ'}
+
+# Instrucciones que escriben su resultado en el registro instr[1]
+_WRITES_DEST = (set(_BINOPS.values()) | set(_COMPARES.values())
+                | {'MOVE', 'ITOF', 'FTOI', 'GGET', 'PEEKI', 'PEEKF', 'PEEKB', 'GROW', 'CALL'})
+
+_MEMORY_READ = {'PEEKI', 'PEEKF', 'PEEKB'}
+_MEMORY_WRITE = {'POKEI', 'POKEF', 'POKEB'}
+
+class RegisterFunction:
+    def __init__(self, name, nparams, template, code, names):
+        self.name = name
+        self.nparams = nparams
+        self.template = template              # Frame inicial (constantes cargadas)
+        self.code = code                      # Instrucciones de tres direcciones
+        self.names = names                    # Registro -> nombre (para dump)
+
+    def dump(self):
+        def operand(arg):
+            if isinstance(arg, tuple):
+                return '(' + ', '.join(operand(a) for a in arg) + ')'
+            if isinstance(arg, int):
+                return self.names.get(arg, f"r{arg}")
+            return str(arg)
+
+        print(f"FUNCTION::: {self.name} ({len(self.template)} registros)")
+        for pc, instr in enumerate(self.code):
+            args = [operand(arg) for arg in instr[1:]]
+            if instr[0].startswith('J'):
+                args[-1] = str(instr[-1])     # Destino del salto
+            print(f"{pc:>4}  {instr[0]:<7}{', '.join(args)}")
+
+class _Lowering:
+    '''
+    Traduce el código de una IRFunction a una RegisterFunction.
+    '''
+    def __init__(self, func, module):
+        self.func = func
+        self.module = module
+        self.slots = {}                       # variable -> registro
+        self.names = {}                       # registro -> nombre
+        self.template = []
+        self.constants = {}                   # (tipo, valor) -> registro
+        self.temps = {}                       # profundidad de pila -> registro
+        self.code = []
+        self.labels = []                      # etiqueta -> posición en code
+        self.stack = []
+        for name in func.parmnames:
+            self._variable(name)
+        for name in func.locals:
+            self._variable(name)
+
+    def _register(self, name, initial=None):
+        register = len(self.template)
+        self.template.append(initial)
+        self.names[register] = name
+        return register
+
+    def _variable(self, name):
+        if name not in self.slots:
+            self.slots[name] = self._register(name)
+        return self.slots[name]
+
+    def _constant(self, value):
+        key = (type(value), value)
+        if key not in self.constants:
+            self.constants[key] = self._register(f"#{value}", value)
+        return self.constants[key]
+
+    def _temp(self, depth):
+        if depth not in self.temps:
+            self.temps[depth] = self._register(f"t{depth}")
+        return self.temps[depth]
+
+    def _is_temp(self, register):
+        return register in self.temps.values()
+
+    def _new_label(self):
+        self.labels.append(None)
+        return len(self.labels) - 1
+
+    def _place(self, label):
+        self.labels[label] = len(self.code)
+
+    def _label_at(self, position):
+        return position in self.labels
+
+    def _pop(self, count):
+        if len(self.stack) < count:
+            raise RuntimeError(f"Pila desbalanceada en '{self.func.name}'")
+        values = self.stack[len(self.stack) - count:]
+        del self.stack[len(self.stack) - count:]
+        return values
+
+    def _push_result(self, opname, *operands):
+        dest = self._temp(len(self.stack))
+        self.code.append((opname, dest) + operands)
+        self.stack.append(dest)
+
+    def _defined_by_last(self, register, back=1):
+        # ¿La instrucción code[-back] calcula `register` y se puede quitar
+        # (nadie salta a ella ni después de ella)?
+        if len(self.code) < back or not self._is_temp(register):
+            return None
+        instr = self.code[-back]
+        if instr[0] not in _WRITES_DEST or instr[1] != register:
+            return None
+        if any(self._label_at(len(self.code) - k) for k in range(back)):
+            return None
+        return instr
+
+    def _branch(self, value, when_true, label):
+        '''
+        Salta a `label` si `value` es distinto de cero (when_true) o igual
+        a cero (not when_true), fundiendo la comparación que lo calculó.
+        '''
+        last = self._defined_by_last(value)
+        if last is not None and last[0] in _NEGATED:
+            self.code.pop()
+            op = last[0] if when_true else _NEGATED[last[0]]
+            self.code.append(('J' + op, last[2], last[3], label))
+            return
+        # CONSTI 1; <comparación>; SUBI: la prueba negada de un while
+        if last is not None and last[0] == 'SUB' and last[2] == self.constants.get((int, 1)):
+            compare = self._defined_by_last(last[3], back=2)
+            if compare is not None and compare[0] in _NEGATED:
+                del self.code[-2:]
+                op = _NEGATED[compare[0]] if when_true else compare[0]
+                self.code.append(('J' + op, compare[2], compare[3], label))
+                return
+        self.code.append(('JNZ' if when_true else 'JZ', value, label))
+
+    def _store(self, name, value):
+        slot = self._variable(name)
+        # Los valores pendientes que leen la variable se copian antes de cambiarla
+        hazards = [i for i, register in enumerate(self.stack) if register == slot]
+        for i in hazards:
+            self.stack[i] = self._temp(i)
+            self.code.append(('MOVE', self.stack[i], slot))
+        last = self._defined_by_last(value) if not hazards else None
+        if last is not None:
+            self.code[-1] = (last[0], slot) + last[2:]
+        elif value != slot:
+            self.code.append(('MOVE', slot, value))
+
+    def lower(self):
+        blocks = []                           # (tipo, etiquetas, pila al abrir)
+        for instr in expand_code(self.func.code):
+            opname = instr[0]
+            stack = self.stack
+            if opname in ('CONSTI', 'CONSTF'):
+                stack.append(self._constant(instr[1]))
+            elif opname == 'LOCAL_GET':
+                stack.append(self._variable(instr[1]))
+            elif opname == 'LOCAL_SET':
+                value, = self._pop(1)
+                self._store(instr[1], value)
+            elif opname in _BINOPS or opname in _COMPARES:
+                a, b = self._pop(2)
+                self._push_result(_BINOPS.get(opname) or _COMPARES[opname], a, b)
+            elif opname in ('ITOF', 'FTOI'):
+                a, = self._pop(1)
+                self._push_result(opname, a)
+            elif opname == 'GLOBAL_GET':
+                self._push_result('GGET', instr[1])
+            elif opname == 'GLOBAL_SET':
+                value, = self._pop(1)
+                self.code.append(('GSET', instr[1], value))
+            elif opname in ('PRINTI', 'PRINTF', 'PRINTB'):
+                value, = self._pop(1)
+                self.code.append((opname, value))
+            elif opname == 'FLUSH':
+                self.code.append(('FLUSH',))
+            elif opname in _MEMORY_READ or opname == 'GROW':
+                a, = self._pop(1)
+                self._push_result(opname, a)
+            elif opname in _MEMORY_WRITE:
+                addr, value = self._pop(2)
+                self.code.append((opname, addr, value))
+            elif opname == 'CALL':
+                name = instr[1]
+                callee = self.module.functions.get(name)
+                if callee is None:
+                    raise RuntimeError(f"Función '{name}' no definida")
+                args = tuple(self._pop(len(callee.parmnames)))
+                if callee.return_type:
+                    self._push_result('CALL', name, args)
+                else:
+                    self.code.append(('CALL', None, name, args))
+            elif opname == 'RET':
+                value = self._pop(1)[0] if stack else None
+                self.code.append(('RET', value))
+            elif opname == 'IF':
+                value, = self._pop(1)
+                orelse, end = self._new_label(), self._new_label()
+                self._branch(value, False, orelse)
+                blocks.append(('if', (orelse, end), list(stack)))
+            elif opname == 'ELSE':
+                kind, (orelse, end), saved = blocks[-1]
+                self.code.append(('JMP', end))
+                self._place(orelse)
+                self.stack = list(saved)
+                blocks[-1] = ('else', (orelse, end), saved)
+            elif opname == 'ENDIF':
+                kind, (orelse, end), saved = blocks.pop()
+                if kind == 'if':
+                    self._place(orelse)
+                elif self.labels[orelse] == len(self.code) and self.code[-1] == ('JMP', end):
+                    # ELSE vacío: el salto al ENDIF iría a la instrucción siguiente
+                    self.code.pop()
+                    self._place(orelse)
+                self._place(end)
+                self.stack = list(saved)
+            elif opname == 'LOOP':
+                top, end = self._new_label(), self._new_label()
+                self._place(top)
+                blocks.append(('loop', (top, end), list(stack)))
+            elif opname == 'CBREAK':
+                value, = self._pop(1)
+                self._branch(value, True, self._innermost_loop(blocks)[1])
+            elif opname == 'CONTINUE':
+                self.code.append(('JMP', self._innermost_loop(blocks)[0]))
+            elif opname == 'ENDLOOP':
+                kind, (top, end), saved = blocks.pop()
+                self.code.append(('JMP', top))
+                self._place(end)
+                self.stack = list(saved)
+            else:
+                raise RuntimeError(f"Instrucción no soportada: {opname}")
+        if blocks:
+            raise RuntimeError(f"{blocks[-1][0].upper()} sin cierre en '{self.func.name}'")
+        # Una función sin RET al final retorna sin valor
+        self.code.append(('RET', None))
+        code = [self._resolve(instr) for instr in self.code]
+        return RegisterFunction(self.func.name, len(self.func.parmnames), self.template, code, self.names)
+
+    @staticmethod
+    def _innermost_loop(blocks):
+        for kind, labels, _ in reversed(blocks):
+            if kind == 'loop':
+                return labels
+        raise RuntimeError("CBREAK/CONTINUE fuera de un ciclo")
+
+    def _resolve(self, instr):
+        if instr[0][0] == 'J':
+            return instr[:-1] + (self.labels[instr[-1]],)
+        return instr
+
+def lower_function(func, module):
+    return _Lowering(func, module).lower()
+
+def lower_module(module):
+    '''
+    Retorna {nombre: RegisterFunction} con todas las funciones del módulo.
+    '''
+    return {name: lower_function(func, module) for name, func in module.functions.items()}
+
+class RegisterMachine:
+    def __init__(self, output=None):
+        self.globals = {}                     # Variables globales
+        self.memory = Memory()                # Memoria lineal
+        self.output = output if output is not None else BufferedSink()
+        self.functions = {}                   # Nombre -> RegisterFunction
+        self.steps = 0                        # Instrucciones ejecutadas
+
+    def load_module(self, module):
+        self.functions.update(lower_module(module))
+
+    def call(self, name, *args):
+        func = self.functions.get(name)
+        if func is None:
+            raise RuntimeError(f"Función '{name}' no definida")
+        if len(args) != func.nparams:
+            raise RuntimeError(f"Función '{name}' espera {func.nparams} argumentos")
+        try:
+            return self._execute(func, args)
+        finally:
+            self.output.flush()
+
+    def run(self):
+        return self.call('main')
+
+    def _execute(self, func, args):
+        functions = self.functions
+        globals_ = self.globals
+        memory = self.memory
+        write = self.output.write
+        frame = func.template[:]
+        frame[:len(args)] = args
+        code = func.code
+        pc = 0
+        calls = []                            # (código, pc, frame, registro destino)
+        steps = 0
+        try:
+            while True:
+                instr = code[pc]
+                pc += 1
+                steps += 1
+                op = instr[0]
+                if op == 'ADD':
+                    frame[instr[1]] = frame[instr[2]] + frame[instr[3]]
+                elif op == 'SUB':
+                    frame[instr[1]] = frame[instr[2]] - frame[instr[3]]
+                elif op == 'MUL':
+                    frame[instr[1]] = frame[instr[2]] * frame[instr[3]]
+                elif op == 'DIV':
+                    frame[instr[1]] = frame[instr[2]] // frame[instr[3]]
+                elif op == 'JMP':
+                    pc = instr[1]
+                elif op == 'JLT':
+                    if frame[instr[1]] < frame[instr[2]]:
+                        pc = instr[3]
+                elif op == 'JLE':
+                    if frame[instr[1]] <= frame[instr[2]]:
+                        pc = instr[3]
+                elif op == 'JGT':
+                    if frame[instr[1]] > frame[instr[2]]:
+                        pc = instr[3]
+                elif op == 'JGE':
+                    if frame[instr[1]] >= frame[instr[2]]:
+                        pc = instr[3]
+                elif op == 'JEQ':
+                    if frame[instr[1]] == frame[instr[2]]:
+                        pc = instr[3]
+                elif op == 'JNE':
+                    if frame[instr[1]] != frame[instr[2]]:
+                        pc = instr[3]
+                elif op == 'MOVE':
+                    frame[instr[1]] = frame[instr[2]]
+                elif op == 'CALL':
+                    callee = functions[instr[2]]
+                    new_frame = callee.template[:]
+                    for i, register in enumerate(instr[3]):
+                        new_frame[i] = frame[register]
+                    calls.append((code, pc, frame, instr[1]))
+                    code, pc, frame = callee.code, 0, new_frame
+                elif op == 'RET':
+                    value = None if instr[1] is None else frame[instr[1]]
+                    if not calls:
+                        return value
+                    code, pc, frame, dest = calls.pop()
+                    if dest is not None:
+                        frame[dest] = value
+                elif op == 'MOD':
+                    frame[instr[1]] = frame[instr[2]] % frame[instr[3]]
+                elif op == 'FDIV':
+                    frame[instr[1]] = frame[instr[2]] / frame[instr[3]]
+                elif op == 'LT':
+                    frame[instr[1]] = 1 if frame[instr[2]] < frame[instr[3]] else 0
+                elif op == 'LE':
+                    frame[instr[1]] = 1 if frame[instr[2]] <= frame[instr[3]] else 0
+                elif op == 'GT':
+                    frame[instr[1]] = 1 if frame[instr[2]] > frame[instr[3]] else 0
+                elif op == 'GE':
+                    frame[instr[1]] = 1 if frame[instr[2]] >= frame[instr[3]] else 0
+                elif op == 'EQ':
+                    frame[instr[1]] = 1 if frame[instr[2]] == frame[instr[3]] else 0
+                elif op == 'NE':
+                    frame[instr[1]] = 1 if frame[instr[2]] != frame[instr[3]] else 0
+                elif op == 'JZ':
+                    if not frame[instr[1]]:
+                        pc = instr[2]
+                elif op == 'JNZ':
+                    if frame[instr[1]]:
+                        pc = instr[2]
+                elif op == 'GGET':
+                    if instr[2] not in globals_:
+                        raise RuntimeError(f"Variable global '{instr[2]}' no definida")
+                    frame[instr[1]] = globals_[instr[2]]
+                elif op == 'GSET':
+                    globals_[instr[1]] = frame[instr[2]]
+                elif op == 'PRINTI' or op == 'PRINTF':
+                    write(str(frame[instr[1]]))
+                elif op == 'PRINTB':
+                    write(chr(frame[instr[1]]))
+                elif op == 'PEEKI':
+                    frame[instr[1]] = memory.peeki(frame[instr[2]])
+                elif op == 'POKEI':
+                    memory.pokei(frame[instr[1]], frame[instr[2]])
+                elif op == 'PEEKF':
+                    frame[instr[1]] = memory.peekf(frame[instr[2]])
+                elif op == 'POKEF':
+                    memory.pokef(frame[instr[1]], frame[instr[2]])
+                elif op == 'PEEKB':
+                    frame[instr[1]] = memory.peekb(frame[instr[2]])
+                elif op == 'POKEB':
+                    memory.pokeb(frame[instr[1]], frame[instr[2]])
+                elif op == 'GROW':
+                    frame[instr[1]] = memory.grow(frame[instr[2]])
+                elif op == 'ITOF':
+                    frame[instr[1]] = float(frame[instr[2]])
+                elif op == 'FTOI':
+                    frame[instr[1]] = int(frame[instr[2]])
+                elif op == 'FLUSH':
+                    self.output.flush()
+                else:
+                    raise RuntimeError(f"Instrucción desconocida: {op}")
+        finally:
+            self.steps += steps
@@ -70,7 +70,15 @@ class Checker(Visitor):
         2. Visitar n.expr
         3. Verificar si son tipos compatibles
         '''
+        if isinstance(n.loc, MemoryAddress):
+            # La memoria no tiene tipo: el valor almacenado define la instrucción POKE
+            n.loc.accept(self, env)
+            n.loc.type = n.expr.accept(self, env)
+            return n.loc.type
         loc_type = n.loc.accept(self, env)
+        symbol = env.get(n.loc.name)
+        if isinstance(symbol, Variable) and symbol.is_const:
+            raise Exception(f"Error: No se puede asignar a la constante '{n.loc.name}'")
         expr_type = n.expr.accept(self, env)
         if loc_type != expr_type:
             raise Exception(f"Error: No se puede asignar {expr_type} a {loc_type}")
@@ -113,13 +121,16 @@ class Checker(Visitor):
         if test_type != 'bool':
             raise Exception(f"Línea {n.lineno}: Error: La condición del while debe ser de tipo bool")
         
-        # Marcar que estamos dentro de un while
-        env.add('in_while', True)
+        # Marcar que estamos dentro de un while (solo el más externo)
+        nested = env.get('in_while')
+        if not nested:
+            env.add('in_while', True)
         # Visitar el cuerpo del while
         for stmt in n.body:
             stmt.accept(self, env)
         # Desmarcar al salir del while
-        env.remove('in_while')
+        if not nested:
+            env.remove('in_while')
 
     @multimethod
     def visit(self, n:Union[Break, Continue], env:Symtab):
@@ -170,6 +181,9 @@ class Checker(Visitor):
             value_type = n.value.accept(self, env)
             if n.type and n.type != value_type:
                 raise Exception(f"Error: El tipo de la variable '{n.name}' no coincide con el valor asignado")
+            if not n.type:
+                # Constante sin tipo: se infiere del valor
+                n.type = value_type
         env.add(n.name, n)
         
     @multimethod
@@ -279,6 +293,11 @@ class Checker(Visitor):
     def visit(self, n:MemoryAddress, env:Symtab):
         '''
         1. Visitar n.address (expression) para validar
-        2. Retornar el tipo de datos de la expresión
+        2. Las direcciones son enteras y la lectura retorna un entero
         '''
-        return n.address.accept(self, env)
+        addr_type = n.address.accept(self, env)
+        if addr_type != 'int':
+            raise Exception(f"Error: La dirección de memoria debe ser int, no {addr_type}")
+        if n.type is None:
+            n.type = 'int'
+        return n.type
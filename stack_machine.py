@@ -1,7 +1,67 @@
+import asyncio
+import operator
+import sys
+
+from memory import Memory
+from output import BufferedSink
+
+# Operaciones enteras que pueden aparecer dentro de una superinstrucción
+# (ver optimizer/fusion.py). Las comparaciones producen 0/1.
+_INT_BINOPS = {
+    'ADDI': operator.add,
+    'SUBI': operator.sub,
+    'MULI': operator.mul,
+    'DIVI': operator.floordiv,
+    'LTI': lambda a, b: 1 if a < b else 0,
+    'LEI': lambda a, b: 1 if a <= b else 0,
+    'GTI': lambda a, b: 1 if a > b else 0,
+    'GEI': lambda a, b: 1 if a >= b else 0,
+    'EQI': lambda a, b: 1 if a == b else 0,
+    'NEI': lambda a, b: 1 if a != b else 0,
+}
+
+# Instrucciones que abren un bloque IF (incluidas las fusionadas)
+_IF_OPS = {'IF', 'IF_CMP'}
+
+class ExecutionTrace:
+    '''
+    Buffer circular con las últimas `size` instrucciones ejecutadas:
+    (función, pc, opcode, tope de la pila antes de ejecutarla). Los campos
+    se guardan en listas preasignadas, sin crear objetos por instrucción.
+    Se imprime solo si ocurre un error en ejecución o al llamar dump().
+    '''
+    def __init__(self, size=64, file=None):
+        self.size = size
+        self.file = file                      # None: sys.stderr
+        self.functions = [None] * size
+        self.pcs = [0] * size
+        self.opcodes = [None] * size
+        self.tops = [None] * size
+        self.count = 0                        # Instrucciones registradas
+
+    def entries(self):
+        '''
+        Entradas registradas, de la más antigua a la más reciente.
+        '''
+        start = max(0, self.count - self.size)
+        result = []
+        for i in range(start, self.count):
+            k = i % self.size
+            result.append((self.functions[k] or 'main', self.pcs[k], self.opcodes[k], self.tops[k]))
+        return result
+
+    def dump(self, file=None):
+        file = file or self.file or sys.stderr
+        entries = self.entries()
+        print(f"Últimas {len(entries)} instrucciones ejecutadas:", file=file)
+        for function, pc, opname, top in entries:
+            print(f"  {function:<16}{pc:>6}  {opname:<14}{'' if top is None else top}", file=file)
+
 class StackMachine:
-    def __init__(self):
+    def __init__(self, output=None):
         self.stack = []                       # Pila principal
-        self.memory = [0] * 1024              # Memoria lineal
+        self.output = output if output is not None else BufferedSink()  # Salida (ver output.py)
+        self.memory = Memory()                # Memoria lineal (celdas de 8 bytes)
         self.globals = {}                     # Variables globales
         self.locals_stack = []                # Stack de variables locales por función
         self.call_stack = []                  # Stack de retorno
@@ -11,7 +71,8 @@ class StackMachine:
         self.program = []                     # Programa IR cargado
         self.running = False
         self.current_function = None          # Función actual en ejecución
-        self.debug = False                     # Modo debug
+        self.debug = False                     # Modo debug (activa la traza)
+        self.trace = None                     # ExecutionTrace o None
 
     def debug_print(self, *args):
         if self.debug:
@@ -41,30 +102,106 @@ class StackMachine:
                 for i, instr in enumerate(code):
                     print(f"{i}: {instr}")
 
-    def run(self):
+    def enable_trace(self, size=64, file=None):
+        self.trace = ExecutionTrace(size, file)
+        return self.trace
+
+    def start(self):
+        # Prepara la ejecución del programa cargado (ver step y run_async)
         self.pc = 0
         self.running = True
         self.current_function = None
+
+    def run(self):
+        self.start()
+        if self.debug and self.trace is None:
+            self.enable_trace()
+        try:
+            if self.trace is None:
+                self._run()
+            else:
+                self._run_traced(self.trace)
+        finally:
+            self.output.flush()
+
+    def _run(self):
         while self.running and self.pc < len(self.program):
             instr = self.program[self.pc]
-            opname = instr[0]
-            args = instr[1:] if len(instr) > 1 else []
-            if self.debug:
-                print(f"\nEjecutando: {opname} {args}")
-                print(f"Stack: {self.stack}")
-                if self.locals_stack:
-                    print(f"Locals: {self.locals_stack[-1]}")
-            method = getattr(self, f"op_{opname}", None)
+            method = getattr(self, f"op_{instr[0]}", None)
             if method:
-                method(*args)
+                method(*instr[1:])
             else:
-                raise RuntimeError(f"Instrucción desconocida: {opname}")
+                raise RuntimeError(f"Instrucción desconocida: {instr[0]}")
             self.pc += 1
 
+    def step(self, count):
+        '''
+        Ejecuta a lo sumo `count` instrucciones del programa iniciado con
+        start(). Retorna True si el programa no ha terminado.
+        '''
+        while self.running and self.pc < len(self.program):
+            if count == 0:
+                return True
+            count -= 1
+            instr = self.program[self.pc]
+            method = getattr(self, f"op_{instr[0]}", None)
+            if method:
+                method(*instr[1:])
+            else:
+                raise RuntimeError(f"Instrucción desconocida: {instr[0]}")
+            self.pc += 1
+        return False
+
+    async def run_async(self, slice_size=1000):
+        '''
+        Ejecuta el programa en tajadas de `slice_size` instrucciones y cede
+        el control al event loop entre una y otra, de modo que muchas
+        máquinas pueden compartir un mismo loop de asyncio. La salida se
+        entrega al final de cada tajada; al terminar se cierra el sink
+        (ver output.AsyncSink).
+        '''
+        self.start()
+        try:
+            while self.step(slice_size):
+                self.output.flush()
+                await asyncio.sleep(0)
+        finally:
+            self.output.close()
+
+    def _run_traced(self, trace):
+        # Igual que _run, registrando cada instrucción en el buffer circular
+        functions, pcs, opcodes, tops = trace.functions, trace.pcs, trace.opcodes, trace.tops
+        size = trace.size
+        count = trace.count
+        stack = self.stack
+        try:
+            while self.running and self.pc < len(self.program):
+                instr = self.program[self.pc]
+                k = count % size
+                functions[k] = self.current_function
+                pcs[k] = self.pc
+                opcodes[k] = instr[0]
+                tops[k] = stack[-1] if stack else None
+                count += 1
+                method = getattr(self, f"op_{instr[0]}", None)
+                if method:
+                    method(*instr[1:])
+                else:
+                    raise RuntimeError(f"Instrucción desconocida: {instr[0]}")
+                self.pc += 1
+        except Exception:
+            trace.count = count
+            trace.dump()
+            raise
+        trace.count = count
+
     # Operaciones con enteros
     def op_CONSTI(self, value):
         self.stack.append(('int', value))
 
+    def op_CONSTF(self, value):
+        self.stack.append(('float', value))
+
     def op_ADDI(self):
         b_type, b = self.stack.pop()
         a_type, a = self.stack.pop()
@@ -158,42 +295,55 @@ class StackMachine:
         else:
             raise TypeError("NEI requiere dos enteros")
 
-    # Operaciones de impresión
+    # Operaciones de impresión (la salida va al sink, ver output.py)
     def op_PRINTI(self):
         val_type, value = self.stack.pop()
         if val_type == 'int':
-            print(value, end='', flush=True)  # Forzar flush para ver la salida inmediatamente
+            self.output.write(str(value))
         else:
             raise TypeError("PRINTI requiere un entero")
 
+    def op_PRINTF(self):
+        val_type, value = self.stack.pop()
+        if val_type == 'float':
+            self.output.write(str(value))
+        else:
+            raise TypeError("PRINTF requiere un flotante")
+
     def op_PRINTB(self):
         val_type, value = self.stack.pop()
         if val_type == 'int':
-            print(chr(value), end='', flush=True)  # Forzar flush para ver la salida inmediatamente
+            self.output.write(chr(value))
         else:
             raise TypeError("PRINTB requiere un entero")
 
+    def op_FLUSH(self):
+        self.output.flush()
+
     # Operaciones de control de flujo
     def op_IF(self):
         val_type, value = self.stack.pop()
         if val_type == 'int':
             if value == 0:
-                # Buscar el ELSE o ENDIF correspondiente
-                depth = 1
-                while depth > 0:
-                    self.pc += 1
-                    if self.pc >= len(self.program):
-                        raise RuntimeError("IF sin ENDIF correspondiente")
-                    opname = self.program[self.pc][0]
-                    if opname == 'IF':
-                        depth += 1
-                    elif opname == 'ELSE' and depth == 1:
-                        depth = 0
-                    elif opname == 'ENDIF':
-                        depth -= 1
+                self._skip_to_else()
         else:
             raise TypeError("IF requiere un entero")
 
+    def _skip_to_else(self):
+        # Buscar el ELSE o ENDIF correspondiente
+        depth = 1
+        while depth > 0:
+            self.pc += 1
+            if self.pc >= len(self.program):
+                raise RuntimeError("IF sin ENDIF correspondiente")
+            opname = self.program[self.pc][0]
+            if opname in _IF_OPS:
+                depth += 1
+            elif opname == 'ELSE' and depth == 1:
+                depth = 0
+            elif opname == 'ENDIF':
+                depth -= 1
+
     def op_ELSE(self):
         # Buscar el ENDIF correspondiente
         depth = 1
@@ -202,7 +352,7 @@ class StackMachine:
             if self.pc >= len(self.program):
                 raise RuntimeError("ELSE sin ENDIF correspondiente")
             opname = self.program[self.pc][0]
-            if opname == 'IF':
+            if opname in _IF_OPS:
                 depth += 1
             elif opname == 'ENDIF':
                 depth -= 1
@@ -216,21 +366,24 @@ class StackMachine:
     def op_CBREAK(self):
         val_type, value = self.stack.pop()
         if val_type == 'int':
-            if value == 0:
-                # Buscar el ENDLOOP correspondiente
-                depth = 1
-                while depth > 0:
-                    self.pc += 1
-                    if self.pc >= len(self.program):
-                        raise RuntimeError("CBREAK sin ENDLOOP correspondiente")
-                    opname = self.program[self.pc][0]
-                    if opname == 'LOOP':
-                        depth += 1
-                    elif opname == 'ENDLOOP':
-                        depth -= 1
+            if value != 0:
+                self._break_loop()
         else:
             raise TypeError("CBREAK requiere un entero")
 
+    def _break_loop(self):
+        # Buscar el ENDLOOP correspondiente
+        depth = 1
+        while depth > 0:
+            self.pc += 1
+            if self.pc >= len(self.program):
+                raise RuntimeError("CBREAK sin ENDLOOP correspondiente")
+            opname = self.program[self.pc][0]
+            if opname == 'LOOP':
+                depth += 1
+            elif opname == 'ENDLOOP':
+                depth -= 1
+
     def op_CONTINUE(self):
         # Buscar el LOOP correspondiente
         depth = 1
@@ -245,7 +398,8 @@ class StackMachine:
                 depth += 1
 
     def op_ENDLOOP(self):
-        pass  # No necesita hacer nada
+        # Regresar al LOOP correspondiente (igual que CONTINUE)
+        self.op_CONTINUE()
 
     # Operaciones de variables locales
     def op_LOCAL_GET(self, name):
@@ -266,8 +420,8 @@ class StackMachine:
     def op_CALL(self, name):
         if name not in self.functions:
             raise RuntimeError(f"Función '{name}' no definida")
-        # Guardar el punto de retorno y el programa actual
-        self.call_stack.append((self.pc, self.program))
+        # Guardar el punto de retorno, el programa y la función actual
+        self.call_stack.append((self.pc, self.program, self.current_function))
         # Crear nuevo scope de variables locales
         new_locals = {}
         # Inicializar parámetros de la función
@@ -288,12 +442,82 @@ class StackMachine:
         if not self.call_stack:
             self.running = False
             return
-        # Restaurar el punto de retorno y el programa
-        self.pc, self.program = self.call_stack.pop()
+        # Restaurar el punto de retorno, el programa y la función
+        self.pc, self.program, self.current_function = self.call_stack.pop()
         # Eliminar el scope de variables locales
         if self.locals_stack:
             self.locals_stack.pop()
-        self.current_function = None
+
+    # Instrucciones generadas por optimizer/peephole.py
+    def op_NEGI(self):
+        val_type, value = self.stack.pop()
+        if val_type != 'int':
+            raise TypeError("NEGI requiere un entero")
+        self.stack.append(('int', -value))
+
+    def op_NEGF(self):
+        val_type, value = self.stack.pop()
+        if val_type != 'float':
+            raise TypeError("NEGF requiere un flotante")
+        self.stack.append(('float', -value))
+
+    def op_LOCAL_TEE(self, name):
+        # LOCAL_SET name; LOCAL_GET name
+        if not self.locals_stack:
+            raise RuntimeError("No hay variables locales disponibles")
+        self.locals_stack[-1][name] = self.stack[-1]
+
+    # Superinstrucciones (generadas por optimizer/fusion.py)
+    def _fused_binop(self, op, a_type, a, b_type, b):
+        if a_type != 'int' or b_type != 'int':
+            raise TypeError(f"{op} requiere dos enteros")
+        if op == 'DIVI' and b == 0:
+            raise ZeroDivisionError("División por cero")
+        return _INT_BINOPS[op](a, b)
+
+    def _local(self, name):
+        if not self.locals_stack:
+            raise RuntimeError("No hay variables locales disponibles")
+        try:
+            return self.locals_stack[-1][name]
+        except KeyError:
+            raise RuntimeError(f"Variable local '{name}' no definida") from None
+
+    def op_LOCAL_GET2(self, a, b):
+        # LOCAL_GET a; LOCAL_GET b
+        self.stack.append(self._local(a))
+        self.stack.append(self._local(b))
+
+    def op_BINOP_LL(self, op, a, b):
+        # LOCAL_GET a; LOCAL_GET b; op
+        a_type, a = self._local(a)
+        b_type, b = self._local(b)
+        self.stack.append(('int', self._fused_binop(op, a_type, a, b_type, b)))
+
+    def op_BINOP_LC(self, op, a, value):
+        # LOCAL_GET a; CONSTI value; op
+        a_type, a = self._local(a)
+        self.stack.append(('int', self._fused_binop(op, a_type, a, 'int', value)))
+
+    def op_IF_CMP(self, op):
+        # <comparación>; IF
+        b_type, b = self.stack.pop()
+        a_type, a = self.stack.pop()
+        if not self._fused_binop(op, a_type, a, b_type, b):
+            self._skip_to_else()
+
+    def op_CBREAK_IFNOT(self, op=None):
+        # CONSTI 1; <prueba>; SUBI; CBREAK  (sale del ciclo si la prueba es falsa)
+        if op is None:
+            val_type, value = self.stack.pop()
+            if val_type != 'int':
+                raise TypeError("CBREAK_IFNOT requiere un entero")
+        else:
+            b_type, b = self.stack.pop()
+            a_type, a = self.stack.pop()
+            value = self._fused_binop(op, a_type, a, b_type, b)
+        if value == 0:
+            self._break_loop()
 
     # Operaciones de variables globales
     def op_GLOBAL_GET(self, name):
@@ -306,6 +530,46 @@ class StackMachine:
             raise RuntimeError(f"No hay valor en la pila para asignar a '{name}'")
         self.globals[name] = self.stack.pop()
 
+    # Operaciones de memoria (ver memory.py)
+    def _address(self, opname):
+        addr_type, addr = self.stack.pop()
+        if addr_type != 'int':
+            raise TypeError(f"{opname} requiere una dirección entera")
+        return addr
+
+    def op_GROW(self):
+        val_type, value = self.stack.pop()
+        if val_type != 'int':
+            raise TypeError("GROW requiere un entero")
+        self.stack.append(('int', self.memory.grow(value)))
+
+    def op_PEEKI(self):
+        self.stack.append(('int', self.memory.peeki(self._address('PEEKI'))))
+
+    def op_PEEKF(self):
+        self.stack.append(('float', self.memory.peekf(self._address('PEEKF'))))
+
+    def op_PEEKB(self):
+        self.stack.append(('int', self.memory.peekb(self._address('PEEKB'))))
+
+    def op_POKEI(self):
+        val_type, value = self.stack.pop()
+        if val_type != 'int':
+            raise TypeError("POKEI requiere un entero")
+        self.memory.pokei(self._address('POKEI'), value)
+
+    def op_POKEF(self):
+        val_type, value = self.stack.pop()
+        if val_type != 'float':
+            raise TypeError("POKEF requiere un flotante")
+        self.memory.pokef(self._address('POKEF'), value)
+
+    def op_POKEB(self):
+        val_type, value = self.stack.pop()
+        if val_type != 'int':
+            raise TypeError("POKEB requiere un entero")
+        self.memory.pokeb(self._address('POKEB'), value)
+
 # Ejemplo de uso
 if __name__ == '__main__':
     import sys
@@ -0,0 +1,83 @@
+import unittest
+import pytest
+from closure_machine import ClosureMachine
+from program import compile_source
+from test_stack_machine import SHOR_SOURCE
+
+np = pytest.importorskip('numpy')
+from batch_machine import run_batch
+
+class TestBatchMachine(unittest.TestCase):
+    SOURCE = SHOR_SOURCE + """
+    func is_prime(n int) bool {
+        if n < 2 {
+            return false;
+        }
+        var i int = 2;
+        while i * i <= n {
+            if mod(n, i) == 0 {
+                return false;
+            }
+            i = i + 1;
+        }
+        return true;
+    }
+
+    func collatz(n int) int {
+        var steps int = 0;
+        while n != 1 {
+            if mod(n, 2) == 0 {
+                n = n / 2;
+            } else {
+                n = 3 * n + 1;
+            }
+            steps = steps + 1;
+        }
+        return steps;
+    }
+    """
+
+    def setUp(self):
+        self.module = compile_source(self.SOURCE)
+        self.machine = ClosureMachine()
+        self.machine.load_module(self.module)
+
+    def test_matches_scalar_execution(self):
+        inputs = np.arange(1, 300)
+        for name in ('is_prime', 'collatz'):
+            expected = [self.machine.call(name, n) for n in range(1, 300)]
+            self.assertEqual(run_batch(self.module, name, inputs).tolist(), expected)
+
+    def test_multiple_arguments(self):
+        inputs = np.array([[3, 13, 1000], [2, 10, 1000], [7, 0, 5]])
+        self.assertEqual(run_batch(self.module, 'powmod', inputs).tolist(), [323, 24, 1])
+        self.assertEqual(run_batch(self.module, 'gcd', [[48, 18], [7, 5]]).tolist(), [6, 1])
+
+    def test_int64_overflow_raises(self):
+        module = compile_source("""
+        func sq(x int) int {
+            return x * x;
+        }
+
+        func small_sq(x int) int {
+            if x > 100000 {
+                return 0;
+            }
+            return x * x;
+        }
+        """)
+        # 2**40 * 2**40 no cabe en un carril int64
+        with self.assertRaises(OverflowError):
+            run_batch(module, 'sq', [(2 ** 40,), (3,)])
+        with self.assertRaises(OverflowError):
+            run_batch(module, 'sq', [2 ** 70])
+        self.assertEqual(run_batch(module, 'sq', [3, 2 ** 31]).tolist(), [9, 2 ** 62])
+        # Los carriles inactivos no cuentan
+        self.assertEqual(run_batch(module, 'small_sq', [3, 2 ** 40]).tolist(), [9, 0])
+
+    def test_argument_count_checked(self):
+        with self.assertRaises(ValueError):
+            run_batch(self.module, 'gcd', np.arange(4))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from batch_runner import BatchRunner, JobResult, run_jobs
+from program import compile_source
+from test_stack_machine import SHOR_SOURCE
+
+class TestBatchRunner(unittest.TestCase):
+    SOURCE = SHOR_SOURCE + """
+    func show(n int) int {
+        print n;
+        print ' ';
+        return n * 2;
+    }
+    """
+
+    def test_results_in_order(self):
+        module = compile_source(self.SOURCE)
+        jobs = [('gcd', (48, 18)), ('powmod', (3, 13, 1000)), ('gcd', (7, 5))] * 5
+        results = run_jobs(module, jobs, workers=2, chunksize=2)
+        self.assertEqual([r.value for r in results], [6, 323, 1] * 5)
+
+    def test_output_captured_per_job(self):
+        module = compile_source(self.SOURCE)
+        with BatchRunner(module, workers=2) as runner:
+            results = runner.map([('show', (n,)) for n in range(10)])
+            self.assertEqual(results, [JobResult(2 * n, f"{n} ") for n in range(10)])
+            # El pool se reutiliza entre lotes
+            self.assertEqual(runner.map([('gcd', [12, 8])]), [JobResult(4, '')])
+
+    def test_errors_propagate(self):
+        module = compile_source(self.SOURCE)
+        with self.assertRaises(RuntimeError):
+            run_jobs(module, [('missing', ())], workers=1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import contextlib
+import io
+import unittest
+from optimizer.fusion import fuse_module
+from closure_machine import ClosureMachine
+from program import compile_source
+from benchmarks.common import run_module
+from test_stack_machine import SHOR_SOURCE
+
+class TestClosureMachine(unittest.TestCase):
+    def run_closures(self, module):
+        machine = ClosureMachine()
+        machine.load_module(module)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            result = machine.run()
+        return machine, result, out.getvalue()
+
+    def test_same_output_as_stack_machine(self):
+        for module in (compile_source(SHOR_SOURCE), fuse_module(compile_source(SHOR_SOURCE))):
+            vm, expected = run_module(module)
+            _, result, output = self.run_closures(module)
+            self.assertEqual(output, expected)
+            self.assertEqual(result, vm.stack[-1][1])
+
+    def test_globals_and_break(self):
+        module = compile_source("""
+        var x int = 3;
+        var y int = 2;
+        y = 5;
+        func first(n int) int {
+            var i int = 0;
+            while i < n {
+                if i == 3 {
+                    break;
+                }
+                i = i + 1;
+            }
+            return i;
+        }
+        print first(x + y);
+        """)
+        machine, _, output = self.run_closures(module)
+        self.assertEqual(output, "3")
+        self.assertEqual(machine.globals, {'x': 3, 'y': 5})
+
+    def test_call_function(self):
+        machine = ClosureMachine()
+        machine.load_module(compile_source(SHOR_SOURCE))
+        self.assertEqual(machine.call('gcd', 48, 18), 6)
+        self.assertEqual(machine.call('powmod', 2, 10, 1000), 24)
+
+    def test_deep_recursion_is_a_runtime_error(self):
+        module = compile_source("""
+        func s(n int) int {
+            if n == 0 {
+                return 0;
+            }
+            return n + s(n - 1);
+        }
+        print s(5000);
+        """)
+        self.assertEqual(run_module(module)[1], "12502500")
+        machine = ClosureMachine()
+        machine.load_module(module)
+        self.assertEqual(machine.call('s', 100), 5050)
+        with self.assertRaises(RuntimeError) as cm:
+            machine.call('s', 5000)
+        self.assertNotIsInstance(cm.exception, RecursionError)
+
+if __name__ == '__main__':
+    unittest.main()
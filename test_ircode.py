@@ -1,10 +1,18 @@
 import unittest
+from collections import Counter
 from ircode import IRCode, IRModule, IRFunction, IRGlobal
 from parser.modelo import *
 from semantic.symtab import Symtab
 from lexer.tokenizer import Lexer, tokens_spec
 from parser.parser import Parser
 from semantic.check import Checker
+from optimizer.passes import PassManager
+from tracing_jit import TracingJITMachine
+from register_machine import RegisterMachine, lower_module
+from python_backend import PythonProgram
+from output import CaptureSink
+from program import compile_source
+from benchmarks.common import run_module
 
 class TestIRCode(unittest.TestCase):
     def setUp(self):
@@ -97,5 +105,114 @@ class TestIRCode(unittest.TestCase):
         ]
         self.assertEqual(self.func.code[-2:], expected_code)
 
+    def test_new_temp(self):
+        # Las temporales se numeran por función y no chocan con las locales
+        self.func.new_local('$temp1', 'I')
+        self.assertEqual(self.func.new_temp('F'), '$temp2')
+        self.assertEqual(self.func.locals['$temp2'], 'F')
+        other = IRFunction(self.module, 'other', [], [], 'I')
+        self.assertEqual(other.new_temp('I'), '$temp1')
+        # En main las temporales son globales
+        main = IRFunction(self.module, 'main', [], [], 'I')
+        self.assertEqual(main.new_temp('I'), '$temp1')
+        self.assertIn('$temp1', self.module.globals)
+        self.assertEqual(main.temp_set('$temp1'), ('GLOBAL_SET', '$temp1'))
+        self.assertEqual(other.temp_get('$temp1'), ('LOCAL_GET', '$temp1'))
+
+SHORT_CIRCUIT_SOURCE = """
+var calls int = 0;
+
+func check(x int) bool {
+    calls = calls + 1;
+    return x > 2;
+}
+
+func count(n int) int {
+    var i int = 0;
+    var hits int = 0;
+    while i < n && i * i < 400 {
+        if i > 3 && check(i) {
+            hits = hits + 1;
+        }
+        if i == 1 || check(i) {
+            hits = hits + 10;
+        } else {
+            hits = hits + 100;
+        }
+        if i < 2 && check(i) {
+            hits = hits + 1000;
+        } else {
+            hits = hits - 1;
+        }
+        i = i + 1;
+    }
+    return hits;
+}
+
+var a int = 5;
+var b bool = a > 3 || check(a);
+var c bool = a < 3 && check(a);
+print b;
+print c;
+print count(30);
+print calls;
+while a > 0 || calls < 0 {
+    a = a - 1;
+}
+print a;
+if (a == 0 || a == 1) || false {
+    print 'y';
+}
+"""
+
+class TestShortCircuit(unittest.TestCase):
+    def test_conditions_use_branches(self):
+        module = compile_source(SHORT_CIRCUIT_SOURCE)
+        code = module.functions['count'].code
+        # while i < n && i * i < 400: un CBREAK por lado, sin temporal
+        self.assertEqual(Counter(code)[('CBREAK',)], 2)
+        # Sin optimizar, cada lado sale con la comparación inversa (sin 0/1)
+        start = code.index(('LOOP',))
+        self.assertEqual(code[start + 1:start + 5], [
+            ('LOCAL_GET', 'i'), ('LOCAL_GET', 'n'), ('GEI',), ('CBREAK',),
+        ])
+        self.assertEqual(code[start + 5:start + 11], [
+            ('LOCAL_GET', 'i'), ('LOCAL_GET', 'i'), ('MULI',), ('CONSTI', 400), ('GEI',), ('CBREAK',),
+        ])
+        self.assertNotIn('$temp1', module.functions['count'].locals)
+        self.assertNotIn(('LAND',), code)
+        # if i > 3 && check(i) sin else: dos IF anidados
+        start = code.index(('GTI',))
+        self.assertEqual(code[start + 1:start + 4], [('IF',), ('LOCAL_GET', 'i'), ('CALL', 'check')])
+        self.assertEqual(code[start + 4], ('IF',))
+
+    def test_value_uses_temp(self):
+        module = compile_source(SHORT_CIRCUIT_SOURCE)
+        main = module.functions['main'].code
+        # En main la temporal es global
+        self.assertIn('$temp1', module.globals)
+        self.assertIn(('GLOBAL_SET', '$temp1'), main)
+        self.assertEqual(main[main.index(('GLOBAL_SET', 'b')) - 1], ('GLOBAL_GET', '$temp1'))
+
+    def test_right_side_skipped(self):
+        module = compile_source(SHORT_CIRCUIT_SOURCE)
+        # b = 1, c = 0, count(30) = 376, 37 llamadas a check, a = 0
+        _, output = run_module(module)
+        self.assertEqual(output, "10376370y")
+
+    def test_engines(self):
+        for level in (0, 1, 2, 3):
+            module = PassManager(level, verify=True).run(compile_source(SHORT_CIRCUIT_SOURCE))
+            self.assertEqual(run_module(module)[1], "10376370y")
+            self.assertEqual(run_module(module, TracingJITMachine(threshold=5))[1], "10376370y")
+            vm = RegisterMachine(CaptureSink())
+            vm.functions.update(lower_module(module))
+            vm.run()
+            self.assertEqual(vm.output.getvalue(), "10376370y")
+            program = PythonProgram(module, output=CaptureSink())
+            program.run()
+            self.assertFalse(program.fallback)
+            self.assertEqual(program.output.getvalue(), "10376370y")
+
 if __name__ == '__main__':
     unittest.main()
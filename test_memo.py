@@ -0,0 +1,63 @@
+import unittest
+from memo import MemoCache, MemoizingMachine
+from optimizer.purity import impure_reasons, memoizable_functions, pure_functions
+from program import compile_source
+from benchmarks.common import run_module
+from test_stack_machine import SHOR_SOURCE
+
+class TestMemo(unittest.TestCase):
+    SOURCE = SHOR_SOURCE + """
+    var total int = 0;
+    func fact(n int) int {
+        if n == 0 { return 1; }
+        return n * fact(n - 1);
+    }
+    func add(n int) int {
+        total = total + n;
+        return total;
+    }
+    func uses_add(n int) int {
+        return mod(add(n), 7);
+    }
+    """
+
+    def test_purity_propagates_through_calls(self):
+        module = compile_source(self.SOURCE)
+        self.assertEqual(pure_functions(module), {'mod', 'gcd', 'powmod', 'fact'})
+        reasons = impure_reasons(module)
+        self.assertEqual(reasons['add'], "usa GLOBAL_GET")
+        self.assertEqual(reasons['uses_add'], "llama a add, que es impura")
+        self.assertEqual(reasons['_actual_main'], "usa PRINTI")
+
+    def test_memoized_run_matches(self):
+        module = compile_source(SHOR_SOURCE)
+        vm = MemoizingMachine(memoizable_functions(module))
+        _, out = run_module(module, vm)
+        self.assertEqual(out, "6 323")
+        self.assertEqual(vm.cache.hits + vm.cache.misses,
+                         sum(hits + misses for hits, misses in vm.cache.stats.values()))
+
+    def test_hits_skip_the_call(self):
+        module = compile_source(SHOR_SOURCE + """
+        func twice() int {
+            return gcd(48, 18) + gcd(48, 18);
+        }
+        """)
+        vm, _ = run_module(module, MemoizingMachine({'gcd'}))
+        vm.cache = MemoCache()
+        vm.load_program([('CALL', 'twice'), ('RET',)])
+        vm.run()
+        self.assertEqual(vm.stack[-1], ('int', 12))
+        self.assertEqual(vm.cache.stats['gcd'], [1, 1])
+
+    def test_lru_eviction(self):
+        cache = MemoCache(maxsize=2)
+        for n in range(3):
+            cache.store(('f', (('int', n),)), ('int', n))
+        self.assertIsNone(cache.lookup(('f', (('int', 0),))))
+        self.assertEqual(cache.lookup(('f', (('int', 2),))), ('int', 2))
+        self.assertEqual(cache.stats['f'], [1, 1])
+        self.assertEqual(cache.evictions, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,632 @@
+import contextlib
+import io
+import unittest
+from collections import Counter
+from optimizer.cfg import build_cfg
+from optimizer.liveness import Liveness
+from optimizer.dce import dce_module, remove_dead_functions, remove_unreachable
+from optimizer.inline import inline_module, profile_from, recursive_functions
+from optimizer.tailcall import eliminate_tail_calls, tailcall_module
+from optimizer.licm import licm_function
+from optimizer.cse import cse_function
+from optimizer.constfold import fold_code, fold_module
+from optimizer.fusion import expand_code, fuse_code, fuse_module
+from optimizer.peephole import peephole_code
+from optimizer.passes import PIPELINE, Pass, PassManager, passes_for_level
+from optimizer.verify import IRVerificationError, verify_module
+from closure_machine import ClosureMachine
+from tracing_jit import TracingJITMachine
+from output import CaptureSink
+from profiler import ProfilingMachine
+from program import compile_source
+from benchmarks.common import run_module
+from test_stack_machine import SHOR_SOURCE
+
+class TestFusion(unittest.TestCase):
+    def test_superinstructions_generated(self):
+        module = fuse_module(compile_source(SHOR_SOURCE))
+        self.assertEqual(module.functions['mod'].code, [
+            ('LOCAL_GET2', 'a', 'b'),
+            ('BINOP_LL', 'DIVI', 'a', 'b'),
+            ('MULI',),
+            ('SUBI',),
+            ('RET',),
+        ])
+        gcd = module.functions['gcd'].code
+        # La prueba del while ya viene invertida (b == 0)
+        self.assertEqual(gcd[:3], [
+            ('LOOP',),
+            ('BINOP_LC', 'EQI', 'b', 0),
+            ('CBREAK',),
+        ])
+        # Una prueba que no es comparación: CONSTI 1; <f>; SUBI; CBREAK
+        self.assertEqual(fuse_code([('LOOP',), ('CONSTI', 1), ('LOCAL_GET', 'f'), ('SUBI',),
+                                    ('CBREAK',), ('ENDLOOP',)]),
+                         [('LOOP',), ('LOCAL_GET', 'f'), ('CBREAK_IFNOT',), ('ENDLOOP',)])
+        self.assertIn(('IF_CMP', 'EQI'), module.functions['powmod'].code)
+        self.assertIn(('BINOP_LC', 'DIVI', 'x', 2), module.functions['powmod'].code)
+
+    def test_fused_program_same_output(self):
+        _, expected = run_module(compile_source(SHOR_SOURCE))
+        _, output = run_module(fuse_module(compile_source(SHOR_SOURCE)))
+        self.assertEqual(expected, "6 323")
+        self.assertEqual(output, expected)
+
+CONST_SOURCE = """
+const n = 10;
+const scale = n * 2 + 1;
+var count int = 3;
+func area(x int) int {
+    return x * scale - (4 / 2);
+}
+print area(count);
+print n * n;
+"""
+
+class TestConstFold(unittest.TestCase):
+    def test_fold_code(self):
+        code = [('CONSTI', 2), ('CONSTI', 3), ('MULI',), ('CONSTI', 4), ('ADDI',),
+                ('LOCAL_GET', 'x'), ('CONSTI', 7), ('CONSTI', 2), ('DIVI',), ('SUBI',)]
+        self.assertEqual(fold_code(code), [('CONSTI', 10), ('LOCAL_GET', 'x'),
+                                           ('CONSTI', 3), ('SUBI',)])
+        self.assertEqual(fold_code([('CONSTI', 3), ('ITOF',), ('CONSTF', 0.5), ('MULF',)]),
+                         [('CONSTF', 1.5)])
+        self.assertEqual(fold_code([('CONSTI', 1), ('CONSTI', 2), ('LTI',)]), [('CONSTI', 1)])
+
+    def test_division_by_zero_not_folded(self):
+        code = [('CONSTI', 1), ('CONSTI', 0), ('DIVI',)]
+        self.assertEqual(fold_code(code), code)
+
+    def test_non_finite_float_to_int_not_folded(self):
+        for value in (float('inf'), float('nan')):
+            code = [('CONSTF', value), ('FTOI',)]
+            self.assertEqual(fold_code(code), code)
+        # Un literal de 401 dígitos es inf: el compilador no debe fallar con -O1
+        module = compile_source(f"const x float = 1{'0' * 400}.0;\nvar y int = int(x);\n")
+        PassManager(1).run(module)
+        self.assertIn(('FTOI',), module.functions['main'].code)
+
+    def test_const_globals_propagated(self):
+        module = compile_source(CONST_SOURCE)
+        _, expected = run_module(compile_source(CONST_SOURCE))
+        fold_module(module)
+        self.assertEqual(module.functions['area'].code, [
+            ('LOCAL_GET', 'x'), ('CONSTI', 21), ('MULI',), ('CONSTI', 2), ('SUBI',), ('RET',),
+        ])
+        self.assertIn(('CONSTI', 100), module.functions['main'].code)
+        # count es var: no se propaga
+        self.assertIn(('GLOBAL_GET', 'count'), module.functions['main'].code)
+        _, output = run_module(module)
+        self.assertEqual(output, expected)
+
+    def test_assign_to_const_rejected(self):
+        with self.assertRaises(Exception):
+            compile_source("const n = 1;\nn = 2;\n")
+
+class TestPeephole(unittest.TestCase):
+    def test_rules(self):
+        code = [('LOCAL_GET', 'x'), ('CONSTI', -1), ('MULI',), ('CONSTI', 0), ('ADDI',),
+                ('LOCAL_SET', 'y'), ('LOCAL_GET', 'y'), ('CONSTI', -1), ('MULI',),
+                ('CONSTI', -1), ('MULI',), ('CONSTI', 1), ('MULI',), ('IF',),
+                ('LOCAL_GET', 'y'), ('LOCAL_SET', 'y'), ('ELSE',), ('ENDIF',)]
+        stats = Counter()
+        self.assertEqual(peephole_code(code, stats=stats), [
+            ('LOCAL_GET', 'x'), ('NEGI',), ('LOCAL_TEE', 'y'), ('IF',), ('ENDIF',),
+        ])
+        self.assertEqual(stats['neg-int'], 3)
+        self.assertEqual(stats['double-neg'], 1)
+
+    def test_inverted_loop_test(self):
+        code = [('LOOP',), ('CONSTI', 1), ('LOCAL_GET', 'i'), ('LOCAL_GET', 'n'), ('LTI',),
+                ('SUBI',), ('CBREAK',), ('ENDLOOP',)]
+        self.assertEqual(peephole_code(code), [
+            ('LOOP',), ('LOCAL_GET', 'i'), ('LOCAL_GET', 'n'), ('GEI',), ('CBREAK',), ('ENDLOOP',),
+        ])
+        # Sin el CONSTI 1 no es la negación de la prueba
+        code = [('LOCAL_GET', 'k'), ('LOCAL_GET', 'i'), ('LOCAL_GET', 'n'), ('LTI',),
+                ('SUBI',), ('CBREAK',)]
+        self.assertEqual(peephole_code(code), code)
+
+    def test_same_output(self):
+        _, expected = run_module(compile_source(SHOR_SOURCE))
+        module = PassManager(1, verify=True).run(compile_source(SHOR_SOURCE))
+        self.assertNotIn(('ELSE',), module.functions['powmod'].code)
+        self.assertEqual(module.functions['gcd'].code[:5], [
+            ('LOOP',), ('LOCAL_GET', 'b'), ('CONSTI', 0), ('EQI',), ('CBREAK',),
+        ])
+        self.assertEqual(run_module(module)[1], expected)
+        self.assertEqual(run_module(module, TracingJITMachine(threshold=2))[1], expected)
+        self.assertEqual(run_module(fuse_module(module))[1], expected)
+        self.assertEqual(expand_code([('LOCAL_TEE', 'x'), ('NEGI',)]),
+                         [('LOCAL_SET', 'x'), ('LOCAL_GET', 'x'), ('CONSTI', -1), ('MULI',)])
+
+class TestCFG(unittest.TestCase):
+    def test_loop_blocks(self):
+        cfg = build_cfg(compile_source(SHOR_SOURCE).functions['gcd'])
+        header, body, exit = cfg.blocks
+        self.assertEqual(cfg.instructions(header)[0], ('LOOP',))
+        self.assertEqual(header.succs, [1, 2])
+        self.assertEqual(header.preds, [1])             # arista de retorno
+        self.assertEqual(body.succs, [0])
+        self.assertEqual(cfg.instructions(exit), [('LOCAL_GET', 'a'), ('RET',)])
+        self.assertEqual(cfg.idom, [None, 0, 0])
+
+    def test_if_without_else_and_dominators(self):
+        cfg = build_cfg(compile_source(SHOR_SOURCE).functions['powmod'])
+        # entrada, cabecera, prueba del if, consecuencia, ENDIF..ENDLOOP, retorno
+        self.assertEqual([b.succs for b in cfg.blocks], [[1], [2, 5], [3, 4], [4], [1], []])
+        self.assertEqual(cfg.idom, [None, 0, 1, 2, 2, 1])
+        self.assertTrue(cfg.dominates(1, 4))
+        self.assertFalse(cfg.dominates(3, 4))
+
+    def test_liveness(self):
+        func = compile_source(SHOR_SOURCE).functions['gcd']
+        cfg = build_cfg(func)
+        live = Liveness(cfg)
+        self.assertEqual(live.live_in(0), {'a', 'b'})
+        self.assertEqual(live.live_out(2), set())
+        # t solo vive entre su asignación y su lectura
+        after = live.live_after(cfg.blocks[1])
+        self.assertEqual(after[1], {'a', 'b', 't'})
+        self.assertEqual(after[5], {'b', 't'})
+        self.assertNotIn('t', live.live_in(0))
+
+    def test_dot(self):
+        cfg = build_cfg(compile_source(SHOR_SOURCE).functions['gcd'])
+        dot = cfg.to_dot(Liveness(cfg))
+        self.assertTrue(dot.startswith('digraph "gcd"'))
+        self.assertIn('B1 -> B0 [style=dashed];', dot)
+        self.assertIn('in: a b', dot)
+
+DEAD_SOURCE = """
+func unused(x int) int {
+    return x * 2;
+}
+
+func helper(x int) int {
+    return x + 1;
+}
+
+func work(n int) int {
+    var i int = 5;
+    var k int = helper(n);
+    if n > 3 {
+        return k;
+        print 99;
+    }
+    if false {
+        print 1;
+    } else {
+        print 2;
+    }
+    return n;
+    print 100;
+}
+
+func _actual_main() int {
+    print work(2);
+    print work(7);
+    return 0;
+}
+"""
+
+class TestDCE(unittest.TestCase):
+    def test_unreachable(self):
+        code = [('LOOP',), ('CONTINUE',), ('LOCAL_GET', 'x'), ('PRINTI',), ('ENDLOOP',),
+                ('CONSTI', 0), ('IF',), ('CONSTI', 1), ('PRINTI',), ('ELSE',),
+                ('CONSTI', 2), ('PRINTI',), ('ENDIF',),
+                ('CONSTI', 1), ('IF',), ('CONSTI', 3), ('RET',), ('ENDIF',),
+                ('CONSTI', 4), ('PRINTI',)]
+        self.assertEqual(remove_unreachable(code), [
+            ('LOOP',), ('CONTINUE',), ('ENDLOOP',), ('CONSTI', 2), ('PRINTI',),
+            ('CONSTI', 3), ('RET',),
+        ])
+
+    def test_dead_stores_and_functions(self):
+        _, expected = run_module(compile_source(DEAD_SOURCE))
+        module = PassManager(1, enable=['dce', 'dead-functions'], verify=True).run(
+            compile_source(DEAD_SOURCE))
+        work = module.functions['work'].code
+        self.assertNotIn(('LOCAL_SET', 'i'), work)
+        # La llamada puede tener efectos: la asignación muerta se conserva
+        self.assertIn(('LOCAL_SET', 'k'), work)
+        self.assertNotIn(('CONSTI', 99), work)
+        self.assertNotIn(('CONSTI', 100), work)
+        self.assertNotIn(('CONSTI', 1), work)
+        self.assertNotIn('unused', module.functions)
+        self.assertIn('helper', module.functions)
+        self.assertEqual(run_module(module)[1], expected)
+
+    def test_dead_tee(self):
+        module = compile_source(SHOR_SOURCE)
+        func = module.functions['mod']
+        func.code = [('LOCAL_GET', 'a'), ('LOCAL_TEE', 'b'), ('RET',)]
+        dce_module(module)
+        self.assertEqual(func.code, [('LOCAL_GET', 'a'), ('RET',)])
+
+    def test_module_without_main_untouched(self):
+        module = compile_source(SHOR_SOURCE)
+        del module.functions['main']
+        remove_dead_functions(module)
+        self.assertIn('mod', module.functions)
+
+    def test_void_function_gets_ret(self):
+        module = compile_source("func show(x int) {\n    print x;\n}\nshow(4);\n")
+        self.assertIsNone(module.functions['show'].return_type)
+        self.assertEqual(module.functions['show'].code[-1], ('RET',))
+        self.assertEqual(run_module(module)[1], "4")
+
+class TestInline(unittest.TestCase):
+    def test_leaf_inlined_with_renamed_locals(self):
+        _, expected = run_module(compile_source(SHOR_SOURCE))
+        module = compile_source(SHOR_SOURCE)
+        self.assertEqual(inline_module(module), 5)
+        gcd = module.functions['gcd']
+        self.assertNotIn(('CALL', 'mod'), gcd.code)
+        self.assertIn(('LOCAL_SET', 'b$1$mod'), gcd.code)
+        self.assertEqual(gcd.locals['a$1$mod'], 'I')
+        verify_module(module)
+        self.assertEqual(run_module(module)[1], expected)
+
+    def test_budget_and_recursion(self):
+        module = compile_source(SHOR_SOURCE)
+        self.assertEqual(inline_module(module, budget=5), 0)
+        module = compile_source(SHOR_SOURCE + """
+        func fact(n int) int {
+            if n < 2 {
+                return 1;
+            }
+            return n * fact(n - 1);
+        }
+        var f int = fact(5);
+        """)
+        self.assertEqual(recursive_functions(module), {'fact'})
+        inline_module(module, budget=1000)
+        self.assertIn(('CALL', 'fact'), module.functions['fact'].code)
+
+    def test_profile(self):
+        module = compile_source(SHOR_SOURCE)
+        vm, expected = run_module(module, ProfilingMachine(CaptureSink()))
+        profile = profile_from(vm)
+        self.assertEqual(profile[('gcd', 'mod')], 3)
+        # Con el perfil, llamadas frías (0 ejecuciones) no se expanden
+        profile[('powmod', 'mod')] = 0
+        inline_module(module, profile=profile)
+        self.assertIn(('CALL', 'mod'), module.functions['powmod'].code)
+        self.assertNotIn(('CALL', 'mod'), module.functions['gcd'].code)
+
+    def test_pass_options(self):
+        module = PassManager(2, options={'inline': {'budget': 5}}).run(compile_source(SHOR_SOURCE))
+        self.assertIn('mod', module.functions)
+        module = PassManager(2).run(compile_source(SHOR_SOURCE))
+        self.assertNotIn('mod', module.functions)
+        self.assertEqual(run_module(module)[1], "6 323")
+
+TAIL_SOURCE = """
+func sum(n int, acc int) int {
+    if n == 0 {
+        return acc;
+    }
+    return sum(n - 1, acc + n);
+}
+
+func count(n int) {
+    print 'x';
+    if n > 0 {
+        count(n - 1);
+    }
+}
+
+func walk(n int) int {
+    var total int = 0;
+    while n > 0 {
+        if n == 3 {
+            return walk(n - 1) + 1;
+        }
+        n = n - 1;
+    }
+    return total;
+}
+
+print sum(20000, 0);
+count(3);
+print walk(5);
+"""
+
+class TestTailCall(unittest.TestCase):
+    def test_rewritten_as_loop(self):
+        module = compile_source(TAIL_SOURCE)
+        self.assertEqual(eliminate_tail_calls(module.functions['sum']), 1)
+        code = module.functions['sum'].code
+        self.assertEqual(code[0], ('LOOP',))
+        self.assertEqual(code[-4:], [('LOCAL_SET', 'acc'), ('LOCAL_SET', 'n'),
+                                     ('CONTINUE',), ('ENDLOOP',)])
+        self.assertNotIn(('CALL', 'sum'), code)
+        # Llamada de cola al cerrar un if, en una función sin valor de retorno
+        self.assertEqual(eliminate_tail_calls(module.functions['count']), 1)
+        # Dentro de un while, o sin RET después, no se transforma
+        self.assertEqual(eliminate_tail_calls(module.functions['walk']), 0)
+        verify_module(module)
+
+    def test_constant_frame_space(self):
+        module = tailcall_module(compile_source(TAIL_SOURCE))
+        vm, output = run_module(module)
+        self.assertEqual(output, "200010000xxxx1")
+        self.assertEqual(vm.call_stack, [])
+        machine = ClosureMachine()
+        machine.load_module(module)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            machine.run()
+        self.assertEqual(out.getvalue(), output)
+
+LOOP_SOURCE = """
+var g int = 2;
+
+func bump() {
+    g = g + 1;
+}
+
+func scan(w int, h int, d int) int {
+    var total int = 0;
+    var i int = 0;
+    while i < 10 {
+        total = total + (w * h + 1) + i * 4 + i * 4 + i * 4 + (w * h + 1) + h / d;
+        i = i + 1;
+    }
+    return total;
+}
+
+var k int = 3;
+var j int = 0;
+var s int = 0;
+while j < 5 {
+    s = s + k * k + g * g;
+    bump();
+    j = j + 1;
+}
+print s;
+print scan(3, 4, 2);
+"""
+
+class TestLICM(unittest.TestCase):
+    def loop_body(self, code):
+        return code[code.index(('LOOP',)):]
+
+    def test_hoist_and_reduce(self):
+        module = compile_source(LOOP_SOURCE)
+        expected = run_module(module)[1]
+        scan = module.functions['scan']
+        self.assertEqual(licm_function(scan, module), (1, 3))
+        body = self.loop_body(scan.code)
+        # w * h + 1 sale del ciclo una sola vez, la división no se mueve
+        self.assertEqual(body.count(('LOCAL_GET', '$inv1')), 2)
+        self.assertNotIn(('LOCAL_GET', 'w'), body)
+        self.assertIn(('DIVI',), body)
+        # Los tres i * 4 son una variable que se incrementa en 4
+        self.assertNotIn(('MULI',), body)
+        self.assertEqual(body.count(('LOCAL_GET', '$iv1')), 4)
+        self.assertIn(('CONSTI', 4), body)
+        self.assertEqual(scan.locals['$inv1'], 'I')
+        verify_module(module)
+        self.assertEqual(run_module(module)[1], expected)
+
+    def test_min_products(self):
+        module = compile_source(LOOP_SOURCE)
+        scan = module.functions['scan']
+        self.assertEqual(licm_function(scan, module, min_products=4), (1, 0))
+        self.assertIn(('MULI',), self.loop_body(scan.code))
+
+    def test_main_uses_globals(self):
+        module = compile_source(LOOP_SOURCE)
+        expected = run_module(module)[1]
+        main = module.functions['main']
+        # k * k es invariante; g * g no, porque bump (llamada en el ciclo) asigna g
+        self.assertEqual(licm_function(main, module), (1, 0))
+        self.assertIn('$inv1', module.globals)
+        body = self.loop_body(main.code)
+        self.assertIn(('GLOBAL_GET', '$inv1'), body)
+        self.assertIn(('GLOBAL_GET', 'g'), body)
+        self.assertEqual(run_module(module)[1], expected)
+
+    def test_global_induction_variable_written_by_call(self):
+        source = """
+        var i int = 0;
+
+        func bump() int {
+            i = i + 10;
+            return 0;
+        }
+
+        var z int = 0;
+        while i < 30 {
+            print i * 3;
+            print i * 3;
+            print i * 3;
+            print ' ';
+            z = bump();
+            i = i + 1;
+        }
+        """
+        expected = run_module(compile_source(source))[1]
+        self.assertEqual(expected, "000 333333 666666 ")
+        module = compile_source(source)
+        # bump escribe i: no es una variable de inducción
+        self.assertEqual(licm_function(module.functions['main'], module), (0, 0))
+        for level in (2, 3):
+            module = PassManager(level, verify=True).run(compile_source(source))
+            self.assertEqual(run_module(module)[1], expected)
+
+    def test_pipeline(self):
+        module = compile_source(LOOP_SOURCE)
+        expected = run_module(module)[1]
+        PassManager(2, verify=True).run(module)
+        self.assertEqual(run_module(module)[1], expected)
+        self.assertEqual(expected, "135820")
+
+    def test_nothing_that_can_fail_is_hoisted(self):
+        module = compile_source("""
+        func f(n int, x float) int {
+            var i int = 0;
+            var t int = 0;
+            while i < n {
+                t = int(x);
+                i = i + 1;
+            }
+            return t;
+        }
+
+        func g(n int, c int) int {
+            var y int;
+            if c > 0 {
+                y = c;
+            }
+            var i int = 0;
+            var t int = 0;
+            while i < n {
+                t = t + y * y;
+                i = i + 1;
+            }
+            return t;
+        }
+        """)
+        # int(x) falla con inf o NaN; y no tiene valor si c <= 0
+        self.assertEqual(licm_function(module.functions['f'], module), (0, 0))
+        self.assertEqual(licm_function(module.functions['g'], module), (0, 0))
+        machine = ClosureMachine()
+        machine.load_module(module)
+        self.assertEqual(machine.call('f', 0, float('inf')), 0)
+        self.assertEqual(machine.call('f', 0, float('nan')), 0)
+        self.assertEqual(machine.call('g', 0, 0), 0)
+        self.assertEqual(machine.call('g', 3, 2), 12)
+
+CSE_SOURCE = """
+func mod(a int, b int) int {
+    return a - b * (a / b);
+}
+
+func show(x int) int {
+    print x;
+    return x;
+}
+
+func f(x int, y int) int {
+    var p int = x * y + 1;
+    var q int = (y * x + 1) * 2 + x / y + x / y;
+    var r int = mod(x, 2) + mod(x, 2) + show(y) + show(y);
+    return p + q + r;
+}
+
+print f(7, 3);
+print 7 * 3 + 7 * 3;
+"""
+
+class TestCSE(unittest.TestCase):
+    def test_local_value_numbering(self):
+        module = compile_source(CSE_SOURCE)
+        expected = run_module(module)[1]
+        f = module.functions['f']
+        # y * x + 1 (p), x / y, mod(x, 2)
+        self.assertEqual(cse_function(f, module), 3)
+        calls = Counter(instr[1] for instr in f.code if instr[0] == 'CALL')
+        self.assertEqual(calls, {'mod': 1, 'show': 2})
+        self.assertEqual(Counter(f.code)[('DIVI',)], 1)
+        self.assertIn(('LOCAL_TEE', '$temp1'), f.code)
+        self.assertEqual(set(f.locals) & {'$temp1', '$temp2', '$temp3'}, {'$temp1', '$temp2'})
+        verify_module(module)
+        self.assertEqual(run_module(module)[1], expected)
+
+    def test_main_not_processed(self):
+        module = compile_source(CSE_SOURCE)
+        code = list(module.functions['main'].code)
+        self.assertEqual(cse_function(module.functions['main'], module), 0)
+        self.assertEqual(module.functions['main'].code, code)
+
+    def test_pipeline(self):
+        module = compile_source(CSE_SOURCE)
+        expected = run_module(module)[1]
+        PassManager(2, verify=True).run(module)
+        self.assertEqual(run_module(module)[1], expected)
+
+    def test_global_reads_not_reused(self):
+        source = """
+        var g int = 1;
+
+        func bump() {
+            g = g + 1;
+        }
+
+        func stored(a int) int {
+            var x int = g * a + 1;
+            g = 10;
+            var y int = g * a + 1;
+            return x * 1000 + y;
+        }
+
+        func called(a int) int {
+            var x int = g * a + 1;
+            bump();
+            var y int = g * a + 1;
+            bump();
+            return x * 1000 + y + g;
+        }
+
+        print stored(3);
+        print ' ';
+        print called(3);
+        """
+        expected = run_module(compile_source(source))[1]
+        self.assertEqual(expected, "4031 31046")
+        module = compile_source(source)
+        for name in ('stored', 'called'):
+            self.assertEqual(cse_function(module.functions[name], module), 0)
+        for level in (2, 3):
+            module = PassManager(level, verify=True).run(compile_source(source))
+            self.assertEqual(run_module(module)[1], expected)
+
+class TestPassManager(unittest.TestCase):
+    def test_levels(self):
+        self.assertEqual(passes_for_level(0), [])
+        self.assertIn('fusion', passes_for_level(3))
+        with self.assertRaises(ValueError):
+            passes_for_level(4)
+
+    def test_enable_disable(self):
+        module = compile_source(SHOR_SOURCE)
+        size = sum(len(f.code) for f in module.functions.values())
+        PassManager(3, disable=[p.name for p in PIPELINE]).run(module)
+        self.assertEqual(sum(len(f.code) for f in module.functions.values()), size)
+
+        manager = PassManager(0, enable=['fusion'], verify=True)
+        manager.run(module)
+        self.assertEqual([r.name for r in manager.results], ['fusion'])
+        self.assertEqual(manager.results[0].before, size)
+        self.assertLess(manager.results[0].after, size)
+        self.assertIn('fusion', manager.report())
+        _, output = run_module(module)
+        self.assertEqual(output, "6 323")
+        with self.assertRaises(ValueError):
+            PassManager(2, enable=['nada'])
+
+    def test_verifier_rejects_invalid_ir(self):
+        module = compile_source(SHOR_SOURCE)
+        verify_module(module)
+        code = module.functions['gcd'].code
+        code.remove(('ENDLOOP',))
+        with self.assertRaises(IRVerificationError):
+            verify_module(module)
+
+        module = compile_source(SHOR_SOURCE)
+        module.functions['mod'].code.insert(0, ('ADDI',))
+        with self.assertRaisesRegex(IRVerificationError, "mod:0"):
+            verify_module(module)
+
+    def test_verifier_names_the_pass(self):
+        module = compile_source(SHOR_SOURCE)
+        manager = PassManager(0, verify=True)
+        manager.passes.append(Pass('rompe', lambda m: m.functions['mod'].code.insert(0, ('ADDI',)), 1, ''))
+        with self.assertRaisesRegex(IRVerificationError, "'rompe'"):
+            manager.run(module)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from program import CompiledProgram, compile_source
+from output import CaptureSink
+from test_stack_machine import SHOR_SOURCE
+
+class TestCompiledProgram(unittest.TestCase):
+    SOURCE = SHOR_SOURCE + """
+    var counter int = 10;
+    func is_even(n int) bool { return mod(n, 2) == 0; }
+    func same(c char) char { return c; }
+    func scale(x float) float { return x; }
+    func bump() int { counter = counter + 1; return counter; }
+    """
+
+    def setUp(self):
+        self.program = CompiledProgram.from_source(self.SOURCE, output=CaptureSink())
+
+    def test_call_repeatedly(self):
+        for _ in range(3):
+            self.assertEqual(self.program.call('gcd', 48, 18), 6)
+            self.assertEqual(self.program.call('powmod', 3, 13, 1000), 323)
+
+    def test_converts_arguments_and_results(self):
+        self.assertIs(self.program.call('is_even', 4), True)
+        self.assertIs(self.program.call('is_even', 3), False)
+        self.assertEqual(self.program.call('same', 'z'), 'z')
+        self.assertEqual(self.program.call('scale', 2), 2.0)
+        with self.assertRaises(TypeError):
+            self.program.call('gcd', 48)
+        with self.assertRaises(TypeError):
+            self.program.call('gcd', 48, 1.5)
+        with self.assertRaises(RuntimeError):
+            self.program.call('missing')
+
+    def test_globals_persist_until_reset(self):
+        self.assertEqual(self.program.run(), 0)
+        self.assertEqual(self.program.output.getvalue(), "6 323")
+        self.assertEqual([self.program.call('bump') for _ in range(2)], [11, 12])
+        self.program.reset()
+        with self.assertRaises(RuntimeError):
+            self.program.call('bump')
+
+    def test_from_module(self):
+        program = CompiledProgram(compile_source(SHOR_SOURCE))
+        self.assertEqual(program.call('gcd', 12, 8), 4)
+
+if __name__ == '__main__':
+    unittest.main()
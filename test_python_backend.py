@@ -0,0 +1,64 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from ircode import IRModule, IRFunction
+from python_backend import PythonProgram, cache_path
+from program import compile_source
+from benchmarks.common import run_module
+from test_stack_machine import SHOR_SOURCE
+
+class TestPythonBackend(unittest.TestCase):
+    def test_same_output_as_stack_machine(self):
+        module = compile_source(SHOR_SOURCE)
+        _, expected = run_module(module)
+        program = PythonProgram(module)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            program.run()
+        self.assertFalse(program.fallback)
+        self.assertEqual(out.getvalue(), expected)
+        self.assertEqual(program.call('gcd', 48, 18), 6)
+
+    def test_cache_next_to_source(self):
+        module = compile_source(SHOR_SOURCE)
+        with tempfile.TemporaryDirectory() as tmp:
+            source_path = os.path.join(tmp, 'shor.gox')
+            PythonProgram(module, source_path)
+            path = cache_path(source_path)
+            self.assertTrue(os.path.exists(path))
+            mtime = os.path.getmtime(path)
+            program = PythonProgram(module, source_path)
+            self.assertEqual(os.path.getmtime(path), mtime)
+            self.assertEqual(program.namespace['f_gcd'].__code__.co_filename, path)
+
+    def test_fallback_to_stack_machine(self):
+        module = IRModule()
+        func = IRFunction(module, 'main', [], [], 'I')
+        func.extend([('CONSTI', 7), ('CONSTI', 1), ('ANDI',), ('RET',)])
+        program = PythonProgram(module)
+        self.assertTrue(program.fallback)
+        self.assertIn('ANDI', program.reason)
+
+    def test_fallback_keeps_state_between_calls(self):
+        module = IRModule()
+        main = IRFunction(module, 'main', [], [], 'I')
+        main.extend([('CONSTI', 1), ('GROW',), ('GLOBAL_SET', 'base'),
+                     ('CONSTI', 3), ('GLOBAL_SET', 'g'),
+                     ('GLOBAL_GET', 'base'), ('CONSTI', 40), ('POKEI',),
+                     ('CONSTI', 0), ('RET',)])
+        get = IRFunction(module, 'get', [], [], 'I')
+        get.extend([('GLOBAL_GET', 'g'), ('GLOBAL_GET', 'base'), ('PEEKI',), ('ADDI',), ('RET',)])
+        # Nunca se llama, pero impide compilar el módulo a Python
+        broken = IRFunction(module, 'broken', [], [], 'I')
+        broken.extend([('CALL', 'missing'), ('RET',)])
+        program = PythonProgram(module)
+        self.assertTrue(program.fallback)
+        program.run()
+        # La segunda llamada ve la global y la memoria de la primera
+        self.assertEqual(program.call('get'), 43)
+        self.assertEqual(program.memory.peeki(0), 40)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from optimizer.fusion import fuse_module
+from register_machine import RegisterMachine, lower_module
+from output import CaptureSink
+from program import compile_source
+from benchmarks.common import run_module
+from test_stack_machine import SHOR_SOURCE
+
+class TestRegisterMachine(unittest.TestCase):
+    SOURCE = SHOR_SOURCE + """
+    var total int = 0;
+    func sieve(n int) int {
+        var base int = ^(n + 1);
+        var i int = 2;
+        var count int = 0;
+        while i <= n {
+            if `(base + i) == 0 {
+                count = count + 1;
+                total = total + i;
+                var j int = i * i;
+                while j <= n {
+                    `(base + j) = 1;
+                    j = j + i;
+                }
+            }
+            i = i + 1;
+        }
+        return count;
+    }
+    func show(c char) int {
+        print c;
+        return 0;
+    }
+    """
+
+    def setUp(self):
+        self.module = compile_source(self.SOURCE)
+        self.machine = RegisterMachine(CaptureSink())
+        self.machine.load_module(self.module)
+
+    def test_run_matches_stack_machine(self):
+        _, expected = run_module(self.module)
+        self.assertEqual(self.machine.run(), 0)
+        self.assertEqual(self.machine.output.getvalue(), expected)
+
+    def test_call(self):
+        self.assertEqual(self.machine.call('gcd', 48, 18), 6)
+        self.assertEqual(self.machine.call('powmod', 3, 13, 1000), 323)
+        self.machine.globals['total'] = 0
+        self.assertEqual(self.machine.call('sieve', 100), 25)
+        self.assertEqual(self.machine.globals['total'], 1060)
+        self.machine.call('show', ord('x'))
+        self.assertTrue(self.machine.output.getvalue().endswith('x'))
+        with self.assertRaises(RuntimeError):
+            self.machine.call('gcd', 1)
+
+    def test_lowering(self):
+        gcd = lower_module(self.module)['gcd']
+        # La prueba del while queda como un solo salto condicional
+        self.assertEqual(gcd.code[0][0], 'JEQ')
+        self.assertEqual([instr[0] for instr in gcd.code],
+                         ['JEQ', 'MOVE', 'CALL', 'MOVE', 'JMP', 'RET', 'RET'])
+        self.assertLess(sum(len(f.code) for f in lower_module(self.module).values()),
+                        sum(len(f.code) for f in self.module.functions.values()))
+
+    def test_fused_code(self):
+        module = compile_source(SHOR_SOURCE)
+        fuse_module(module)
+        machine = RegisterMachine(CaptureSink())
+        machine.load_module(module)
+        machine.run()
+        self.assertEqual(machine.output.getvalue(), "6 323")
+
+if __name__ == '__main__':
+    unittest.main()
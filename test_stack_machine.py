@@ -0,0 +1,360 @@
+import asyncio
+import contextlib
+import io
+import os
+import pstats
+import tempfile
+import unittest
+from stack_machine import StackMachine
+from closure_machine import ClosureMachine
+from python_backend import PythonProgram
+from memory import Memory
+from output import AsyncSink, BufferedSink, CaptureSink
+from profiler import ProfilingMachine
+from metering import MeteredMachine, OutOfFuel
+from program import compile_source
+from benchmarks.common import run_module
+
+SHOR_SOURCE = """
+func mod(a int, b int) int {
+    return a - b * (a / b);
+}
+
+func gcd(a int, b int) int {
+    while b != 0 {
+        var t int = b;
+        b = mod(a, b);
+        a = t;
+    }
+    return a;
+}
+
+func powmod(a int, x int, n int) int {
+    var result int = 1;
+    while x > 0 {
+        if mod(x, 2) == 1 {
+            result = mod(result * a, n);
+        }
+        a = mod(a * a, n);
+        x = x / 2;
+    }
+    return result;
+}
+
+func _actual_main() int {
+    print gcd(48, 18);
+    print ' ';
+    print powmod(3, 13, 1000);
+    return 0;
+}
+"""
+
+class TestStackMachine(unittest.TestCase):
+    def test_while_loop_iterates(self):
+        module = compile_source("""
+        func count(n int) int {
+            var i int = 0;
+            while i < n {
+                print i;
+                i = i + 1;
+            }
+            return i;
+        }
+        func _actual_main() int {
+            return count(4);
+        }
+        """)
+        vm, output = run_module(module)
+        self.assertEqual(output, "0123")
+        self.assertEqual(vm.stack, [('int', 4)])
+
+    def test_break_leaves_loop(self):
+        module = compile_source("""
+        func first(n int) int {
+            var i int = 0;
+            while i < n {
+                if i == 3 {
+                    break;
+                }
+                i = i + 1;
+            }
+            return i;
+        }
+        func _actual_main() int {
+            return first(10);
+        }
+        """)
+        vm, _ = run_module(module)
+        self.assertEqual(vm.stack, [('int', 3)])
+
+    def test_print_char(self):
+        module = compile_source("print 'A'; print ' ';")
+        _, output = run_module(module)
+        self.assertEqual(output, "A ")
+
+class TestTrace(unittest.TestCase):
+    def test_dump_on_runtime_error(self):
+        module = compile_source("""
+        func div(a int, b int) int {
+            return a / b;
+        }
+        print div(7, 0);
+        """)
+        log = io.StringIO()
+        vm = StackMachine()
+        vm.enable_trace(size=4, file=log)
+        with self.assertRaises(ZeroDivisionError):
+            run_module(module, vm)
+        entries = vm.trace.entries()
+        self.assertEqual(len(entries), 4)
+        self.assertEqual(entries[-1], ('div', 2, 'DIVI', ('int', 0)))
+        self.assertEqual(entries[0][:3], ('main', 2, 'CALL'))
+        self.assertIn('DIVI', log.getvalue())
+
+    def test_trace_on_demand(self):
+        vm = StackMachine()
+        trace = vm.enable_trace(size=3)
+        _, output = run_module(compile_source(SHOR_SOURCE), vm)
+        self.assertEqual(output, "6 323")
+        self.assertEqual([(entry[0], entry[2]) for entry in trace.entries()],
+                         [('_actual_main', 'CONSTI'), ('_actual_main', 'RET'), ('main', 'RET')])
+        log = io.StringIO()
+        trace.dump(log)
+        self.assertEqual(len(log.getvalue().splitlines()), 4)
+
+class TestAsync(unittest.TestCase):
+    COUNT = """
+    var i int = 0;
+    while i < %d {
+        print i;
+        print ' ';
+        i = i + 1;
+    }
+    """
+
+    def make_vm(self, n):
+        vm = StackMachine(AsyncSink())
+        vm.load_program(compile_source(self.COUNT % n).functions['main'].code)
+        return vm
+
+    def test_step(self):
+        vm = self.make_vm(3)
+        vm.output = CaptureSink()
+        vm.start()
+        steps = 1
+        while vm.step(10):
+            steps += 1
+        self.assertEqual(vm.output.getvalue(), "0 1 2 ")
+        self.assertGreater(steps, 3)
+        self.assertFalse(vm.step(10))
+
+    def test_machines_share_event_loop(self):
+        events = []
+
+        async def consume(name, vm):
+            chunks = []
+            async for chunk in vm.output:
+                events.append(name)
+                chunks.append(chunk)
+            return ''.join(chunks)
+
+        async def main():
+            vms = {'a': self.make_vm(50), 'b': self.make_vm(20)}
+            tasks = [asyncio.create_task(vm.run_async(slice_size=40)) for vm in vms.values()]
+            outputs = await asyncio.gather(*(consume(name, vm) for name, vm in vms.items()))
+            await asyncio.gather(*tasks)
+            return outputs
+
+        outputs = asyncio.run(main())
+        self.assertEqual(outputs, [' '.join(map(str, range(n))) + ' ' for n in (50, 20)])
+        # Las dos máquinas avanzan intercaladas, no una después de la otra
+        self.assertEqual(events[:4], ['a', 'b', 'a', 'b'])
+
+class TestMetering(unittest.TestCase):
+    def test_fuel_is_upper_bound(self):
+        module = compile_source(SHOR_SOURCE)
+        profiled, _ = run_module(module, ProfilingMachine())
+        executed = sum(count for count, _ in profiled.opcodes.values())
+        vm, output = run_module(module, MeteredMachine(fuel=10**6))
+        self.assertEqual(output, "6 323")
+        self.assertGreaterEqual(vm.used, executed)
+        with self.assertRaises(OutOfFuel) as cm:
+            run_module(module, MeteredMachine(fuel=executed // 2))
+        self.assertEqual(cm.exception.reason, 'fuel')
+
+    def test_infinite_programs_stop(self):
+        loop = compile_source("var i int = 0; while true { i = i + 1; }")
+        recursion = compile_source("func f(n int) int { return f(n + 1); } print f(0);")
+        for module in (loop, recursion):
+            with self.assertRaises(OutOfFuel):
+                run_module(module, MeteredMachine(fuel=5000))
+
+    def test_time_limit(self):
+        ticks = iter(range(10**6))
+        vm = MeteredMachine(time_limit=3, clock=lambda: next(ticks))
+        with self.assertRaises(OutOfFuel) as cm:
+            run_module(compile_source("while true { }"), vm)
+        self.assertEqual(cm.exception.reason, 'time')
+
+class TestMemory(unittest.TestCase):
+    SIEVE = """
+    const n = 30;
+    const base = ^(n + 1);
+    var i int = 2;
+    while i <= n {
+        `(base + i) = 1;
+        i = i + 1;
+    }
+    i = 2;
+    while i * i <= n {
+        if `(base + i) == 1 {
+            var j int = i * i;
+            while j <= n {
+                `(base + j) = 0;
+                j = j + i;
+            }
+        }
+        i = i + 1;
+    }
+    i = 2;
+    while i <= n {
+        if `(base + i) == 1 {
+            print i;
+            print ' ';
+        }
+        i = i + 1;
+    }
+    """
+
+    def test_grow_returns_base_and_doubles(self):
+        memory = Memory(capacity=4)
+        self.assertEqual(memory.grow(3), 0)
+        self.assertEqual(memory.grow(2), 3)
+        self.assertEqual(len(memory), 5)
+        self.assertEqual(memory.capacity, 8)
+        memory.pokei(4, -7)
+        memory.pokef(3, 2.5)
+        memory.pokeb(0, 300)
+        self.assertEqual((memory.peeki(4), memory.peekf(3), memory.peekb(0)), (-7, 2.5, 44))
+        with self.assertRaises(IndexError):
+            memory.peeki(5)
+
+    def test_int_store_out_of_range(self):
+        memory = Memory()
+        memory.grow(1)
+        memory.pokei(0, 2 ** 63 - 1)
+        self.assertEqual(memory.peeki(0), 2 ** 63 - 1)
+        # Los enteros no tienen límite, las celdas sí
+        with self.assertRaises(OverflowError):
+            memory.pokei(0, 2 ** 63)
+        module = compile_source("var base int = ^1;\n`base = 4611686018427387904 * 2;\n")
+        with self.assertRaises(OverflowError):
+            run_module(module)
+
+    def test_sieve_all_engines(self):
+        module = compile_source(self.SIEVE)
+        _, expected = run_module(module)
+        self.assertEqual(expected, "2 3 5 7 11 13 17 19 23 29 ")
+        machine = ClosureMachine()
+        machine.load_module(module)
+        program = PythonProgram(module)
+        self.assertFalse(program.fallback)
+        for engine in (machine, program):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                engine.run()
+            self.assertEqual(out.getvalue(), expected)
+
+    def test_float_and_byte_stores(self):
+        module = compile_source("""
+        var base int = ^2;
+        `base = 1.5;
+        `(base + 1) = 'A';
+        print `(base + 1);
+        """)
+        code = module.functions['main'].code
+        self.assertIn(('POKEF',), code)
+        self.assertIn(('POKEB',), code)
+        vm, output = run_module(module)
+        self.assertEqual(output, "65")
+        self.assertEqual(vm.memory.peekf(0), 1.5)
+
+class TestOutput(unittest.TestCase):
+    def test_capture_sink_all_engines(self):
+        module = compile_source(SHOR_SOURCE)
+        sinks = [CaptureSink() for _ in range(3)]
+        functions = {name: func.code for name, func in module.functions.items()}
+        vm = StackMachine(sinks[0])
+        vm.load_functions(functions, {name: func.parmnames for name, func in module.functions.items()})
+        vm.load_program(module.functions['main'].code)
+        vm.run()
+        machine = ClosureMachine(sinks[1])
+        machine.load_module(module)
+        machine.run()
+        PythonProgram(module, output=sinks[2]).run()
+        self.assertEqual([sink.getvalue() for sink in sinks], ["6 323"] * 3)
+
+    def test_buffered_sink_threshold_and_flush(self):
+        stream = io.StringIO()
+        sink = BufferedSink(stream, threshold=4)
+        sink.write("ab")
+        self.assertEqual(stream.getvalue(), "")
+        sink.write("cd")
+        self.assertEqual(stream.getvalue(), "abcd")
+        sink.write("e")
+        sink.flush()
+        self.assertEqual((stream.getvalue(), sink.writes), ("abcde", 2))
+
+    def test_flush_opcode(self):
+        stream = io.StringIO()
+        vm = StackMachine(BufferedSink(stream))
+        seen = []
+        vm.op_CHECK = lambda: seen.append(stream.getvalue())
+        vm.load_program([('CONSTI', 7), ('PRINTI',), ('CHECK',), ('FLUSH',), ('CHECK',),
+                         ('CONSTF', 0.5), ('PRINTF',), ('CONSTI', 0), ('RET',)])
+        vm.run()
+        self.assertEqual(seen, ["", "7"])
+        self.assertEqual(stream.getvalue(), "70.5")
+
+class TestProfiler(unittest.TestCase):
+    SOURCE = SHOR_SOURCE + """
+    func fact(n int) int {
+        if n < 2 {
+            return 1;
+        }
+        return n * fact(n - 1);
+    }
+    var f int = fact(5);
+    """
+
+    def profile(self):
+        vm, output = run_module(compile_source(self.SOURCE), ProfilingMachine())
+        self.assertEqual(output, "6 323")
+        return vm
+
+    def test_counts(self):
+        vm = self.profile()
+        self.assertEqual(vm.function_stats['fact'][:2], [1, 5])
+        self.assertEqual(vm.function_stats['mod'][1], vm.edges[('gcd', 'mod')][0]
+                         + vm.edges[('powmod', 'mod')][0])
+        self.assertEqual(vm.opcodes['CALL'][0], sum(stat[1] for stat in vm.function_stats.values()) - 1)
+        cc, nc, tt, ct = vm.function_stats['main']
+        self.assertGreaterEqual(ct, sum(stat[2] for stat in vm.function_stats.values()) * 0.99)
+
+    def test_exports(self):
+        vm = self.profile()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'gox.prof')
+            vm.dump_stats(path)
+            stats = pstats.Stats(path)
+        self.assertEqual(stats.total_calls, vm.opcodes['CALL'][0] + 1)
+        callers = stats.stats[('<goxlang>', 0, 'fact')][4]
+        self.assertEqual(callers[('<goxlang>', 0, 'fact')][0], 4)
+        self.assertIn(('main', '_actual_main', 'powmod', 'mod'), vm.stacks)
+        for line in vm.folded().splitlines():
+            path, micros = line.rsplit(' ', 1)
+            self.assertTrue(path.startswith('main'))
+            self.assertGreater(int(micros), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from stack_machine import StackMachine
+from tracing_jit import TracingJITMachine
+from output import CaptureSink
+from program import compile_source
+from benchmarks.common import run_module
+from test_stack_machine import SHOR_SOURCE
+
+class TestTracingJIT(unittest.TestCase):
+    SOURCE = SHOR_SOURCE + """
+    func branches(n int) int {
+        var i int = 0;
+        var total int = 0;
+        while i < n {
+            if i < 100 {
+                total = total + i;
+            } else {
+                var k int = i * 2;
+                total = total - k;
+            }
+            i = i + 1;
+        }
+        return total;
+    }
+
+    func nested(n int) int {
+        var i int = 0;
+        var count int = 0;
+        while i < n {
+            var j int = 0;
+            while j < i {
+                count = count + 1;
+                j = j + 1;
+            }
+            i = i + 1;
+        }
+        return count;
+    }
+
+    func divide(n int, d int) int {
+        var i int = 0;
+        while i < n {
+            i = i + 1;
+            if i == 80 {
+                d = 0;
+            }
+            print 100 / d;
+        }
+        return 0;
+    }
+    """
+
+    def call(self, vm, name, *args):
+        vm, _ = run_module(compile_source(self.SOURCE), vm)
+        vm.stack = [('int', arg) for arg in args]
+        vm.load_program([('CALL', name), ('RET',)])
+        vm.run()
+        return vm, vm.stack[-1][1]
+
+    def test_matches_interpreter(self):
+        for name, args in (('branches', (300,)), ('nested', (120,)), ('powmod', (7, 10**6, 1009))):
+            _, expected = self.call(StackMachine(), name, *args)
+            vm, result = self.call(TracingJITMachine(threshold=10), name, *args)
+            self.assertEqual(result, expected, name)
+
+    def test_guard_failure_falls_back(self):
+        vm, _ = self.call(TracingJITMachine(threshold=10), 'branches', 300)
+        loop, = [loop for loop in vm.loops.values() if loop.function == 'branches']
+        self.assertIsNotNone(loop.trace)
+        self.assertGreater(loop.compiled, 0)
+        # La guarda del IF falla en i == 100 y se vuelve a compilar
+        self.assertGreater(sum(loop.exits.values()), 1)
+        self.assertEqual(loop.interpreted + loop.compiled, 300)
+
+    def test_nested_loops(self):
+        vm, _ = self.call(TracingJITMachine(threshold=10), 'nested', 60)
+        stats = sorted((loop.header, loop.trace is not None) for loop in vm.loops.values()
+                       if loop.function == 'nested')
+        self.assertEqual(stats, [(4, False), (11, True)])
+        self.assertIn('nested:11', vm.report())
+
+    def test_errors_inside_trace(self):
+        vm = TracingJITMachine(threshold=10)
+        vm.output = CaptureSink()
+        with self.assertRaises(ZeroDivisionError):
+            self.call(vm, 'divide', 100, 5)
+        self.assertEqual(vm.output.getvalue(), '6 323' + '20' * 79)
+
+    def test_main_program(self):
+        module = compile_source(SHOR_SOURCE)
+        _, out = run_module(module, TracingJITMachine(threshold=1))
+        self.assertEqual(out, "6 323")
+
+if __name__ == '__main__':
+    unittest.main()
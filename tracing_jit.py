@@ -0,0 +1,480 @@
+# tracing_jit.py
+'''
+JIT de trazas para ciclos calientes
+===================================
+
+TracingJITMachine es una StackMachine que compila a Python los ciclos
+que se ejecutan muchas veces:
+
+  1. Cuenta los saltos hacia atrás (ENDLOOP/CONTINUE) de cada ciclo.
+  2. Cuando un ciclo pasa de `threshold` iteraciones, graba la siguiente
+     iteración: la secuencia lineal de instrucciones que ejecuta la
+     función del ciclo (las funciones llamadas se ejecutan normalmente y
+     no se graban), con el sentido que tomó cada IF y CBREAK.
+  3. Traduce la traza a una función de Python que repite la iteración
+     en un `while True`, con las variables locales en variables de
+     Python sin etiqueta. Cada IF y CBREAK se convierte en una guarda:
+     si la condición no coincide con la grabada, la función devuelve
+     las locales modificadas al frame, deja en la pila los valores
+     pendientes y retorna el pc de la instrucción que falló.
+  4. Mientras las guardas se cumplen el ciclo corre compilado; al fallar
+     una, el intérprete continúa desde esa instrucción y la traza se
+     vuelve a usar en el siguiente salto hacia atrás.
+
+Los CALL dentro de la traza llaman a la función con el intérprete
+(_invoke). No se graban los ciclos que contienen otros ciclos (se compila
+el interno), ni las trazas con instrucciones no soportadas (por ejemplo
+las superinstrucciones de optimizer/fusion.py); esos ciclos quedan en la
+lista negra y se interpretan siempre. Las iteraciones que terminan con
+RET o salen del ciclo cancelan la grabación, que se reintenta hasta
+MAX_ATTEMPTS veces.
+
+    vm = TracingJITMachine(threshold=50)
+    vm.load_functions(...)
+    vm.load_program(...)
+    vm.run()
+    print(vm.report())          # iteraciones compiladas por ciclo
+
+La grabación ocurre en run(); step() y el modo debug ejecutan las trazas
+ya compiladas pero no graban.
+'''
+from stack_machine import StackMachine
+
+# Iteraciones interpretadas antes de grabar una traza
+DEFAULT_THRESHOLD = 50
+
+# Instrucciones grabadas como máximo en una traza
+MAX_TRACE = 2000
+
+# Grabaciones canceladas antes de poner el ciclo en la lista negra
+MAX_ATTEMPTS = 3
+
+_ARITH = {'ADDI': '+', 'SUBI': '-', 'MULI': '*'}
+_DIVISION = {'DIVI': '//', 'MODI': '%'}
+_COMPARE = {'LTI': '<', 'LEI': '<=', 'GTI': '>', 'GEI': '>=', 'EQI': '==', 'NEI': '!='}
+_PRINT = {'PRINTI': 'str', 'PRINTF': 'str', 'PRINTB': 'chr'}
+_PEEK = {'PEEKI': 'int', 'PEEKF': 'float', 'PEEKB': 'int'}
+_POKE = {'POKEI', 'POKEF', 'POKEB'}
+
+# Instrucciones que el compilador de trazas sabe traducir
+SUPPORTED_OPS = (set(_ARITH) | set(_DIVISION) | set(_COMPARE) | set(_PRINT) | set(_PEEK) | _POKE
+                 | {'CONSTI', 'CONSTF', 'LOCAL_GET', 'LOCAL_SET', 'GLOBAL_GET', 'GLOBAL_SET',
+                    'CALL', 'IF', 'ELSE', 'ENDIF', 'CBREAK', 'GROW', 'FLUSH',
+                    'NEGI', 'NEGF', 'LOCAL_TEE'})
+
+class TraceAborted(Exception):
+    '''
+    La iteración grabada no se puede compilar.
+    '''
+
+class LoopInfo:
+    '''
+    Estado y estadísticas de un ciclo (identificado por su LOOP).
+    '''
+    def __init__(self, function, header):
+        self.function = function              # Función del ciclo (None: main)
+        self.header = header                  # pc del LOOP
+        self.interpreted = 0                  # Iteraciones interpretadas
+        self.compiled = 0                     # Iteraciones ejecutadas en la traza
+        self.entries = 0                      # Veces que se entró a la traza
+        self.exits = {}                       # pc de la guarda -> salidas
+        self.attempts = 0                     # Grabaciones canceladas
+        self.blacklisted = None               # Motivo para no compilar el ciclo
+        self.trace = None                     # Función compilada
+        self.source = None                    # Código Python de la traza
+
+    @property
+    def hit_rate(self):
+        total = self.interpreted + self.compiled
+        return self.compiled / total if total else 0.0
+
+class _Recorder:
+    '''
+    Graba una iteración del ciclo `loop`: lista de (pc, instrucción,
+    dato observado), donde el dato es la condición en IF/CBREAK, la
+    etiqueta del valor en LOCAL_GET/GLOBAL_GET y la del resultado en CALL.
+    '''
+    def __init__(self, vm, loop):
+        self.loop = loop
+        self.program = vm.program
+        self.depth = len(vm.call_stack)
+        self.entries = []
+        self.pending_call = None              # (índice en entries, tamaño de la pila sin resultado)
+
+    def record(self, vm):
+        if len(vm.call_stack) != self.depth or vm.program is not self.program:
+            return
+        stack = vm.stack
+        if self.pending_call is not None:
+            index, base = self.pending_call
+            pc, instr, _ = self.entries[index]
+            self.entries[index] = (pc, instr, stack[-1][0] if len(stack) > base else None)
+            self.pending_call = None
+
+        pc = vm.pc
+        instr = self.program[pc]
+        opname = instr[0]
+        if opname in ('ENDLOOP', 'CONTINUE'):
+            vm._finish_recording(self)
+            return
+        if opname == 'LOOP':
+            vm._abort_recording(self, "contiene otro ciclo", permanent=True)
+            return
+        if opname == 'RET':
+            vm._abort_recording(self, "retorna dentro del ciclo")
+            return
+        if opname not in SUPPORTED_OPS:
+            vm._abort_recording(self, f"instrucción {opname} no soportada", permanent=True)
+            return
+        if len(self.entries) >= MAX_TRACE:
+            vm._abort_recording(self, "traza demasiado larga", permanent=True)
+            return
+
+        observed = None
+        if opname in ('IF', 'CBREAK'):
+            observed = stack[-1][1] != 0
+            if opname == 'CBREAK' and observed:
+                vm._abort_recording(self, "el ciclo terminó")
+                return
+        elif opname == 'LOCAL_GET':
+            value = vm.locals_stack[-1].get(instr[1]) if vm.locals_stack else None
+            if value is None:
+                return                        # El intérprete reporta el error
+            observed = value[0]
+        elif opname == 'GLOBAL_GET':
+            value = vm.globals.get(instr[1])
+            if value is None:
+                return
+            observed = value[0]
+        elif opname == 'CALL':
+            count = len(vm.function_params.get(instr[1], ()))
+            self.pending_call = (len(self.entries), len(stack) - count)
+        self.entries.append((pc, instr, observed))
+
+class _Value:
+    '''
+    Valor de la pila simulada al compilar: una expresión de Python sin
+    efectos, su etiqueta ('int'/'float'), las locales de las que depende
+    y si la expresión es un bool de Python (resultado de una comparación).
+    '''
+    __slots__ = ('expr', 'tag', 'deps', 'is_bool')
+
+    def __init__(self, expr, tag, deps=frozenset(), is_bool=False):
+        self.expr = expr
+        self.tag = tag
+        self.deps = deps
+        self.is_bool = is_bool
+
+    def number(self):
+        return f"(1 if {self.expr} else 0)" if self.is_bool else self.expr
+
+    def test(self):
+        return self.expr
+
+    def is_atom(self):
+        return self.expr.isidentifier() or self.expr.lstrip('-').replace('.', '', 1).isdigit()
+
+class _TraceCompiler:
+    def __init__(self, loop, entries, params):
+        self.loop = loop
+        self.entries = entries
+        self.params = params                  # función -> nombres de parámetros
+        self.names = {}                       # local GoxLang -> variable de Python
+        self.tags = {}                        # local -> etiqueta
+        self.live_in = set()                  # Locales leídas antes de asignarse
+        self.assigned = set()                 # Locales asignadas hasta el punto actual
+        self.dirty = []                       # Locales asignadas en la traza (en orden)
+        self.stack = []
+        self.body = []
+        self.temps = 0
+
+    def local(self, name):
+        if name not in self.names:
+            self.names[name] = f"l{len(self.names)}"
+        return self.names[name]
+
+    def temp(self, expr, tag):
+        self.temps += 1
+        name = f"t{self.temps}"
+        self.emit(f"{name} = {expr}")
+        return _Value(name, tag)
+
+    def emit(self, line):
+        self.body.append('        ' + line)
+
+    def materialize(self, value):
+        return value if value.is_atom() else self.temp(value.number(), value.tag)
+
+    def exit(self, pc, condition, pending):
+        '''
+        Guarda: si `condition` es verdadera, sale de la traza en `pc` con
+        los valores `pending` en la pila. Las locales a devolver al frame
+        se conocen al terminar la traza (ver render_exit).
+        '''
+        self.emit(f"if {condition}:")
+        items = ''.join(f"({v.tag!r}, {v.number()}), " for v in pending)
+        self.body.append((pc, items, set(self.assigned)))
+
+    def render_exit(self, pc, items, assigned):
+        lines = []
+        for name in self.dirty:
+            var = self.names[name]
+            store = f"frame[{name!r}] = ({self.tags[name]!r}, {var})"
+            if name in assigned or name in self.live_in:
+                lines.append(f"            {store}")
+            else:
+                # Se asigna más adelante en la traza: solo si ya hubo una iteración
+                lines.append(f"            if {var} is not None: {store}")
+        if items:
+            lines.append(f"            stack.extend(({items}))")
+        lines.append(f"            return {pc}, n")
+        return lines
+
+    def pop(self, count):
+        if len(self.stack) < count:
+            raise TraceAborted("la traza usa valores apilados antes del ciclo")
+        values = self.stack[len(self.stack) - count:]
+        del self.stack[len(self.stack) - count:]
+        return values
+
+    def compile(self):
+        for pc, instr, observed in self.entries:
+            self.instruction(pc, instr, observed)
+        if self.stack:
+            raise TraceAborted("la iteración deja valores en la pila")
+        return self.source()
+
+    def instruction(self, pc, instr, observed):
+        opname = instr[0]
+        stack = self.stack
+        if opname == 'CONSTI':
+            stack.append(_Value(repr(instr[1]), 'int'))
+        elif opname == 'CONSTF':
+            stack.append(_Value(repr(instr[1]), 'float'))
+        elif opname == 'LOCAL_GET':
+            name = instr[1]
+            if name not in self.assigned:
+                self.live_in.add(name)
+                self.tags.setdefault(name, observed)
+            stack.append(_Value(self.local(name), observed, frozenset([name])))
+        elif opname == 'LOCAL_SET':
+            name = instr[1]
+            value, = self.pop(1)
+            # Los valores pendientes que leen la local se calculan antes de cambiarla
+            for i, pending in enumerate(stack):
+                if name in pending.deps:
+                    stack[i] = self.temp(pending.number(), pending.tag)
+            if self.tags.get(name, value.tag) != value.tag:
+                raise TraceAborted(f"la local {name} cambia de tipo")
+            self.tags[name] = value.tag
+            self.emit(f"{self.local(name)} = {value.number()}")
+            self.assigned.add(name)
+            if name not in self.dirty:
+                self.dirty.append(name)
+        elif opname == 'LOCAL_TEE':
+            self.instruction(pc, ('LOCAL_SET', instr[1]), observed)
+            stack.append(_Value(self.local(instr[1]), self.tags[instr[1]], frozenset([instr[1]])))
+        elif opname in ('NEGI', 'NEGF'):
+            value, = self.pop(1)
+            stack.append(_Value(f"(-{value.number()})", value.tag, value.deps))
+        elif opname == 'GLOBAL_GET':
+            stack.append(self.temp(f"globals_[{instr[1]!r}][1]", observed))
+        elif opname == 'GLOBAL_SET':
+            value, = self.pop(1)
+            self.emit(f"globals_[{instr[1]!r}] = ({value.tag!r}, {value.number()})")
+        elif opname in _ARITH:
+            a, b = self.pop(2)
+            if opname == 'SUBI' and a.expr == '1' and b.is_bool:
+                # CONSTI 1; <comparación>; SUBI: la prueba negada de un while
+                stack.append(_Value(f"(not {b.expr})", 'int', b.deps, True))
+            else:
+                stack.append(_Value(f"({a.number()} {_ARITH[opname]} {b.number()})", 'int', a.deps | b.deps))
+        elif opname in _DIVISION:
+            a, b = self.pop(2)
+            b = self.materialize(b)
+            if b.expr.isidentifier() or float(b.expr) == 0:
+                self.exit(pc, f"{b.expr} == 0", stack + [a, b])
+            stack.append(_Value(f"({a.number()} {_DIVISION[opname]} {b.expr})", 'int', a.deps | b.deps))
+        elif opname in _COMPARE:
+            a, b = self.pop(2)
+            stack.append(_Value(f"({a.number()} {_COMPARE[opname]} {b.number()})", 'int', a.deps | b.deps, True))
+        elif opname in ('IF', 'CBREAK'):
+            value, = self.pop(1)
+            fails = f"not {value.test()}" if observed else value.test()
+            self.exit(pc, fails, stack + [value])
+        elif opname in ('ELSE', 'ENDIF'):
+            pass
+        elif opname in _PRINT:
+            value, = self.pop(1)
+            self.emit(f"write({_PRINT[opname]}({value.number()}))")
+        elif opname == 'FLUSH':
+            self.emit("vm.output.flush()")
+        elif opname in _PEEK:
+            addr, = self.pop(1)
+            stack.append(self.temp(f"memory.{opname.lower()}({addr.number()})", _PEEK[opname]))
+        elif opname in _POKE:
+            addr, value = self.pop(2)
+            self.emit(f"memory.{opname.lower()}({addr.number()}, {value.number()})")
+        elif opname == 'GROW':
+            cells, = self.pop(1)
+            stack.append(self.temp(f"memory.grow({cells.number()})", 'int'))
+        elif opname == 'CALL':
+            args = self.pop(len(self.params.get(instr[1], ())))
+            items = ''.join(f"({v.tag!r}, {v.number()}), " for v in args)
+            call = f"invoke({instr[1]!r}, ({items}))"
+            if observed is None:
+                self.emit(call)
+            else:
+                stack.append(self.temp(f"{call}[1]", observed))
+        else:
+            raise TraceAborted(f"instrucción {opname} no soportada")
+
+    def source(self):
+        loop = self.loop
+        lines = [f"def trace(vm, frame):",
+                 f"    # {loop.function or 'main'}: ciclo en el pc {loop.header}"]
+        for name, var in self.names.items():
+            if name in self.live_in:
+                lines.append(f"    v = frame.get({name!r})")
+                lines.append(f"    if v is None or v[0] != {self.tags[name]!r}:")
+                lines.append(f"        return None")
+                lines.append(f"    {var} = v[1]")
+            else:
+                lines.append(f"    v = frame.get({name!r})")
+                lines.append(f"    {var} = v[1] if v is not None else None")
+        lines.append("    stack = vm.stack")
+        lines.append("    globals_ = vm.globals")
+        lines.append("    memory = vm.memory")
+        lines.append("    write = vm.output.write")
+        lines.append("    invoke = vm._invoke")
+        lines.append("    n = 0")
+        lines.append("    while True:")
+        for line in self.body:
+            if isinstance(line, tuple):
+                lines.extend(self.render_exit(*line))
+            else:
+                lines.append(line)
+        lines.append("        n += 1")
+        return '\n'.join(lines) + '\n'
+
+def compile_trace(loop, entries, params):
+    '''
+    Compila la iteración grabada y retorna (función, código fuente).
+    Lanza TraceAborted si la traza no se puede compilar.
+    '''
+    source = _TraceCompiler(loop, entries, params).compile()
+    namespace = {}
+    exec(compile(source, f"<trace {loop.function or 'main'}:{loop.header}>", 'exec'), namespace)
+    return namespace['trace'], source
+
+class TracingJITMachine(StackMachine):
+    def __init__(self, threshold=DEFAULT_THRESHOLD, output=None):
+        super().__init__(output)
+        self.threshold = threshold
+        self.loops = {}                       # (id(programa), pc del LOOP) -> LoopInfo
+        self.recorder = None                  # _Recorder activo
+        self._headers = {}                    # (id(programa), pc del salto) -> LoopInfo
+
+    def start(self):
+        super().start()
+        self.recorder = None
+
+    def _run(self):
+        self._interpret(-1)
+
+    def _interpret(self, depth):
+        # Igual que StackMachine._run, grabando si hay una traza en curso y
+        # deteniéndose cuando la pila de retorno vuelve a `depth`
+        call_stack = self.call_stack
+        while self.running and self.pc < len(self.program) and len(call_stack) > depth:
+            if self.recorder is not None:
+                self.recorder.record(self)
+            instr = self.program[self.pc]
+            method = getattr(self, f"op_{instr[0]}", None)
+            if method:
+                method(*instr[1:])
+            else:
+                raise RuntimeError(f"Instrucción desconocida: {instr[0]}")
+            self.pc += 1
+
+    def _invoke(self, name, args):
+        '''
+        Llama a la función `name` desde una traza compilada y retorna el
+        valor que deja en la pila (None si no retorna nada).
+        '''
+        stack = self.stack
+        base = len(stack)
+        stack.extend(args)
+        saved = self.pc
+        depth = len(self.call_stack)
+        self.op_CALL(name)
+        self.pc += 1
+        self._interpret(depth)
+        self.pc = saved
+        return stack.pop() if len(stack) > base else None
+
+    # --- Saltos hacia atrás
+
+    def _loop_at(self, pc):
+        key = (id(self.program), pc)
+        loop = self._headers.get(key)
+        if loop is None:
+            StackMachine.op_CONTINUE(self)    # Deja self.pc en el LOOP
+            header_key = (id(self.program), self.pc)
+            loop = self.loops.get(header_key)
+            if loop is None:
+                loop = self.loops[header_key] = LoopInfo(self.current_function, self.pc)
+            self._headers[key] = loop
+            self.pc = pc
+        return loop
+
+    def op_ENDLOOP(self):
+        # Llegar aquí cierra una iteración ejecutada (al menos en parte) por el intérprete
+        loop = self._loop_at(self.pc)
+        loop.interpreted += 1
+        if loop.trace is not None:
+            result = loop.trace(self, self.locals_stack[-1] if self.locals_stack else {})
+            if result is not None:
+                exit_pc, iterations = result
+                loop.entries += 1
+                loop.compiled += iterations
+                loop.exits[exit_pc] = loop.exits.get(exit_pc, 0) + 1
+                self.pc = exit_pc - 1
+                return
+        elif (loop.blacklisted is None and self.recorder is None
+                and loop.interpreted >= self.threshold):
+            self.recorder = _Recorder(self, loop)
+        self.pc = loop.header
+
+    op_CONTINUE = op_ENDLOOP
+
+    # --- Grabación
+
+    def _finish_recording(self, recorder):
+        self.recorder = None
+        loop = recorder.loop
+        try:
+            loop.trace, loop.source = compile_trace(loop, recorder.entries, self.function_params)
+        except TraceAborted as e:
+            loop.blacklisted = str(e)
+
+    def _abort_recording(self, recorder, reason, permanent=False):
+        self.recorder = None
+        loop = recorder.loop
+        loop.attempts += 1
+        if permanent or loop.attempts >= MAX_ATTEMPTS:
+            loop.blacklisted = reason
+
+    def report(self):
+        lines = [f"{'ciclo':<24}{'interpretadas':>14}{'compiladas':>12}{'aciertos':>10}{'salidas':>9}  estado"]
+        for loop in sorted(self.loops.values(), key=lambda loop: -(loop.interpreted + loop.compiled)):
+            name = f"{loop.function or 'main'}:{loop.header}"
+            if loop.trace is not None:
+                state = "compilado"
+            elif loop.blacklisted is not None:
+                state = f"interpretado ({loop.blacklisted})"
+            else:
+                state = "interpretado"
+            lines.append(f"{name:<24}{loop.interpreted:>14}{loop.compiled:>12}"
+                         f"{100 * loop.hit_rate:>9.1f}%{sum(loop.exits.values()):>9}  {state}")
+        return '\n'.join(lines)